@@ -0,0 +1,78 @@
+"""
+PDF extraction benchmark.
+
+Compares the original extraction loop (string += over every page, then
+truncate to 3000 chars) with the streaming extractor (early stop) and the
+process-pool extractor for full documents.
+
+Run with: python bench_pdf_extraction.py [sample.pdf ...] [--pages 300]
+Without arguments the bundled assets/ PDF is repeated to --pages pages.
+"""
+import argparse
+import io
+import os
+import time
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from core.pdf_handler import extract_text, extract_text_parallel
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "PROBLEM STATEMENTS.pdf")
+
+
+def build_sample(path: str, pages: int) -> bytes:
+    """Repeat the pages of `path` until the document has `pages` pages."""
+    source = PdfReader(path)
+    writer = PdfWriter()
+    for i in range(pages):
+        writer.add_page(source.pages[i % len(source.pages)])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def original_extract(data: bytes) -> str:
+    """The extraction loop components/pdf_handler.py used before."""
+    pdf_text = ""
+    for page in PdfReader(io.BytesIO(data)).pages:
+        pdf_text += page.extract_text() or ""
+    return pdf_text[:3000]
+
+
+def timed(label: str, fn, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<34} {best * 1000:9.1f} ms   {len(result):>9,} chars")
+    return result
+
+
+def bench(name: str, data: bytes, workers: int):
+    pages = len(PdfReader(io.BytesIO(data)).pages)
+    print(f"\n{name} ({pages} pages, {len(data) / 1024:,.0f} KiB)")
+    timed("original preview (+= all pages)", lambda: original_extract(data))
+    timed("streaming preview (early stop)", lambda: extract_text(io.BytesIO(data), max_chars=3000))
+    full = timed("full document, sequential", lambda: extract_text(io.BytesIO(data)), repeat=1)
+    parallel = timed(f"full document, {workers} processes", lambda: extract_text_parallel(data, workers), repeat=1)
+    assert parallel == full, "parallel extraction differs from sequential"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF extraction benchmark")
+    parser.add_argument("pdfs", nargs="*", help="sample PDFs (default: synthetic document from assets/)")
+    parser.add_argument("--pages", type=int, default=300, help="pages in the synthetic document")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if args.pdfs:
+        for path in args.pdfs:
+            with open(path, "rb") as f:
+                bench(os.path.basename(path), f.read(), args.workers)
+    else:
+        bench("synthetic textbook", build_sample(SAMPLE_PDF, args.pages), args.workers)
+
+
+if __name__ == "__main__":
+    main()
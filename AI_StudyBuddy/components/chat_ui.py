@@ -2,85 +2,98 @@ import streamlit as st
 from core.explainer import explain_concept
 from core.summarizer import summarize_text
 from core.quizzer import generate_quiz
-import time
+from utils.chat_history import CHAT_PAGE_SIZE, ChatHistory
+from utils.gemini_helper import deltas
+import itertools
 
-def get_previous_messages_summary(messages, limit=3):
+def get_chat_history() -> ChatHistory:
+    """The session's conversation store (created on first use)."""
+    if "chat" not in st.session_state:
+        st.session_state.chat = ChatHistory()
+        st.session_state.history_pages = 1
+    return st.session_state.chat
+
+def reset_chat():
+    st.session_state.chat = ChatHistory()
+    st.session_state.history_pages = 1
+
+def _show_earlier_messages():
+    st.session_state.history_pages += 1
+
+def render_history(history: ChatHistory):
+    """
+    Draw the newest page of messages; older pages only when asked for, so a
+    rerun of a long session does not redraw every turn.
     """
-    Summarize or serialize the last few exchanges for context.
-    Returns a string that will be given to the model for follow-up responses.
+    shown = min(st.session_state.history_pages, history.pages())
+    hidden = len(history) - shown * CHAT_PAGE_SIZE
+    if hidden > 0:
+        st.button(f"⬆️ Show earlier messages ({hidden} hidden)", on_click=_show_earlier_messages)
+    for number in range(shown - 1, -1, -1):
+        for message in history.page(number):
+            with st.chat_message(message.role):
+                st.markdown(message.content)
+
+def write_stream(stream, spinner_text="💡 Study Buddy is thinking…") -> str:
+    """
+    Render a stream of text deltas as it arrives, with a spinner only until
+    the first delta. Returns the full text.
     """
-    # Only show the last `limit` user+assistant turns (flattened, preserves order)
-    context_messages = messages[-2*limit:]
-    formatted = []
-    for m in context_messages:
-        formatted.append(f"{m['role'].capitalize()}: {m['content']}")
-    return "\n".join(formatted)
+    with st.spinner(spinner_text):
+        first = next(stream, "")
+    return st.write_stream(itertools.chain([first], stream)).strip()
 
 def chat_ui(selected_mode):
     """Main chat interface with chat history and follow-up context awareness."""
 
     st.subheader(f"💬 StudyBuddy Chat — Mode: {selected_mode}")
 
-    # Initialize session state
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-
-    # Display chat history
-    for msg in st.session_state.messages:
-        with st.chat_message(msg["role"]):
-            st.markdown(msg["content"])
+    history = get_chat_history()
+    render_history(history)
 
     # User input box
     prompt = st.chat_input(f"Type your message for {selected_mode} mode…")
     if prompt:
-        # Add user message to history
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        # Recent turns plus the rolling summary of older ones, for follow-up answers
+        previous_context = history.context()
+        history.append("user", prompt)
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # Prepare previous context for better follow-up answers
-        previous_context = get_previous_messages_summary(st.session_state.messages[:-1], limit=3)
         assistant_response = ""
         with st.chat_message("assistant"):
             response_placeholder = st.empty()
             try:
+                # Summarizer condenses long texts before its stream starts
                 with st.spinner("💡 Study Buddy is thinking…"):
-                    start_time = time.time()
                     if selected_mode == "Explainer":
-                        assistant_response = explain_concept(prompt, previous_context)
+                        stream = explain_concept(prompt, previous_context, stream=True)
                     elif selected_mode == "Summarizer":
-                        assistant_response = summarize_text(prompt, previous_context)
+                        stream = summarize_text(prompt, previous_context, stream=True)
                     elif selected_mode == "Quizzer":
-                        assistant_response = generate_quiz(prompt, previous_context)
+                        stream = generate_quiz(prompt, previous_context, stream=True)
                     else:
-                        assistant_response = "⚠️ Unknown mode selected."
-                    elapsed = time.time() - start_time
-                    if elapsed > 8:
-                        assistant_response += (
-                            "\n\n⏳ *Sorry, this response took longer than usual. "
-                            "If delays happen often, there may be server/API issues.*"
-                        )
+                        stream = deltas("⚠️ Unknown mode selected.")
+                with response_placeholder.container():
+                    assistant_response = write_stream(stream)
             except Exception as e:
                 assistant_response = (
                     "❌ Sorry, there was an error processing your request. "
                     "Please try again in a few seconds.\n\n"
                     f"Error: {str(e)}"
                 )
-            response_placeholder.markdown(assistant_response)
-
-            # Copy button feature - displays response in copyable code block
-            st.code(assistant_response, language="markdown")
+                response_placeholder.markdown(assistant_response)
 
             # Feedback buttons
             st.markdown("**Was this response helpful?**")
             col1, col2 = st.columns(2)
             with col1:
-                if st.button("👍 Helpful", key=f"fb_yes_{len(st.session_state.messages)}"):
+                if st.button("👍 Helpful", key=f"fb_yes_{len(history)}"):
                     st.success("Thank you for your feedback!")
             with col2:
-                if st.button("👎 Not Helpful", key=f"fb_no_{len(st.session_state.messages)}"):
+                if st.button("👎 Not Helpful", key=f"fb_no_{len(history)}"):
                     st.info(
                         "We appreciate your input! Please let us know how we can improve."
                     )
 
-        st.session_state.messages.append({"role": "assistant", "content": assistant_response})
\ No newline at end of file
+        history.append("assistant", assistant_response)
\ No newline at end of file
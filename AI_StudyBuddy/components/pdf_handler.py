@@ -1,5 +1,10 @@
 import streamlit as st
-from PyPDF2 import PdfReader
+from core.pdf_cache import cached_extract_text
+
+# Characters shown in the editable extraction box; the whole document is
+# only extracted when Summarize is clicked
+PDF_PREVIEW_CHARS = 3000
+
 
 def handle_pdf_upload():
     """
@@ -13,9 +18,9 @@ def handle_pdf_upload():
     if uploaded_file:
         with st.spinner("Extracting text from PDF..."):
             try:
-                reader = PdfReader(uploaded_file)
-                for page in reader.pages:
-                    pdf_text += page.extract_text() or ""
+                # Stops reading pages at PDF_PREVIEW_CHARS; reruns and
+                # re-uploads of the same file are served from the cache
+                preview = cached_extract_text(uploaded_file, max_chars=PDF_PREVIEW_CHARS)
             except Exception as e:
                 st.error(f"❌ Error reading PDF: {str(e)}")
                 return None, None, False
@@ -26,9 +31,10 @@ def handle_pdf_upload():
         st.markdown("### 📝 Review & Edit Extracted Text")
         pdf_text = st.text_area(
             "Edit extracted text below (review, trim, or add notes):",
-            value=pdf_text[:3000] if pdf_text else "",
+            value=preview,
             height=300,
-            help="You can modify the text before summarizing"
+            help=f"Shows the first {PDF_PREVIEW_CHARS:,} characters; the rest of the PDF is "
+                 "added to your edited text when summarizing"
         )
         
         # Extra custom prompt for summarization
@@ -44,7 +50,14 @@ def handle_pdf_upload():
         with col1:
             if st.button("🚀 Summarize", use_container_width=True):
                 if pdf_text.strip():
-                    return pdf_text, user_extra, True
+                    with st.spinner("Extracting the full document..."):
+                        try:
+                            full_text = cached_extract_text(uploaded_file)
+                        except Exception as e:
+                            st.error(f"❌ Error reading PDF: {str(e)}")
+                            return None, None, False
+                    # Keep the user's edits to the preview, then the remaining pages
+                    return pdf_text + full_text[len(preview):], user_extra, True
                 else:
                     st.warning("⚠️ No text to summarize. Please upload a valid PDF.")
                     return None, None, False
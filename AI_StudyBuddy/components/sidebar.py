@@ -1,4 +1,5 @@
 import streamlit as st
+from components.chat_ui import reset_chat
 
 def sidebar_ui():
     """Sidebar with mode selector and chat controls."""
@@ -22,7 +23,7 @@ def sidebar_ui():
 
     # New chat button
     if st.sidebar.button("🆕 New Chat"):
-        st.session_state.messages = []
+        reset_chat()
         st.sidebar.success("Started a new chat!")
 
     # Divider
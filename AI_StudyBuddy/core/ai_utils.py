@@ -1,31 +1,514 @@
 # core/ai_utils.py
-#Handles API selection, loading keys, and LLM initialization.
+# Handles API selection, loading keys, and LLM initialization, and routes
+# calls across the configured providers (hedging, circuit breakers, EWMA latency).
+import asyncio
+import itertools
 import os
-from dotenv import load_dotenv
-from openai import OpenAI
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import google.generativeai as genai
+from dotenv import load_dotenv
+
+from utils.llm_scheduler import get_scheduler, is_rate_limit_error
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+# Providers in order of preference; "fake" is the offline test provider
+# (GEMINI_BACKEND=fake, the older switch, still selects it)
+LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", "fake" if os.getenv("GEMINI_BACKEND", "").lower() == "fake" else "gemini")
+# Hedging: start the next provider when the first has not answered within its
+# p95 latency (LLM_HEDGE_DELAY seconds until enough calls have been seen)
+LLM_HEDGE = os.getenv("LLM_HEDGE", "1").strip().lower() in ("1", "true", "yes")
+LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY", 5.0))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", 0.25))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 10))
+LLM_LATENCY_WINDOW = int(os.getenv("LLM_LATENCY_WINDOW", 100))
+LLM_EWMA_ALPHA = float(os.getenv("LLM_EWMA_ALPHA", 0.3))
+# Circuit breaker: consecutive failures that open it, and seconds before a trial call
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 3))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 30.0))
+LLM_ROUTER_WORKERS = int(os.getenv("LLM_ROUTER_WORKERS", 16))
+
+
+def _missing(key: str) -> bool:
+    return not key or key.startswith("your_")
+
+
 def get_llm_client(api_choice="OpenAI"):
     """Initialize and return LLM client based on user choice."""
     if api_choice == "OpenAI":
-        if not OPENAI_API_KEY:
+        if _missing(OPENAI_API_KEY):
             raise ValueError("❌ Missing OpenAI API Key in .env")
+        # Optional dependency: only needed when OpenAI is configured
+        from openai import OpenAI
         client = OpenAI(api_key=OPENAI_API_KEY)
         return client, "OpenAI"
     elif api_choice == "Gemini":
-        if not GEMINI_API_KEY:
+        if _missing(GEMINI_API_KEY):
             raise ValueError("❌ Missing Gemini API Key in .env")
         genai.configure(api_key=GEMINI_API_KEY)
         return genai, "Gemini"
     else:
         raise ValueError("Invalid API choice. Use 'OpenAI' or 'Gemini'.")
 
-print("🔑 OpenAI key loaded:", bool(os.getenv("OPENAI_API_KEY")))
-print(os.getenv("OPENAI_API_KEY"))
-print("🔑 Gemini key loaded:", bool(os.getenv("GEMINI_API_KEY")))
-print(os.getenv("GEMINI_API_KEY"))
\ No newline at end of file
+
+class NoProviderAvailable(Exception):
+    """Raised when every configured provider's circuit breaker is open."""
+
+    # Retried by the scheduler and reported as "busy" (503), like a 429
+    retryable = True
+
+
+class Completion:
+    """A finished answer; token counts are the provider's own (0 when it reports none)."""
+
+    __slots__ = ("text", "provider", "tokens_in", "tokens_out")
+
+    def __init__(self, text: str, provider: str, tokens_in: int = 0, tokens_out: int = 0):
+        self.text = text
+        self.provider = provider
+        self.tokens_in = tokens_in
+        self.tokens_out = tokens_out
+
+
+# Providers take Gemini-style generation configs (temperature, max_output_tokens,
+# response_mime_type, response_schema) and translate what they support.
+
+class GeminiProvider:
+    name = "gemini"
+
+    def __init__(self, model_name: str = GEMINI_MODEL):
+        client, _ = get_llm_client("Gemini")
+        self.model_name = model_name
+        self.model = client.GenerativeModel(model_name)
+
+    def complete(self, prompt: str, config: dict) -> Completion:
+        return self._completion(self.model.generate_content(prompt, generation_config=config))
+
+    def _completion(self, response) -> Completion:
+        metadata = getattr(response, "usage_metadata", None)
+        return Completion(response.text if response else "", self.name,
+                          getattr(metadata, "prompt_token_count", 0) or 0,
+                          getattr(metadata, "candidates_token_count", 0) or 0)
+
+    async def acomplete(self, prompt: str, config: dict) -> Completion:
+        return self._completion(await self.model.generate_content_async(prompt, generation_config=config))
+
+    def stream(self, prompt: str, config: dict):
+        for chunk in self.model.generate_content(prompt, stream=True, generation_config=config):
+            if chunk.text:
+                yield chunk.text
+
+
+class OpenAIProvider:
+    name = "openai"
+
+    def __init__(self, model_name: str = OPENAI_MODEL):
+        self.client, _ = get_llm_client("OpenAI")
+        self.model_name = model_name
+        self._async_client = None
+
+    def _request(self, prompt: str, config: dict) -> dict:
+        messages = [{"role": "user", "content": prompt}]
+        request = {"model": self.model_name, "messages": messages}
+        if "temperature" in config:
+            request["temperature"] = config["temperature"]
+        if "max_output_tokens" in config:
+            request["max_tokens"] = config["max_output_tokens"]
+        if config.get("response_mime_type") == "application/json":
+            request["response_format"] = {"type": "json_object"}
+            if "json" not in prompt.lower():
+                # JSON mode requires the word in the conversation
+                messages.insert(0, {"role": "system", "content": "Reply with JSON only."})
+        return request
+
+    def complete(self, prompt: str, config: dict) -> Completion:
+        return self._completion(self.client.chat.completions.create(**self._request(prompt, config)))
+
+    async def acomplete(self, prompt: str, config: dict) -> Completion:
+        if self._async_client is None:
+            from openai import AsyncOpenAI
+            self._async_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        return self._completion(await self._async_client.chat.completions.create(**self._request(prompt, config)))
+
+    def _completion(self, response) -> Completion:
+        usage = response.usage
+        return Completion(response.choices[0].message.content or "", self.name,
+                          getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0)
+
+    def stream(self, prompt: str, config: dict):
+        for event in self.client.chat.completions.create(stream=True, **self._request(prompt, config)):
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+
+
+class FakeProvider:
+    """
+    Offline provider for tests and demos: echoes the start of the prompt (or
+    returns reply(prompt)), after `latency` seconds, or raises `error`.
+    """
+
+    def __init__(self, name: str = "fake", latency: float = 0.0, error: Exception = None, reply=None):
+        self.name = name
+        self.latency = latency
+        self.error = error
+        self.reply = reply
+        self.calls = 0
+
+    def _answer(self, prompt: str) -> str:
+        if self.error is not None:
+            raise self.error
+        return self.reply(prompt) if self.reply else f"[{self.name}] " + " ".join(prompt.split()[:40])
+
+    def complete(self, prompt: str, config: dict) -> Completion:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return Completion(self._answer(prompt), self.name)
+
+    async def acomplete(self, prompt: str, config: dict) -> Completion:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return Completion(self._answer(prompt), self.name)
+
+    def stream(self, prompt: str, config: dict):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        for word in self._answer(prompt).split(" "):
+            yield word + " "
+
+
+PROVIDERS = {"gemini": GeminiProvider, "openai": OpenAIProvider, "fake": FakeProvider}
+
+
+class ProviderHealth:
+    """
+    Latency and failures of one provider: an EWMA and a window for p95 per
+    call kind ("complete", or "stream" for time to first delta), plus a
+    circuit breaker (closed -> open after `max_failures` consecutive
+    failures -> one trial call after `cooldown` seconds).
+    """
+
+    def __init__(self, max_failures: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN,
+                 alpha: float = LLM_EWMA_ALPHA, window: int = LLM_LATENCY_WINDOW):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.ewma = {}
+        self.latencies = {}
+        self._window = window
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.calls = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        if self.state == "closed":
+            return True
+        return now - self.opened_at >= self.cooldown and not self.probing
+
+    def begin(self, now: float):
+        self.calls += 1
+        if self.state != "closed":
+            self.state, self.probing = "half_open", True
+
+    def success(self, kind: str, seconds: float):
+        self.state, self.probing, self.consecutive_failures = "closed", False, 0
+        previous = self.ewma.get(kind)
+        self.ewma[kind] = seconds if previous is None else self.alpha * seconds + (1 - self.alpha) * previous
+        self.latencies.setdefault(kind, deque(maxlen=self._window)).append(seconds)
+
+    def throttled(self):
+        # A 429 says the account is out of quota, not that the provider is down:
+        # the breaker is left as it is (a trial call may be made again)
+        self.probing = False
+
+    def failure(self, now: float):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.probing = False
+        if self.state == "half_open" or self.consecutive_failures >= self.max_failures:
+            self.state, self.opened_at = "open", now
+
+    def p95(self, kind: str, min_samples: int):
+        samples = self.latencies.get(kind)
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+class LLMRouter:
+    """
+    Sends each call to the available provider with the lowest EWMA latency
+    (providers not yet measured follow, in configured order).
+
+    complete() hedges: if the chosen provider has not answered within its p95
+    latency, the next provider is started too and the first success wins
+    (acomplete() is the asyncio variant). stream() does the same for the
+    first delta. A failed provider fails over to the next one; the last
+    error is raised when all have failed.
+    """
+
+    def __init__(self, providers: list, hedge: bool = LLM_HEDGE, hedge_delay: float = LLM_HEDGE_DELAY,
+                 min_hedge_delay: float = LLM_HEDGE_MIN_DELAY, min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+                 clock=time.monotonic, on_hedge=None, **health_options):
+        if not providers:
+            raise ValueError("No LLM provider configured")
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.min_samples = min_samples
+        self.clock = clock
+        # on_hedge(prompt, max_output_tokens) charges a hedged call to the
+        # rate limits, since only the first call of a race was admitted
+        self.on_hedge = on_hedge
+        self.health = {provider.name: ProviderHealth(**health_options) for provider in self.providers}
+        self._lock = threading.Lock()
+        self._executor = None
+        self.stats = {"calls": 0, "hedges": 0, "hedge_wins": 0, "failovers": 0, "unavailable": 0}
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=LLM_ROUTER_WORKERS, thread_name_prefix="llm-router")
+            return self._executor
+
+    def order(self, kind: str = "complete") -> list:
+        """Available providers, fastest first."""
+        with self._lock:
+            now = self.clock()
+            ranked = []
+            for position, provider in enumerate(self.providers):
+                health = self.health[provider.name]
+                if health.available(now):
+                    ewma = health.ewma.get(kind)
+                    ranked.append((ewma is None, ewma or 0.0, position, provider))
+        return [provider for *_, provider in sorted(ranked, key=lambda item: item[:3])]
+
+    def _delay(self, provider, kind: str) -> float:
+        with self._lock:
+            p95 = self.health[provider.name].p95(kind, self.min_samples)
+        return self.hedge_delay if p95 is None else max(self.min_hedge_delay, p95)
+
+    def _run(self, provider, kind: str, call):
+        with self._lock:
+            self.health[provider.name].begin(self.clock())
+        start = self.clock()
+        try:
+            result = call(provider)
+        except Exception as e:
+            self._failed(provider, e)
+            raise
+        with self._lock:
+            self.health[provider.name].success(kind, self.clock() - start)
+        return result
+
+    async def _arun(self, provider, kind: str, call):
+        with self._lock:
+            self.health[provider.name].begin(self.clock())
+        start = self.clock()
+        try:
+            result = await call(provider)
+        except asyncio.CancelledError:
+            # Lost a hedge or the caller gave up: says nothing about the provider
+            with self._lock:
+                self.health[provider.name].probing = False
+            raise
+        except Exception as e:
+            self._failed(provider, e)
+            raise
+        with self._lock:
+            self.health[provider.name].success(kind, self.clock() - start)
+        return result
+
+    def _failed(self, provider, error: Exception):
+        with self._lock:
+            if is_rate_limit_error(error):
+                self.health[provider.name].throttled()
+            else:
+                self.health[provider.name].failure(self.clock())
+
+    def _candidates(self, kind: str) -> list:
+        remaining = self.order(kind)
+        with self._lock:
+            self.stats["calls"] += 1
+            if not remaining:
+                self.stats["unavailable"] += 1
+        if not remaining:
+            raise NoProviderAvailable("All LLM providers are unavailable (circuit breakers open)")
+        return remaining
+
+    def _hedged(self, prompt: str, config: dict):
+        with self._lock:
+            self.stats["hedges"] += 1
+        if self.on_hedge is not None:
+            self.on_hedge(prompt, config.get("max_output_tokens"))
+
+    def _race(self, kind: str, prompt: str, config: dict, call, discard=None):
+        """call(provider) on the fastest provider, hedged and failed over as described above."""
+        remaining = self._candidates(kind)
+        pool, pending, errors = self._pool(), {}, []
+        hedged = False
+
+        def start():
+            provider = remaining.pop(0)
+            pending[pool.submit(self._run, provider, kind, call)] = provider
+
+        start()
+        first = next(iter(pending.values()))
+        while pending:
+            timeout = None
+            if self.hedge and not hedged and remaining and len(pending) == 1:
+                timeout = self._delay(first, kind)
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                hedged = True
+                self._hedged(prompt, config)
+                start()
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    if remaining and not pending:
+                        with self._lock:
+                            self.stats["failovers"] += 1
+                        start()
+                    continue
+                if hedged and provider is not first:
+                    with self._lock:
+                        self.stats["hedge_wins"] += 1
+                for loser in pending:
+                    if discard is not None:
+                        loser.add_done_callback(lambda f: f.exception() is None and discard(f.result()))
+                return result
+        raise errors[-1]
+
+    def complete(self, prompt: str, config: dict) -> Completion:
+        return self._race("complete", prompt, config, lambda provider: provider.complete(prompt, config))
+
+    async def acomplete(self, prompt: str, config: dict) -> Completion:
+        """
+        complete() for event loops: provider calls are tasks on the running
+        loop (providers without acomplete() run in a thread), hedged and
+        failed over the same way. Losing hedges are cancelled, as is every
+        call still running if the caller is.
+        """
+        def call(provider):
+            if hasattr(provider, "acomplete"):
+                return provider.acomplete(prompt, config)
+            return asyncio.to_thread(provider.complete, prompt, config)
+
+        remaining = self._candidates("complete")
+        pending, errors = {}, []
+        hedged = False
+
+        def start():
+            provider = remaining.pop(0)
+            pending[asyncio.ensure_future(self._arun(provider, "complete", call))] = provider
+
+        start()
+        first = next(iter(pending.values()))
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and not hedged and remaining and len(pending) == 1:
+                    timeout = self._delay(first, "complete")
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    self._hedged(prompt, config)
+                    start()
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        if remaining and not pending:
+                            with self._lock:
+                                self.stats["failovers"] += 1
+                            start()
+                        continue
+                    if hedged and provider is not first:
+                        with self._lock:
+                            self.stats["hedge_wins"] += 1
+                    return task.result()
+            raise errors[-1]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stream(self, prompt: str, config: dict):
+        """
+        An iterator of text deltas whose first delta has already arrived (so
+        hedging and failover happen before any text is shown). Failures after
+        the first delta are raised to the caller.
+        """
+        def open_stream(provider):
+            deltas = provider.stream(prompt, config)
+            return deltas, next(deltas, "")
+
+        deltas, first = self._race("stream", prompt, config, open_stream, discard=lambda opened: opened[0].close())
+        return itertools.chain([first], deltas)
+
+    @property
+    def models(self) -> str:
+        """The configured models, in order (part of cache keys)."""
+        return ",".join(getattr(provider, "model_name", provider.name) for provider in self.providers)
+
+    def warm_up(self, ping: bool = False):
+        """With `ping`, send a one-word request to every provider so connections are open."""
+        if ping:
+            for provider in self.providers:
+                provider.complete("Reply with OK.", {"max_output_tokens": 5})
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = self.clock()
+            providers = {}
+            for provider in self.providers:
+                health = self.health[provider.name]
+                entry = {"state": health.state, "available": health.available(now),
+                         "calls": health.calls, "failures": health.failures}
+                for kind, ewma in health.ewma.items():
+                    entry[f"{kind}_ewma_ms"] = round(ewma * 1000, 1)
+                    p95 = health.p95(kind, 1)
+                    entry[f"{kind}_p95_ms"] = round(p95 * 1000, 1)
+                providers[provider.name] = entry
+            return {**self.stats, "providers": providers}
+
+
+def create_router(names: str = LLM_PROVIDERS, **options) -> LLMRouter:
+    """
+    An LLMRouter over the comma-separated provider `names`, charging hedged
+    calls to the shared scheduler. Providers whose API key is missing are
+    skipped; ValueError if none is left.
+    """
+    providers, problems = [], []
+    for name in filter(None, (part.strip().lower() for part in names.split(","))):
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider {name!r}; use {', '.join(PROVIDERS)}.")
+        try:
+            providers.append(PROVIDERS[name]())
+        except (ValueError, ImportError) as e:
+            problems.append(f"{name}: {e}")
+    if not providers:
+        raise ValueError("No LLM provider available (" + "; ".join(problems) + ")")
+    options.setdefault("on_hedge", get_scheduler().charge)
+    return LLMRouter(providers, **options)
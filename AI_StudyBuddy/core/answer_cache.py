@@ -0,0 +1,219 @@
+# core/answer_cache.py
+# Semantic cache of finished answers, so near-identical questions
+# ("explain heap sort", "what is heapsort?") reuse one model call.
+import hashlib
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Entries kept per namespace (mode + prompt versions), shared by every Streamlit session
+ANSWER_CACHE_ENTRIES = int(os.getenv("ANSWER_CACHE_ENTRIES", 256))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 24 * 3600))
+# Cosine similarity a question must reach to reuse an answer, and its chat context likewise
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.9))
+ANSWER_CACHE_CONTEXT_THRESHOLD = float(os.getenv("ANSWER_CACHE_CONTEXT_THRESHOLD", 0.9))
+# Longer inputs are passages to summarize or quiz on, not questions: exact matches only
+ANSWER_CACHE_QUERY_WORDS = int(os.getenv("ANSWER_CACHE_QUERY_WORDS", 24))
+ANSWER_CACHE_DIM = int(os.getenv("ANSWER_CACHE_DIM", 1024))
+# Comma-separated modes to cache; empty disables the cache
+ANSWER_CACHE_MODES = frozenset(filter(None, os.getenv("ANSWER_CACHE_MODES", "explainer,quizzer,summarizer").split(",")))
+
+# "+" and "#" tell B+ tree from B tree and C++/C# from C
+_WORD = re.compile(r"\w+|[+#]")
+# Phrasing that does not change what is being asked
+_FILLER = frozenset(
+    "a an the is are was were what whats explain tell me about please can could would you define "
+    "describe give i want to know of on for do does meant by mean means".split()
+)
+_HASH_MULTIPLIER = np.uint32(2654435761)
+
+
+def _is_failure(text: str) -> bool:
+    # The core functions report errors as text instead of raising
+    return text.lstrip().startswith(("❌", "⚠️"))
+
+
+def normalize(text: str) -> list:
+    """Lower-cased words of `text` without filler ("what is", "explain", "please"...)."""
+    return [word for word in _WORD.findall(text.lower()) if word not in _FILLER]
+
+
+def _stem(word: str) -> str:
+    # Plural "s" only; "process" and "class" keep theirs
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def content_key(words: list) -> str:
+    """
+    The content words of a question, order and spacing ignored: "heap sort",
+    "sort heap" and "heapsort" share a key, "supervised" and
+    "unsupervised" do not.
+    """
+    return "".join(sorted(set(map(_stem, words))))
+
+
+def embed(words: list, dim: int = ANSWER_CACHE_DIM) -> np.ndarray:
+    """
+    Unit vector of hashed character trigrams over the words joined without
+    spaces, so "heap sort" and "heapsort" embed identically. Zero for no words.
+    """
+    data = np.frombuffer("".join(words).encode("utf-8"), dtype=np.uint8).astype(np.uint32)
+    vector = np.zeros(dim, dtype=np.float32)
+    if not len(data):
+        return vector
+    if len(data) < 3:
+        data = np.pad(data, (0, 3 - len(data)))
+    grams = (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+    hashed = grams * _HASH_MULTIPLIER  # wraps mod 2**32
+    hashed ^= hashed >> 15
+    vector += np.bincount(hashed % dim, minlength=dim)
+    return vector / np.linalg.norm(vector)
+
+
+def _signature(*parts: str) -> np.int64:
+    digest = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        digest.update(b"\0" + part.encode("utf-8"))
+    return np.frombuffer(digest.digest(), dtype=np.int64)[0]
+
+
+class _Index:
+    """Fixed-capacity vectors and metadata for one namespace, in preallocated NumPy arrays."""
+
+    def __init__(self, capacity: int, dim: int):
+        self.queries = np.zeros((capacity, dim), dtype=np.float32)
+        self.contexts = np.zeros((capacity, dim), dtype=np.float32)
+        self.has_context = np.zeros(capacity, dtype=bool)
+        self.signatures = np.zeros(capacity, dtype=np.int64)
+        self.expires = np.zeros(capacity, dtype=np.float64)  # 0 marks an empty slot
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.answers = [None] * capacity
+
+
+class SemanticCache:
+    """
+    Answers keyed by meaning: each namespace (one per mode and prompt version,
+    so modes never share answers) holds question and context vectors in a
+    NumPy matrix searched with one matrix-vector product.
+
+    A lookup hits when the question's cosine similarity reaches `threshold`,
+    the chat context is similar too (or both are empty), and the exact parts
+    match: the question's content words (only filler, word order, spacing
+    and plural "s" may differ, since trigram similarity alone rates
+    "supervised" and "unsupervised learning" above 0.9), the numbers in the
+    question ("10 questions" is not "5 questions"), any `exact` value the
+    caller passes, and, for inputs longer than `query_words`, the whole
+    normalized text. Entries expire after `ttl`
+    seconds; a full namespace evicts its least recently used entry.
+    """
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_ENTRIES, ttl: float = ANSWER_CACHE_TTL,
+                 threshold: float = ANSWER_CACHE_THRESHOLD, context_threshold: float = ANSWER_CACHE_CONTEXT_THRESHOLD,
+                 query_words: int = ANSWER_CACHE_QUERY_WORDS, dim: int = ANSWER_CACHE_DIM, modes=ANSWER_CACHE_MODES,
+                 clock=time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.context_threshold = context_threshold
+        self.query_words = query_words
+        self.dim = dim
+        self.modes = modes
+        self.clock = clock
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def _key(self, query: str, context: str, exact: str):
+        words = normalize(query)
+        numbers = " ".join(word for word in words if any(char.isdigit() for char in word))
+        whole = " ".join(words) if len(words) > self.query_words else ""
+        context_words = normalize(context)
+        return embed(words, self.dim), embed(context_words, self.dim), bool(context_words), \
+            _signature(content_key(words), numbers, whole, exact)
+
+    def get(self, mode: str, namespace: str, query: str, context: str = "", exact: str = ""):
+        """The cached answer for `query` in this context, or None."""
+        if mode not in self.modes:
+            return None
+        query_vector, context_vector, has_context, signature = self._key(query, context, exact)
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is None:
+                self.stats["misses"] += 1
+                return None
+            now = self.clock()
+            live = index.expires > now
+            expired = (index.expires > 0) & ~live
+            if expired.any():
+                self.stats["expired"] += int(expired.sum())
+                index.expires[expired] = 0
+                for slot in np.flatnonzero(expired):
+                    index.answers[slot] = None
+            candidates = live & (index.signatures == signature) & (index.has_context == has_context)
+            scores = np.where(candidates, index.queries @ query_vector, -1.0)
+            if has_context:
+                scores[(index.contexts @ context_vector) < self.context_threshold] = -1.0
+            slot = int(np.argmax(scores))
+            score = scores[slot]
+            if score < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            index.last_used[slot] = now
+            self.stats["hits"] += 1
+            if score < 0.9999:
+                self.stats["semantic_hits"] += 1
+            return index.answers[slot]
+
+    def put(self, mode: str, namespace: str, query: str, context: str, answer: str, exact: str = ""):
+        """Store `answer` unless caching is off for `mode` or it is an error message."""
+        if mode not in self.modes or not answer or _is_failure(answer):
+            return
+        query_vector, context_vector, has_context, signature = self._key(query, context, exact)
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is None:
+                index = self._indexes[namespace] = _Index(self.max_entries, self.dim)
+            now = self.clock()
+            free = np.flatnonzero(index.expires <= now)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(index.last_used))
+                self.stats["evictions"] += 1
+            index.queries[slot] = query_vector
+            index.contexts[slot] = context_vector
+            index.has_context[slot] = has_context
+            index.signatures[slot] = signature
+            index.expires[slot] = now + self.ttl
+            index.last_used[slot] = now
+            index.answers[slot] = answer
+            self.stats["stores"] += 1
+
+    def remember(self, stream, mode: str, namespace: str, query: str, context: str = "", exact: str = ""):
+        """Pass a stream of text deltas through, storing the full answer if it completes without an error."""
+        chunks, failed = [], False
+        for delta in stream:
+            failed = failed or _is_failure(delta)
+            chunks.append(delta)
+            yield delta
+        if not failed:
+            self.put(mode, namespace, query, context, "".join(chunks).strip(), exact)
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = self.clock()
+            entries = {namespace: int((index.expires > now).sum()) for namespace, index in self._indexes.items()}
+            return {**self.stats, "entries": entries}
+
+
+answer_cache = SemanticCache()
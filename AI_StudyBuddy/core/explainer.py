@@ -1,10 +1,8 @@
-from utils.gemini_helper import generate_response
+from core.answer_cache import answer_cache
+from utils.gemini_helper import deltas, generate_response, stream_response
+from utils.prompts import register
 
-def explain_concept(concept: str, previous_context: str = "") -> str:
-    """
-    Explain a concept in simple terms, considering previous context for follow-up questions.
-    """
-    prompt = f"""
+EXPLAIN_PROMPT = register("explainer", """
 You are Study Buddy, an AI-powered academic explainer.
 [Recent chat for context:]
 {previous_context}
@@ -23,5 +21,22 @@ Instructions:
 - Use information from the previous chat for follow-up or clarifying answers.
 - Keep language concise, avoid jargon unless needed, and always favor clarity.
 - Use Markdown formatting for structure.
-"""
-    return generate_response(prompt.strip())
+""")
+
+def explain_concept(concept: str, previous_context: str = "", stream: bool = False):
+    """
+    Explain a concept in simple terms, considering previous context for follow-up questions.
+    With `stream`, returns a generator of text deltas instead of the full text.
+    Near-identical questions in a similar context are answered from answer_cache.
+    """
+    namespace = f"explainer:{EXPLAIN_PROMPT.version}"
+    cached = answer_cache.get("explainer", namespace, concept, previous_context)
+    if cached is not None:
+        return deltas(cached) if stream else cached
+    prompt = EXPLAIN_PROMPT.render(previous_context=previous_context, concept=concept)
+    if stream:
+        return answer_cache.remember(stream_response(prompt, mode="explainer"), "explainer", namespace, concept,
+                                     previous_context)
+    response = generate_response(prompt, mode="explainer")
+    answer_cache.put("explainer", namespace, concept, previous_context, response)
+    return response
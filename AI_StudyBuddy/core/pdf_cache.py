@@ -0,0 +1,157 @@
+# core/pdf_cache.py
+# Content-addressed cache of extracted PDF text.
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from core.pdf_handler import extract_text, extract_text_parallel
+
+load_dotenv()
+
+# Memory tier: entries kept per process (shared by every Streamlit session)
+PDF_CACHE_MAX_ENTRIES = int(os.getenv("PDF_CACHE_MAX_ENTRIES", 64))
+# Disk tier: disabled unless a directory is set
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "")
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def content_hash(source) -> str:
+    """SHA-256 of a seekable binary file object, read in chunks."""
+    digest = hashlib.sha256()
+    position = source.tell()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(_HASH_CHUNK), b""):
+        digest.update(chunk)
+    source.seek(position)
+    return digest.hexdigest()
+
+
+class PDFTextCache:
+    """
+    Extracted text keyed by (file hash, max_chars).
+
+    An LRU dict in memory sits in front of an optional directory of text
+    files. The directory is capped at `max_bytes`; file mtimes record use,
+    and the least recently used files are deleted when the cap is exceeded.
+    """
+
+    def __init__(self, max_entries: int = PDF_CACHE_MAX_ENTRIES, directory: str = PDF_CACHE_DIR,
+                 max_bytes: int = PDF_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.directory = directory or None
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(digest: str, max_chars: int = None) -> str:
+        return f"{digest}-{'full' if max_chars is None else max_chars}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def _remember(self, key: str, text: str):
+        with self._lock:
+            self._memory[key] = text
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str):
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return text
+        if self.directory:
+            path = self._path(key)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    text = f.read()
+                os.utime(path)
+            except OSError:
+                text = None
+            if text is not None:
+                self._remember(key, text)
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                return text
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key: str, text: str):
+        self._remember(key, text)
+        if not self.directory or len(text.encode("utf-8")) > self.max_bytes:
+            return
+        # Write to a temp file and rename so readers never see partial text
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, self._path(key))
+        self._evict_disk()
+
+    def _evict_disk(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".txt"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.directory:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".txt"):
+                    os.remove(entry.path)
+
+
+pdf_cache = PDFTextCache()
+
+
+def read_bytes(source) -> bytes:
+    """Whole content of a seekable binary file object, restoring its position."""
+    position = source.tell()
+    source.seek(0)
+    data = source.read()
+    source.seek(position)
+    return data
+
+
+def cached_extract_text(source, max_chars: int = None, cache: PDFTextCache = None) -> str:
+    """
+    extract_text() memoised by file content, so reruns and re-uploads skip parsing.
+    Whole documents (max_chars=None) are extracted in the process pool.
+    """
+    cache = cache or pdf_cache
+    key = cache.key(content_hash(source), max_chars)
+    text = cache.get(key)
+    if text is None:
+        if max_chars is None:
+            text = extract_text_parallel(read_bytes(source))
+        else:
+            text = extract_text(source, max_chars=max_chars)
+        cache.put(key, text)
+    return text
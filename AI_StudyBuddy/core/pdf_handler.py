@@ -1,12 +1,78 @@
 # core/pdf_handler.py
 #Handles PDF upload and text extraction.
-import pdfplumber
 import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from PyPDF2 import PdfReader
+
+# Pages per task when a whole document is extracted in the process pool
+PAGES_PER_TASK = 8
+
+
+def iter_pdf_pages(source):
+    """
+    Yield the text of each page in order, extracting lazily.
+    `source` is a path or a binary file object (e.g. a Streamlit upload);
+    file objects are read in place, without copying them into memory first.
+    """
+    reader = PdfReader(source)
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+
+def extract_text(source, max_chars: int = None) -> str:
+    """
+    Extract text from a PDF, stopping after the first page that brings the
+    total to `max_chars` (the result is cut to exactly `max_chars`).
+    """
+    parts, total = [], 0
+    for text in iter_pdf_pages(source):
+        parts.append(text)
+        total += len(text)
+        if max_chars is not None and total >= max_chars:
+            break
+    text = "".join(parts)
+    return text[:max_chars] if max_chars is not None else text
+
+
+def _extract_page_range(data: bytes, start: int, stop: int) -> list:
+    """Process-pool worker: text of pages [start, stop)."""
+    reader = PdfReader(io.BytesIO(data))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def iter_pdf_pages_parallel(data: bytes, workers: int = None, pages_per_task: int = PAGES_PER_TASK):
+    """
+    Yield page texts in order while page ranges are extracted in a process
+    pool. Meant for full-document jobs on long PDFs; for previews use
+    extract_text(max_chars=...) which stops early instead.
+    """
+    page_count = len(PdfReader(io.BytesIO(data)).pages)
+    ranges = [(start, min(start + pages_per_task, page_count))
+              for start in range(0, page_count, pages_per_task)]
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+    if workers <= 1:
+        yield from iter_pdf_pages(io.BytesIO(data))
+        return
+    starts, stops = zip(*ranges)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for texts in pool.map(_extract_page_range, repeat(data, len(ranges)), starts, stops):
+            yield from texts
+
+
+def extract_text_parallel(data: bytes, workers: int = None) -> str:
+    """Full-document extraction using iter_pdf_pages_parallel."""
+    return "".join(iter_pdf_pages_parallel(data, workers))
+
 
 def extract_text_from_pdf(uploaded_file):
     """Extract raw text from uploaded PDF file."""
-    text = ""
-    with pdfplumber.open(io.BytesIO(uploaded_file.read())) as pdf:
-        for page in pdf.pages:
-            text += page.extract_text() or ""
+    # pdfplumber is optional (not in requirements.txt); PyPDF2 covers the app
+    import pdfplumber
+
+    # pdfplumber accepts the upload's file object directly; no BytesIO copy
+    with pdfplumber.open(uploaded_file) as pdf:
+        text = "".join(page.extract_text() or "" for page in pdf.pages)
     return text.strip()
@@ -1,13 +1,90 @@
-from utils.gemini_helper import generate_response
+import os
 
-def generate_quiz(text: str) -> str:
-    """Generate quiz questions or flashcards from a topic or passage."""
-    prompt = f"""
+from core.answer_cache import answer_cache
+from utils.gemini_helper import deltas, generate_response, stream_response
+from utils.prompts import prompts, register
+from utils.structured_output import STRUCTURED_RETRIES, JsonArrayItems, compile_validator, extract_json_object
+
+# "structured" asks for schema-validated JSON questions; "text" for free Markdown
+QUIZ_OUTPUT = os.getenv("QUIZ_OUTPUT", "structured").lower()
+QUIZ_QUESTIONS = int(os.getenv("QUIZ_QUESTIONS", 5))
+
+QUESTION_TYPES = {
+    "multiple_choice": "Multiple Choice",
+    "true_false": "True/False",
+    "fill_in_the_blank": "Fill in the Blanks",
+    "descriptive": "Descriptive",
+}
+
+_TEXT = {"type": "string", "minLength": 1}
+QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "type": {"type": "string", "enum": list(QUESTION_TYPES)},
+        "question": _TEXT,
+        "options": {"type": "array", "items": _TEXT,
+                    "description": "Exactly 4 options (A-D) for multiple_choice, otherwise empty"},
+        "answer": dict(_TEXT, description="The option letter, True/False, the missing word(s) or a model answer"),
+        "explanation": {"type": "string"},
+    },
+    "required": ["type", "question", "answer"],
+}
+QUIZ_SCHEMA = {
+    "type": "object",
+    "properties": {"questions": {"type": "array", "items": QUESTION_SCHEMA}},
+    "required": ["questions"],
+}
+
+_validate_question = compile_validator(QUESTION_SCHEMA)
+
+
+def question_problems(item) -> list:
+    """Schema problems plus the rules a schema cannot express; empty when usable."""
+    problems = _validate_question(item)
+    if problems:
+        return problems
+    answer = item["answer"].strip()
+    if item["type"] == "multiple_choice":
+        if len(item.get("options") or []) != 4:
+            problems.append("multiple_choice needs 4 options")
+        if answer.upper() not in ("A", "B", "C", "D"):
+            problems.append(f"answer {answer!r} is not an option letter")
+    elif item["type"] == "true_false" and answer.lower() not in ("true", "false"):
+        problems.append(f"answer {answer!r} is not True/False")
+    return problems
+
+
+QUESTIONS_PROMPT = register("quizzer.questions", """
 You are a Study Assistant that creates quizzes for learning.
+[Recent chat for context:]
+{previous_context}
 
-If the input is a topic name (e.g., "DBMS", "Machine Learning"), 
+If the input is a topic name (e.g., "DBMS", "Machine Learning"),
 create questions on that topic.
 If it's a text passage, generate questions from the given content.
+If it refers to the chat (e.g., "quiz me on that"), use the recent chat.
+Create exactly {count} questions, mixing these types:
+- multiple_choice: 4 options (A-D); the answer is the correct letter
+- true_false: the answer is True or False
+- fill_in_the_blank: mark the blank with ____; the answer is the missing word(s)
+- descriptive: the answer is a short model answer
+Content: {text}
+""")
+
+REPEATS_PROMPT = register("quizzer.repeats", """
+Do not repeat these questions:
+{questions}
+""")
+
+QUIZ_PROMPT = register("quizzer.text", """
+You are a Study Assistant that creates quizzes for learning.
+[Recent chat for context:]
+{previous_context}
+
+If the input is a topic name (e.g., "DBMS", "Machine Learning"),
+create questions on that topic.
+If it's a text passage, generate questions from the given content.
+If it refers to the chat (e.g., "quiz me on that"), use the recent chat.
 Each question should include 4 options (A-D) and the correct answer below.
 The types of questions can be:
 - Multiple Choice
@@ -15,5 +92,117 @@ The types of questions can be:
 - Fill in the Blanks
 - Descriptive
 Content: {text}
-"""
-    return generate_response(prompt.strip())
+""")
+
+
+def _quiz_prompt(text: str, count: int, existing: list, previous_context: str = "") -> str:
+    prompt = QUESTIONS_PROMPT.render(previous_context=previous_context, count=count, text=text)
+    if existing:
+        asked = "\n".join(f"- {item['question']}" for item in existing)
+        prompt += "\n\n" + REPEATS_PROMPT.render(questions=asked)
+    return prompt
+
+
+def generate_quiz_questions(text: str, count: int = QUIZ_QUESTIONS, previous_context: str = "") -> list:
+    """
+    Up to `count` validated question dicts (see QUESTION_SCHEMA). Invalid
+    questions are dropped and only the missing number is requested again,
+    STRUCTURED_RETRIES times at most.
+    """
+    questions = []
+    for _ in range(STRUCTURED_RETRIES + 1):
+        needed = count - len(questions)
+        if needed <= 0:
+            break
+        prompt = _quiz_prompt(text, needed, questions, previous_context)
+        response = generate_response(prompt, mode="quizzer", schema=QUIZ_SCHEMA)
+        if response.startswith(("❌", "⚠️")):
+            break  # the API call failed; retrying would fail the same way
+        data = extract_json_object(response) or {}
+        items = data.get("questions")
+        if not isinstance(items, list):
+            continue
+        questions.extend([item for item in items if not question_problems(item)][:needed])
+    return questions
+
+
+QUESTION_SEPARATOR = "\n\n---\n\n"
+
+
+def format_question(number: int, item: dict) -> str:
+    """Markdown for one question and its answer."""
+    lines = [f"**Question {number}** ({QUESTION_TYPES[item['type']]})", item["question"].strip()]
+    answer = item["answer"].strip()
+    if item["type"] == "multiple_choice":
+        lines.append("")
+        lines.extend(f"{letter}. {option.strip()}" for letter, option in zip("ABCD", item["options"]))
+        answer = answer.upper()
+    elif item["type"] == "true_false":
+        answer = answer.capitalize()
+    explanation = (item.get("explanation") or "").strip()
+    lines.append("")
+    lines.append(f"✅ **Answer:** {answer}" + (f" — {explanation}" if explanation else ""))
+    return "\n".join(lines)
+
+
+def format_quiz(questions: list) -> str:
+    """Markdown for the chat window."""
+    return QUESTION_SEPARATOR.join(format_question(number, item) for number, item in enumerate(questions, 1))
+
+
+def stream_quiz(text: str, previous_context: str = "", count: int = QUIZ_QUESTIONS):
+    """
+    generate_quiz() as text deltas: each question is shown as soon as its
+    JSON object has streamed in and validated. Retries and the free-text
+    fallback work as in generate_quiz_questions() and generate_quiz().
+    """
+    questions = []
+    for _ in range(STRUCTURED_RETRIES + 1):
+        needed = count - len(questions)
+        if needed <= 0:
+            break
+        reader = JsonArrayItems()
+        prompt = _quiz_prompt(text, needed, questions, previous_context)
+        for delta in stream_response(prompt, mode="quizzer", schema=QUIZ_SCHEMA):
+            if delta.lstrip().startswith(("❌", "⚠️")):
+                if questions:
+                    return  # keep the questions already shown
+                yield delta
+                return
+            for item in reader.feed(delta):
+                if len(questions) < count and not question_problems(item):
+                    questions.append(item)
+                    yield (QUESTION_SEPARATOR if len(questions) > 1 else "") + format_question(len(questions), item)
+    if not questions:
+        yield from stream_response(QUIZ_PROMPT.render(previous_context=previous_context, text=text), mode="quizzer")
+
+
+def _generate_quiz(text: str, previous_context: str, stream: bool):
+    if stream:
+        if QUIZ_OUTPUT == "structured":
+            return stream_quiz(text, previous_context)
+        return stream_response(QUIZ_PROMPT.render(previous_context=previous_context, text=text), mode="quizzer")
+    if QUIZ_OUTPUT == "structured":
+        questions = generate_quiz_questions(text, previous_context=previous_context)
+        if questions:
+            return format_quiz(questions)
+    return generate_response(QUIZ_PROMPT.render(previous_context=previous_context, text=text), mode="quizzer")
+
+
+def generate_quiz(text: str, previous_context: str = "", stream: bool = False):
+    """
+    Generate quiz questions or flashcards from a topic or passage, considering previous context.
+    With `stream`, returns a generator of text deltas instead of the full text.
+    Near-identical requests in a similar context are answered from answer_cache.
+    """
+    namespace = (f"quizzer:{prompts.version(QUESTIONS_PROMPT.name, REPEATS_PROMPT.name, QUIZ_PROMPT.name)}"
+                 f":{QUIZ_OUTPUT}:{QUIZ_QUESTIONS}")
+    cached = answer_cache.get("quizzer", namespace, text, previous_context)
+    if cached is not None:
+        return deltas(cached) if stream else cached
+    if stream:
+        return answer_cache.remember(_generate_quiz(text, previous_context, True), "quizzer", namespace, text,
+                                     previous_context)
+    quiz = _generate_quiz(text, previous_context, False)
+    answer_cache.put("quizzer", namespace, text, previous_context, quiz)
+    return quiz
@@ -0,0 +1,214 @@
+# core/retrieval.py
+# Per-document BM25 index used to pick the chunks a follow-up question needs.
+import hashlib
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+from core.summarizer import chunk_text
+
+load_dotenv()
+
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", 250))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 4))
+# Built indexes are saved here as .npz files (the directory is created on the
+# first save); empty keeps them in memory only. The default is next to the
+# app, not under whatever directory Streamlit was started from.
+RETRIEVAL_INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "retrieval"))
+RETRIEVAL_MEMORY_ENTRIES = int(os.getenv("RETRIEVAL_MEMORY_ENTRIES", 16))
+# Saved indexes are capped at this many bytes; file mtimes record use and the
+# least recently used are deleted first
+RETRIEVAL_INDEX_MAX_BYTES = int(os.getenv("RETRIEVAL_INDEX_MAX_BYTES", 200 * 1024 * 1024))
+
+# Bump when chunking or tokenization changes so saved indexes are rebuilt
+INDEX_VERSION = "1"
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was were what "
+    "when where which who why will with does do can explain".split()
+)
+
+
+def tokenize(text: str) -> list:
+    return [word for word in _WORD.findall(text.lower()) if word not in _STOPWORDS and len(word) > 1]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a document's chunks.
+
+    Postings are stored per term as contiguous slices of two flat arrays
+    (chunk ids and term frequencies), so scoring a query is a handful of
+    vectorised NumPy operations regardless of document length.
+    """
+
+    def __init__(self, chunks, vocab, offsets, doc_ids, freqs, lengths, k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.freqs = freqs
+        self.lengths = lengths
+        self.k1 = k1
+        self.b = b
+        self._term_ids = {term: i for i, term in enumerate(vocab)}
+        n = len(chunks)
+        df = np.diff(offsets)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        avg = lengths.mean() if n else 1.0
+        self._norm = k1 * (1 - b + b * lengths / max(avg, 1e-9))
+
+    @classmethod
+    def build(cls, text: str, chunk_tokens: int = RETRIEVAL_CHUNK_TOKENS) -> "BM25Index":
+        chunks = chunk_text(text, chunk_tokens)
+        postings = {}
+        lengths = np.zeros(len(chunks), dtype=np.float32)
+        for chunk_id, chunk in enumerate(chunks):
+            words = tokenize(chunk)
+            lengths[chunk_id] = len(words)
+            for term, count in Counter(words).items():
+                postings.setdefault(term, []).append((chunk_id, count))
+        vocab = sorted(postings)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in vocab])
+        pairs = [pair for term in vocab for pair in postings[term]]
+        doc_ids = np.array([chunk_id for chunk_id, _ in pairs], dtype=np.int32)
+        freqs = np.array([count for _, count in pairs], dtype=np.float32)
+        return cls(chunks, vocab, offsets, doc_ids, freqs, lengths)
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+            ids, tf = self.doc_ids[start:stop], self.freqs[start:stop]
+            # Each chunk appears at most once per term, so fancy-index += is safe
+            scores[ids] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self._norm[ids])
+        return scores
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> list:
+        """The `k` best-matching chunks, in document order (first chunks if nothing matches)."""
+        if not self.chunks:
+            return []
+        scores = self.scores(query)
+        k = min(k, len(self.chunks))
+        if not scores.any():
+            return self.chunks[:k]
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[scores[best] > 0]
+        return [self.chunks[i] for i in np.sort(best)]
+
+    def save(self, path: str):
+        encoded = [chunk.encode("utf-8") for chunk in self.chunks]
+        chunk_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        chunk_offsets[1:] = np.cumsum([len(chunk) for chunk in encoded])
+        tmp = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp,
+            chunk_bytes=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            chunk_offsets=chunk_offsets,
+            vocab=np.array(self.vocab, dtype=str),
+            offsets=self.offsets, doc_ids=self.doc_ids, freqs=self.freqs, lengths=self.lengths,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            raw = data["chunk_bytes"].tobytes()
+            bounds = data["chunk_offsets"]
+            chunks = [raw[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+            return cls(chunks, data["vocab"].tolist(), data["offsets"], data["doc_ids"],
+                       data["freqs"], data["lengths"])
+
+
+class IndexStore:
+    """
+    Indexes keyed by document content hash: an LRU in memory over .npz
+    files on disk, which are capped at `max_bytes` like core.pdf_cache.
+    """
+
+    def __init__(self, directory: str = RETRIEVAL_INDEX_DIR, max_entries: int = RETRIEVAL_MEMORY_ENTRIES,
+                 max_bytes: int = RETRIEVAL_INDEX_MAX_BYTES):
+        self.directory = directory or None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"evictions": 0}
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(f"{INDEX_VERSION}:{RETRIEVAL_CHUNK_TOKENS}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> BM25Index:
+        """The index for `text`, loading or building (and saving) it on first use."""
+        key = self.key(text)
+        with self._lock:
+            index = self._memory.get(key)
+            if index is not None:
+                self._memory.move_to_end(key)
+                return index
+        path = os.path.join(self.directory, f"{key}.npz") if self.directory else None
+        index = None
+        if path and os.path.exists(path):
+            try:
+                index = BM25Index.load(path)
+                os.utime(path)
+            except (OSError, ValueError, KeyError):
+                index = None
+        if index is None:
+            index = BM25Index.build(text)
+            if path:
+                try:
+                    os.makedirs(self.directory, exist_ok=True)
+                    index.save(path)
+                    self._evict_disk()
+                except OSError:
+                    pass  # an unwritable directory only costs a rebuild next time
+        with self._lock:
+            self._memory[key] = index
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        return index
+
+
+    def _evict_disk(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            # Skip saves in progress (<key>.npz.tmp.npz)
+            if entry.name.endswith(".npz") and ".tmp" not in entry.name:
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.stats["evictions"] += 1
+
+
+index_store = IndexStore()
+
+
+def build_index(text: str) -> BM25Index:
+    """Build (or load) the index for an uploaded document."""
+    return index_store.get(text)
+
+
+def relevant_context(text: str, query: str, k: int = RETRIEVAL_TOP_K) -> str:
+    """The top-`k` chunks of `text` for `query`, joined for use in a prompt."""
+    return "\n\n---\n\n".join(index_store.get(text).search(query, k))
@@ -1,21 +1,139 @@
-from utils.gemini_helper import generate_response
+import hashlib
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def summarize_text(text: str, previous_context: str = "", user_focus: str = "", extra_instruction: str = "") -> str:
+from core.answer_cache import answer_cache
+from utils.gemini_helper import deltas, generate_response, stream_response
+from utils.llm_scheduler import estimate_tokens
+from utils.prompts import prompts, register
+from utils.token_budget import CHAT_HISTORY_TOKENS, truncate_to_tokens
+
+# Texts up to this size are summarized in a single prompt
+DIRECT_SUMMARY_TOKENS = int(os.getenv("SUMMARY_DIRECT_TOKENS", 6000))
+# Target size of each chunk (and of each group of notes in the reduce step)
+CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 3000))
+# Chunk summaries generated in parallel; the scheduler still enforces RPM/TPM
+SUMMARY_MAX_WORKERS = int(os.getenv("SUMMARY_MAX_WORKERS", 4))
+SUMMARY_CACHE_ENTRIES = int(os.getenv("SUMMARY_CACHE_ENTRIES", 2048))
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+_JOIN_TOKENS = estimate_tokens("\n\n")
+
+
+def _split_units(text: str, max_tokens: int) -> list:
+    """Paragraphs, with oversized ones split into sentences (and hard-cut if still too big)."""
+    units = []
+    max_chars = max_tokens * 4
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            units.append(paragraph)
+            continue
+        for sentence in _SENTENCE_BREAK.split(paragraph):
+            units.extend(sentence[i:i + max_chars] for i in range(0, len(sentence), max_chars))
+    return units
+
+
+def _is_boundary(unit: str) -> bool:
+    # Content-defined cut points: about one unit in four may end a chunk
+    return zlib.crc32(unit.encode("utf-8")) % 4 == 0
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS) -> list:
     """
-    Summarize study materials, aligning output for exam preparation if requested.
+    Split text into chunks of at most `max_tokens` (estimated) tokens.
 
-    Notes:
-    - Keeps backwards compatibility with existing callers that pass `previous_context` or `user_focus`.
-    - `extra_instruction` (preferred) or `user_focus` will be used to adapt the output.
+    Chunks end at paragraph/sentence boundaries chosen by their content once
+    a chunk is at least half full, so an edit only changes the chunks around
+    it; later chunks re-align with the previous split and keep their cache keys.
     """
-    # Short-text guard
-    if not text or len(text.strip()) < 50:
-        return "⚠️ This text is too short to summarize. Please provide longer content."
+    chunks, current, size = [], [], 0
+    for unit in _split_units(text, max_tokens):
+        # Units are joined with a blank line, which counts too (a token per newline)
+        tokens = estimate_tokens(unit) + (_JOIN_TOKENS if current else 0)
+        if current and size + tokens > max_tokens:
+            tokens -= _JOIN_TOKENS
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(unit)
+        size += tokens
+        if size >= max_tokens // 2 and _is_boundary(unit):
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
 
-    # Prefer extra_instruction, fall back to user_focus (keeps compatibility)
-    instruction = extra_instruction.strip() if extra_instruction else user_focus.strip()
 
-    prompt = f"""
+class SummaryCache:
+    """Thread-safe LRU of generated notes keyed by a hash of prompt inputs."""
+
+    def __init__(self, max_entries: int = SUMMARY_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(b"\0" + part.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def put(self, key: str, value: str):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+summary_cache = SummaryCache()
+
+
+def _is_failure(response: str) -> bool:
+    # generate_response reports errors as text instead of raising
+    return response.startswith(("❌", "⚠️"))
+
+
+CHUNK_PROMPT = register("summarizer.chunk", """
+You are Study Buddy. Write dense bullet-point study notes for the section below.
+Keep every definition, key point, formula and example; do not add an introduction.
+{focus}
+
+Section:
+{text}
+""")
+
+MERGE_PROMPT = register("summarizer.merge", """
+You are Study Buddy. The notes below cover consecutive sections of one document.
+Merge them into a single set of bullet-point notes: remove repetition, keep the
+document's order, and keep every definition, formula and example.
+{focus}
+
+Notes:
+{text}
+""")
+
+SUMMARY_PROMPT = register("summarizer.summary", """
 You are Study Buddy, an academic summary AI.
 
 - If text is VERY short (<50 words), say: "This text is too short to summarize. Please provide longer content."
@@ -34,6 +152,131 @@ Reference prior chat context if relevant:
 
 Content:
 {text}
-"""
-    return generate_response(prompt.strip())
-# ...existing code...
\ No newline at end of file
+""")
+
+
+def _cached_generate(template, text: str, instruction: str) -> str:
+    # The template version is part of the key, so editing a prompt retires its cached notes
+    key = summary_cache.key(template.name, template.version, instruction, text)
+    notes = summary_cache.get(key)
+    if notes is None:
+        focus = f"Pay special attention to: {instruction}" if instruction else ""
+        notes = generate_response(template.render(focus=focus, text=text), mode="summarizer")
+        if not _is_failure(notes):
+            summary_cache.put(key, notes)
+    return notes
+
+
+def summarize_chunk(chunk: str, instruction: str = "") -> str:
+    """Map step: faithful bullet notes for one chunk, cached by content."""
+    return _cached_generate(CHUNK_PROMPT, chunk, instruction)
+
+
+def merge_notes(notes: str, instruction: str = "") -> str:
+    """Reduce step: combine consecutive sections' notes into one set, cached by content."""
+    return _cached_generate(MERGE_PROMPT, notes, instruction)
+
+
+def _parallel_map(fn, items: list, instruction: str, on_progress=None) -> list:
+    results = [None] * len(items)
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(SUMMARY_MAX_WORKERS, len(items)))) as pool:
+        futures = {pool.submit(fn, item, instruction): i for i, item in enumerate(items)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            done += 1
+            if on_progress:
+                on_progress(done, len(items))
+    return results
+
+
+def reduce_notes(notes: list, instruction: str = "", max_tokens: int = CHUNK_TOKENS) -> str:
+    """
+    Merge notes level by level, in groups that fit `max_tokens`, until one
+    group fits. A group whose merge fails keeps its notes for the next level;
+    if no group of a level merges, the merge error is returned.
+    """
+    notes = [n for n in notes if not _is_failure(n)]
+    while sum(estimate_tokens(n) for n in notes) > max_tokens and len(notes) > 1:
+        groups, current, size = [], [], 0
+        for note in notes:
+            tokens = estimate_tokens(note)
+            if current and size + tokens > max_tokens:
+                groups.append(current)
+                current, size = [], 0
+            current.append(note)
+            size += tokens
+        groups.append(current)
+        if len(groups) == len(notes):
+            # Every note is already a group of its own; merging pairs keeps the tree shrinking
+            groups = [notes[i:i + 2] for i in range(0, len(notes), 2)]
+        merged = _parallel_map(merge_notes, ["\n\n".join(group) for group in groups], instruction)
+        reduced = []
+        for group, result in zip(groups, merged):
+            reduced.extend(group if _is_failure(result) else [result])
+        if len(reduced) == len(notes):
+            # Nothing shrank: another level would only repeat the failed merges
+            return next(n for n in merged if _is_failure(n))
+        notes = reduced
+    return "\n\n".join(notes)
+
+
+def condense_text(text: str, instruction: str = "", on_progress=None) -> str:
+    """
+    Map-reduce a long text into notes that fit one prompt: chunk, summarize
+    chunks in parallel, then merge hierarchically. Short texts pass through.
+    A chunk whose summary fails goes into the merge as it is; an error
+    message is returned only if every chunk, or the merge, fails.
+    """
+    if estimate_tokens(text) <= DIRECT_SUMMARY_TOKENS:
+        return text
+    chunks = chunk_text(text)
+    notes = _parallel_map(summarize_chunk, chunks, instruction, on_progress)
+    if all(_is_failure(n) for n in notes):
+        return notes[0]
+    return reduce_notes([chunk if _is_failure(note) else note for chunk, note in zip(chunks, notes)], instruction)
+
+
+def summarize_text(text: str, previous_context: str = "", user_focus: str = "", extra_instruction: str = "",
+                   on_progress=None, stream: bool = False):
+    """
+    Summarize study materials, aligning output for exam preparation if requested.
+
+    Notes:
+    - Keeps backwards compatibility with existing callers that pass `previous_context` or `user_focus`.
+    - `extra_instruction` (preferred) or `user_focus` will be used to adapt the output.
+    - Texts longer than DIRECT_SUMMARY_TOKENS are condensed with condense_text() first;
+      `on_progress(done, total)` is called as chunk summaries finish.
+    - With `stream`, returns a generator of text deltas of the final summary
+      (condensing still happens before this returns).
+    - Repeated requests in a similar context are answered from answer_cache
+      before any condensing; long texts only match exactly.
+    """
+    # Short-text guard
+    if not text or len(text.strip()) < 50:
+        message = "⚠️ This text is too short to summarize. Please provide longer content."
+        return deltas(message) if stream else message
+
+    # Prefer extra_instruction, fall back to user_focus (keeps compatibility)
+    instruction = extra_instruction.strip() if extra_instruction else user_focus.strip()
+
+    # condense_text bounds the document; chat context gets the history budget
+    previous_context = truncate_to_tokens(previous_context, CHAT_HISTORY_TOKENS)
+    namespace = f"summarizer:{prompts.version(CHUNK_PROMPT.name, MERGE_PROMPT.name, SUMMARY_PROMPT.name)}"
+    cached = answer_cache.get("summarizer", namespace, text, previous_context, exact=instruction)
+    if cached is not None:
+        return deltas(cached) if stream else cached
+    source = text
+
+    text = condense_text(text, instruction, on_progress)
+    if _is_failure(text):
+        return deltas(text) if stream else text
+
+    prompt = SUMMARY_PROMPT.render(instruction=instruction, previous_context=previous_context, text=text)
+    if stream:
+        return answer_cache.remember(stream_response(prompt, mode="summarizer"), "summarizer", namespace, source,
+                                     previous_context, exact=instruction)
+    summary = generate_response(prompt, mode="summarizer")
+    answer_cache.put("summarizer", namespace, source, previous_context, summary, exact=instruction)
+    return summary
+# ...existing code...
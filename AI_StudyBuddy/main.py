@@ -1,11 +1,19 @@
 import streamlit as st
 from components.sidebar import sidebar_ui
-from components.chat_ui import chat_ui
+from components.chat_ui import chat_ui, get_chat_history, render_history, write_stream
 from components.pdf_handler import handle_pdf_upload
 from core.summarizer import summarize_text
+from core.retrieval import build_index, relevant_context
+from utils.gemini_helper import warm_up
 
 st.set_page_config(page_title="StudyBuddy", page_icon="🧠", layout="wide")
 
+# Create the shared Gemini clients once per process (no-op on reruns)
+try:
+    warm_up()
+except ValueError as e:
+    st.warning(str(e))
+
 # Initialize session state for PDF context
 if "pdf_content" not in st.session_state:
     st.session_state.pdf_content = None
@@ -26,6 +34,8 @@ pdf_text, user_focus, summarize_clicked = handle_pdf_upload()
 if summarize_clicked and pdf_text:
     st.session_state.pdf_content = pdf_text
     st.session_state.user_focus = user_focus
+    # Index the document now so follow-ups only send the relevant chunks
+    build_index(pdf_text)
     st.divider()
     st.success("✅ PDF loaded! Starting summary chat...")
 
@@ -37,39 +47,37 @@ def chat_ui_with_pdf_context(selected_mode, pdf_text, user_focus):
     """Chat UI specifically for Summarizer with PDF context."""
     st.subheader(f"💬 StudyBuddy Chat — Mode: {selected_mode}")
     
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
-    
-    # Display chat history
-    for msg in st.session_state.messages:
-        with st.chat_message(msg["role"]):
-            st.markdown(msg["content"])
+    history = get_chat_history()
+    render_history(history)
     
     # Initial summary generation
-    if len(st.session_state.messages) == 0:
+    if not history:
         with st.chat_message("assistant"):
             with st.spinner("💡 Generating summary from your PDF..."):
-                initial_summary = summarize_text(pdf_text, user_focus=user_focus)
-                st.markdown(initial_summary)
-                st.code(initial_summary, language="markdown")
+                progress = st.empty()
+                stream = summarize_text(
+                    pdf_text, user_focus=user_focus, stream=True,
+                    on_progress=lambda done, total: progress.progress(done / total, f"Summarized {done}/{total} sections")
+                )
+                progress.empty()
+            initial_summary = write_stream(stream, "💡 Writing the summary...")
             
-            st.session_state.messages.append({"role": "assistant", "content": initial_summary})
+            history.append("assistant", initial_summary)
     
     # Follow-up questions
     prompt = st.chat_input("Ask follow-up questions about the summary...")
     
     if prompt:
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        history.append("user", prompt)
         with st.chat_message("user"):
             st.markdown(prompt)
         
         with st.chat_message("assistant"):
-            with st.spinner("💡 Study Buddy is thinking…"):
-                response = summarize_text(f"{prompt}\n\nBased on: {pdf_text[:1000]}", user_focus=user_focus)
-                st.markdown(response)
-                st.code(response, language="markdown")
+            # Only the chunks of the document that match the question
+            excerpts = relevant_context(pdf_text, prompt)
+            response = write_stream(summarize_text(f"{prompt}\n\nBased on: {excerpts}", user_focus=user_focus, stream=True))
             
-            st.session_state.messages.append({"role": "assistant", "content": response})
+            history.append("assistant", response)
 
 # Pass PDF context to chat UI if available
 if st.session_state.pdf_content and selected_mode == "Summarizer":
@@ -0,0 +1,136 @@
+"""
+Conversation store for the chat UIs.
+
+Turns are slotted records whose context line ("Role: text", cut to
+CHAT_TURN_TOKENS) and token count are computed once, on append. The model
+gets a window of recent turns within CHAT_HISTORY_TOKENS; turns that fall
+out of the window are folded, one at a time, into a rolling summary of what
+the user asked about (bounded by CHAT_SUMMARY_TOKENS, oldest topics dropped
+first). Nothing already folded or counted is revisited, so building the
+context costs the same on turn 500 as on turn 5. Rendering pages through
+the records newest-first instead of drawing every turn on every rerun.
+"""
+import os
+import time
+from collections import deque
+
+from dotenv import load_dotenv
+
+from utils.token_budget import CHAT_HISTORY_TOKENS, CHAT_TURN_TOKENS, count_tokens, truncate_to_tokens
+
+load_dotenv()
+
+# Part of CHAT_HISTORY_TOKENS reserved for the summary of older turns
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", 200))
+# Messages drawn per page of chat history
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", 20))
+
+SUMMARY_PREFIX = "Earlier in this chat the user asked about: "
+_TOPIC_TOKENS = 20
+
+
+class Message:
+    """One chat turn."""
+
+    __slots__ = ("role", "content", "line", "tokens", "created")
+
+    def __init__(self, role: str, content: str, turn_tokens: int = CHAT_TURN_TOKENS):
+        self.role = role
+        self.content = content
+        self.line = f"{role.capitalize()}: {truncate_to_tokens(content, turn_tokens)}"
+        self.tokens = count_tokens(self.line) + 1  # and the newline joining it
+        self.created = time.time()
+
+    def as_dict(self) -> dict:
+        return {"role": self.role, "content": self.content}
+
+
+class ChatHistory:
+    """
+    Append-only chat log with an incrementally maintained model context.
+
+    context() is the rolling summary followed by the recent window, oldest
+    first. The window holds the newest turns that fit `max_tokens` minus the
+    summary reserve; append() folds whatever no longer fits into the summary.
+    """
+
+    def __init__(self, max_tokens: int = CHAT_HISTORY_TOKENS, summary_tokens: int = CHAT_SUMMARY_TOKENS,
+                 turn_tokens: int = CHAT_TURN_TOKENS):
+        self.max_tokens = max_tokens
+        self.summary_tokens = min(summary_tokens, max_tokens)
+        self.turn_tokens = turn_tokens
+        self.messages = []
+        self._window = deque()  # recent messages sent verbatim
+        self._window_tokens = 0
+        self._topics = deque()  # (topic, tokens) of folded user turns
+        self._topic_tokens = 0
+        self.folded = 0  # messages folded into the summary
+        self.dropped_topics = 0  # topics evicted from the summary to keep it in budget
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __bool__(self) -> bool:
+        return bool(self.messages)
+
+    def append(self, role: str, content: str) -> Message:
+        message = Message(role, content, self.turn_tokens)
+        self.messages.append(message)
+        self._window.append(message)
+        self._window_tokens += message.tokens
+        budget = self.max_tokens - (self.summary_tokens if self._topics or self._window_tokens > self.max_tokens else 0)
+        # Keep the newest turn even when it alone is over budget (it is already cut to turn_tokens)
+        while self._window_tokens > budget and len(self._window) > 1:
+            self._fold(self._window.popleft())
+            budget = self.max_tokens - self.summary_tokens
+        return message
+
+    def _fold(self, message: Message):
+        self._window_tokens -= message.tokens
+        self.folded += 1
+        if message.role != "user":
+            return
+        topic = truncate_to_tokens(" ".join(message.content.split()), _TOPIC_TOKENS)
+        tokens = count_tokens(topic) + 1  # and the "; " separator
+        self._topics.append((topic, tokens))
+        self._topic_tokens += tokens
+        limit = self.summary_tokens - count_tokens(SUMMARY_PREFIX)
+        while self._topic_tokens > limit and len(self._topics) > 1:
+            self._topic_tokens -= self._topics.popleft()[1]
+            self.dropped_topics += 1
+
+    @property
+    def summary(self) -> str:
+        """One line naming the topics of the folded user turns ("" before anything is folded)."""
+        if not self._topics:
+            return ""
+        return SUMMARY_PREFIX + "; ".join(topic for topic, _ in self._topics)
+
+    def context(self) -> str:
+        """The text given to the model as previous context."""
+        lines = [message.line for message in self._window]
+        summary = self.summary
+        if summary:
+            lines.insert(0, summary)
+        return "\n".join(lines)
+
+    def page(self, number: int = 0, size: int = CHAT_PAGE_SIZE) -> list:
+        """Page `number` of the messages, counted back from the newest (page 0), oldest first."""
+        end = len(self.messages) - number * size
+        return self.messages[max(0, end - size):max(0, end)]
+
+    def pages(self, size: int = CHAT_PAGE_SIZE) -> int:
+        return -(-len(self.messages) // size)
+
+    def snapshot(self) -> dict:
+        return {
+            "messages": len(self.messages),
+            "window_messages": len(self._window),
+            "window_tokens": self._window_tokens,
+            "folded": self.folded,
+            "summary_topics": len(self._topics),
+            "dropped_topics": self.dropped_topics,
+        }
@@ -1,24 +1,179 @@
-import google.generativeai as genai
 import os
+import threading
+import time
 from dotenv import load_dotenv
+from core.ai_utils import LLM_PROVIDERS, create_router
+from utils.llm_scheduler import get_scheduler
+from utils.structured_output import SUPPORTS_RESPONSE_SCHEMA, json_generation_config, schema_instructions
+from utils.token_budget import ledger, response_tokens
 
-# Load API Key
 load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
-    raise ValueError("❌ Gemini API key not found in .env file!")
+# Generation settings per core function; unknown modes use "default"
+GENERATION_CONFIGS = {
+    "default": {"temperature": 0.7, "max_output_tokens": 2048},
+    "explainer": {"temperature": 0.4, "max_output_tokens": 2048},
+    "summarizer": {"temperature": 0.3, "max_output_tokens": 2048},
+    "quizzer": {"temperature": 0.8, "max_output_tokens": 2048},
+}
 
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
 
-MODEL = "models/gemini-2.5-flash"
+class ModelRegistry:
+    """
+    The process-wide LLM router (see core.ai_utils), created lazily.
 
-def generate_response(prompt: str) -> str:
-    """Generate response from Gemini model."""
+    Nothing touches API keys or the network until the first get()/warm_up(),
+    so importing this module never fails. Timings for client creation
+    (cold start) and model calls are kept for measurement.
+    """
+
+    def __init__(self, providers: str = LLM_PROVIDERS):
+        self.providers = providers
+        self._router = None
+        self._lock = threading.Lock()
+        self._timings = {"cold_start_ms": None, "calls": 0, "call_ms_total": 0.0, "lookup_ms_total": 0.0,
+                         "streams": 0, "first_token_ms_total": 0.0}
+
+    def get(self):
+        """The shared router, created on first use."""
+        router = self._router
+        if router is not None:
+            return router
+        with self._lock:
+            if self._router is None:
+                start = time.perf_counter()
+                self._router = create_router(self.providers)
+                self._timings["cold_start_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return self._router
+
+    def warm_up(self, ping: bool = False):
+        """
+        Create the provider clients. With `ping`, also send each a one-word
+        request so connections are open before the first user prompt.
+        """
+        self.get().warm_up(ping)
+
+    def record_call(self, lookup_s: float, call_s: float, first_token_s: float = None):
+        """Record a call; streamed calls also pass the time to their first text delta."""
+        with self._lock:
+            self._timings["calls"] += 1
+            self._timings["lookup_ms_total"] += lookup_s * 1000
+            self._timings["call_ms_total"] += call_s * 1000
+            if first_token_s is not None:
+                self._timings["streams"] += 1
+                self._timings["first_token_ms_total"] += first_token_s * 1000
+
+    def timings(self) -> dict:
+        """Cold-start cost, average lookup (overhead), call latency and time to first token, and the router's state."""
+        with self._lock:
+            calls = self._timings["calls"]
+            streams = self._timings["streams"]
+            timings = {
+                "providers": self.providers,
+                "cold_start_ms": self._timings["cold_start_ms"],
+                "calls": calls,
+                "avg_lookup_ms": round(self._timings["lookup_ms_total"] / calls, 3) if calls else 0.0,
+                "avg_call_ms": round(self._timings["call_ms_total"] / calls, 1) if calls else 0.0,
+                "streams": streams,
+                "avg_first_token_ms": round(self._timings["first_token_ms_total"] / streams, 1) if streams else 0.0,
+            }
+        if self._router is not None:
+            timings["router"] = self._router.snapshot()
+        return timings
+
+
+registry = ModelRegistry()
+
+
+def warm_up(ping: bool = False):
+    """Startup hook: create the shared clients before the first request."""
+    registry.warm_up(ping)
+
+
+def _generation_config(prompt: str, mode: str, schema: dict = None):
+    """(prompt, tokens_in, generation_config) for a call, after the schema and token caps are applied."""
+    generation_config = {}
+    if schema is not None:
+        generation_config.update(json_generation_config(schema))
+        if not SUPPORTS_RESPONSE_SCHEMA:
+            prompt += schema_instructions(schema)
+    config = GENERATION_CONFIGS.get(mode, GENERATION_CONFIGS["default"])
+    prompt, tokens_in, max_output_tokens = ledger.prepare(prompt, config["max_output_tokens"])
+    generation_config = {**config, **generation_config, "max_output_tokens": max_output_tokens}
+    return prompt, tokens_in, generation_config
+
+
+def generate_response(prompt: str, mode: str = "default", schema: dict = None, label: str = None) -> str:
+    """
+    Generate a response from the configured LLM providers (Gemini by default).
+    With `schema` (a JSON schema) the reply is JSON: constrained by the API
+    when the SDK supports response_schema, otherwise asked for in the prompt.
+    Tokens in/out are recorded in the token ledger under `label` (the mode
+    by default); prompts over LLM_MAX_INPUT_TOKENS are cut.
+    """
     try:
-        model = genai.GenerativeModel(MODEL)
-        response = model.generate_content(prompt)
-        return response.text.strip() if response and response.text else "⚠️ No response generated."
+        prompt, tokens_in, generation_config = _generation_config(prompt, mode, schema)
+        start = time.perf_counter()
+        router = registry.get()
+        looked_up = time.perf_counter()
+        reserved = tokens_in + generation_config["max_output_tokens"]
+        # Admission control: stays inside the RPM/TPM budgets and retries 429s;
+        # the router hedges and fails over between providers inside each attempt
+        try:
+            completion = get_scheduler().submit(lambda: router.complete(prompt, generation_config),
+                                                prompt, output_tokens=generation_config["max_output_tokens"])
+        except Exception:
+            ledger.record_failure(tokens_in, reserved)
+            raise
+        elapsed = time.perf_counter() - looked_up
+        registry.record_call(looked_up - start, elapsed)
+        text = completion.text.strip() if completion.text else ""
+        ledger.record(label or mode, *response_tokens(completion, text, tokens_in), elapsed, reserved=reserved)
+        return text or "⚠️ No response generated."
     except Exception as e:
         return f"❌ Error generating response: {e}"
+
+
+def stream_response(prompt: str, mode: str = "default", schema: dict = None, label: str = None):
+    """
+    Generate a response as a stream of text deltas.
+
+    Same admission control, caps and token accounting as generate_response().
+    The request is admitted (and retried on 429s) before the first delta, so
+    only failures before any text arrives are retried. Failures are yielded
+    as a final "❌ ..." delta, matching generate_response().
+    """
+    chunks = []
+    try:
+        prompt, tokens_in, generation_config = _generation_config(prompt, mode, schema)
+        start = time.perf_counter()
+        router = registry.get()
+        looked_up = time.perf_counter()
+        reserved = tokens_in + generation_config["max_output_tokens"]
+        first_token = None
+        try:
+            # The router returns once the first delta has arrived (hedged and failed over)
+            stream = get_scheduler().submit(lambda: router.stream(prompt, generation_config),
+                                            prompt, output_tokens=generation_config["max_output_tokens"])
+            for delta in stream:
+                if delta:
+                    if first_token is None:
+                        first_token = time.perf_counter() - looked_up
+                    chunks.append(delta)
+                    yield delta
+        except Exception:
+            ledger.record_failure(tokens_in, reserved)
+            raise
+        elapsed = time.perf_counter() - looked_up
+        registry.record_call(looked_up - start, elapsed, elapsed if first_token is None else first_token)
+        text = "".join(chunks).strip()
+        ledger.record(label or mode, *response_tokens(None, text, tokens_in), elapsed, reserved=reserved)
+        if not text:
+            yield "⚠️ No response generated."
+    except Exception as e:
+        yield ("\n\n" if chunks else "") + f"❌ Error generating response: {e}"
+
+
+def deltas(text: str):
+    """A finished text (a cached answer or an error message) as a one-delta stream."""
+    yield text
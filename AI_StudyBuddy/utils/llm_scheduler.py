@@ -0,0 +1,334 @@
+"""
+Admission control for LLM calls.
+
+A process-wide scheduler that keeps model calls inside requests-per-minute
+and tokens-per-minute budgets, serves interactive work ahead of batch work,
+and retries rate-limit / transient failures with jittered exponential
+backoff. Used by utils.gemini_helper and by the Flask backend (asubmit()
+by its ASGI app).
+"""
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from utils.token_budget import count_tokens
+
+load_dotenv()
+
+LLM_RPM = float(os.getenv("LLM_RPM", 60))
+LLM_TPM = float(os.getenv("LLM_TPM", 250000))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 60))
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# Output tokens charged up front when a call does not say how much it expects
+DEFAULT_OUTPUT_TOKENS = 512
+
+_RATE_LIMIT_MARKERS = ("429", "resource has been exhausted", "resourceexhausted", "quota", "rate limit")
+_RETRYABLE_MARKERS = _RATE_LIMIT_MARKERS + ("503", "unavailable", "500 internal", "deadline exceeded",
+                                            "deadlineexceeded")
+
+
+class SchedulerTimeout(Exception):
+    """Raised when a call waits in the queue longer than its timeout."""
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """True for quota/429 and transient server errors worth retrying, and errors marked `retryable`."""
+    if getattr(error, "retryable", False):
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _RETRYABLE_MARKERS)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for quota/429 errors: the provider is healthy, the account is out of budget."""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _RATE_LIMIT_MARKERS)
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count used for budgeting (local estimate, see utils.token_budget)."""
+    return count_tokens(text)
+
+
+class TokenBucket:
+    """Budget of `capacity` units per minute, refilled continuously."""
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float) -> float:
+        """Seconds until `cost` units are available (0 if available now)."""
+        self._refill()
+        cost = min(cost, self.capacity)
+        return 0.0 if self.level >= cost else (cost - self.level) / self.rate
+
+    def take(self, cost: float):
+        self._refill()
+        self.level -= min(cost, self.capacity)
+
+
+_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextlib.contextmanager
+def priority(level: int):
+    """Run LLM calls made in this block at `level` (per thread and per asyncio task)."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+class LLMScheduler:
+    """
+    submit(fn, prompt) blocks until the call is admitted, runs fn(), and
+    returns its result. Waiting calls are ordered by (priority, arrival);
+    a call is admitted only at the head of the queue and when both the
+    request and token buckets can cover it.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, max_retries: int = LLM_MAX_RETRIES,
+                 base_delay: float = 1.0, max_delay: float = 30.0, queue_timeout: float = LLM_QUEUE_TIMEOUT,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue_timeout = queue_timeout
+        self.clock = clock
+        self.sleep = sleep
+        self._cond = threading.Condition()
+        self._queue = []
+        # (loop, future) of asubmit() calls waiting for the queue to move
+        self._async_waiters = set()
+        self._seq = itertools.count()
+        self._stats = {"admitted": 0, "completed": 0, "failed": 0, "retries": 0, "timeouts": 0, "charged": 0,
+                       "in_flight": 0, "total_wait_s": 0.0, "max_wait_s": 0.0}
+
+    def _admit(self, cost_tokens: float, level: int, timeout: float) -> float:
+        """Block until admitted; returns seconds spent waiting."""
+        arrived = self.clock()
+        deadline = arrived + timeout
+        ticket = (level, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    if self._queue[0] == ticket:
+                        delay = max(self.requests.wait_time(1), self.tokens.wait_time(cost_tokens))
+                        if delay == 0:
+                            break
+                    else:
+                        delay = None
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise SchedulerTimeout(f"LLM call waited more than {timeout:.0f}s for capacity")
+                    self._cond.wait(remaining if delay is None else min(delay, remaining))
+                heapq.heappop(self._queue)
+            except BaseException:
+                self._discard(ticket)
+                raise
+            finally:
+                self._notify()
+
+            return self._take(cost_tokens, arrived)
+
+    def _discard(self, ticket):
+        # Called with self._cond held
+        if ticket in self._queue:
+            self._queue.remove(ticket)
+            heapq.heapify(self._queue)
+
+    def _notify(self):
+        """Wake every waiter, threads and coroutines alike: the head of the queue may have changed."""
+        with self._cond:
+            self._cond.notify_all()
+            waiters = list(self._async_waiters)
+        for loop, wakeup in waiters:
+            try:
+                loop.call_soon_threadsafe(lambda f=wakeup: f.done() or f.set_result(None))
+            except RuntimeError:
+                pass  # loop already closed
+
+    def _take(self, cost_tokens: float, arrived: float) -> float:
+        # Called with self._cond held, once the call is admitted
+        self.requests.take(1)
+        self.tokens.take(cost_tokens)
+        waited = self.clock() - arrived
+        self._stats["admitted"] += 1
+        self._stats["in_flight"] += 1
+        self._stats["total_wait_s"] += waited
+        self._stats["max_wait_s"] = max(self._stats["max_wait_s"], waited)
+        return waited
+
+    async def _aadmit(self, cost_tokens: float, level: int, timeout: float) -> float:
+        """_admit() for event loops: waits on the loop itself, so queued calls hold no threads."""
+        loop = asyncio.get_running_loop()
+        arrived = self.clock()
+        deadline = arrived + timeout
+        ticket = (level, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+        try:
+            while True:
+                wakeup = loop.create_future()
+                with self._cond:
+                    if self._queue[0] == ticket:
+                        delay = max(self.requests.wait_time(1), self.tokens.wait_time(cost_tokens))
+                        if delay == 0:
+                            heapq.heappop(self._queue)
+                            return self._take(cost_tokens, arrived)
+                    else:
+                        delay = None
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise SchedulerTimeout(f"LLM call waited more than {timeout:.0f}s for capacity")
+                    self._async_waiters.add((loop, wakeup))
+                try:
+                    await asyncio.wait([wakeup], timeout=remaining if delay is None else min(delay, remaining))
+                finally:
+                    with self._cond:
+                        self._async_waiters.discard((loop, wakeup))
+        except BaseException:
+            with self._cond:
+                self._discard(ticket)
+            raise
+        finally:
+            self._notify()
+
+    def charge(self, prompt: str = "", output_tokens: int = None):
+        """
+        Charge the budgets for a call made without admission (a hedged
+        second call, see core.ai_utils): it is not delayed, later calls wait.
+        """
+        cost = estimate_tokens(prompt) + (output_tokens or DEFAULT_OUTPUT_TOKENS)
+        with self._cond:
+            self.requests.take(1)
+            self.tokens.take(cost)
+            self._stats["charged"] += 1
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, capped exponential delay]
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def submit(self, fn, prompt: str = "", output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+               level: int = None, timeout: float = None):
+        """
+        Run fn() under the rate limits. `prompt` and `output_tokens` size the
+        token budget charge; `level` defaults to the current priority().
+        Retryable errors are retried up to max_retries times with backoff;
+        other errors (and the last retryable one) are raised.
+        """
+        level = current_priority() if level is None else level
+        timeout = self.queue_timeout if timeout is None else timeout
+        cost = estimate_tokens(prompt) + output_tokens
+        attempt = 0
+        while True:
+            self._admit(cost, level, timeout)
+            try:
+                result = fn()
+            except Exception as e:
+                with self._cond:
+                    self._stats["in_flight"] -= 1
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    with self._cond:
+                        self._stats["failed"] += 1
+                    raise
+                with self._cond:
+                    self._stats["retries"] += 1
+                self.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            with self._cond:
+                self._stats["in_flight"] -= 1
+                self._stats["completed"] += 1
+            return result
+
+    async def asubmit(self, fn, prompt: str = "", output_tokens: int = DEFAULT_OUTPUT_TOKENS,
+                      level: int = None, timeout: float = None):
+        """submit() for coroutine functions: awaits fn() under the same limits, queue and retries."""
+        level = current_priority() if level is None else level
+        timeout = self.queue_timeout if timeout is None else timeout
+        cost = estimate_tokens(prompt) + output_tokens
+        attempt = 0
+        while True:
+            await self._aadmit(cost, level, timeout)
+            try:
+                result = await fn()
+            except Exception as e:
+                with self._cond:
+                    self._stats["in_flight"] -= 1
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    with self._cond:
+                        self._stats["failed"] += 1
+                    raise
+                with self._cond:
+                    self._stats["retries"] += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            except BaseException:
+                # Cancelled (request timeout): no longer in flight
+                with self._cond:
+                    self._stats["in_flight"] -= 1
+                raise
+            with self._cond:
+                self._stats["in_flight"] -= 1
+                self._stats["completed"] += 1
+            return result
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["queue_depth"] = len(self._queue)
+            stats["queued_batch"] = sum(1 for level, _ in self._queue if level >= PRIORITY_BATCH)
+            stats["request_budget"] = round(self.requests.level, 1)
+            stats["token_budget"] = round(self.tokens.level)
+        admitted = stats["admitted"]
+        stats["avg_wait_ms"] = round(stats.pop("total_wait_s") / admitted * 1000, 1) if admitted else 0.0
+        stats["max_wait_ms"] = round(stats.pop("max_wait_s") * 1000, 1)
+        return stats
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """The process-wide scheduler, configured from LLM_* environment variables."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler()
+    return _scheduler
@@ -0,0 +1,109 @@
+"""
+Prompt template registry.
+
+Prompts are registered once, at import, by the module that sends them. The
+text is dedented and stripped of trailing whitespace (indentation in a
+triple-quoted f-string is paid for in tokens on every call), split into
+literal and field pieces so rendering is a join, and given a token estimate
+and a version hash. Caches and metrics key on the versions, so editing a
+template invalidates exactly the results it produced. Used by core.* and by
+the Flask backend.
+"""
+import hashlib
+import string
+import textwrap
+import threading
+
+from utils.llm_scheduler import estimate_tokens
+
+
+def clean_template(source: str) -> str:
+    """Dedent `source`, strip trailing whitespace from each line and the ends."""
+    return "\n".join(line.rstrip() for line in textwrap.dedent(source).strip().splitlines())
+
+
+class PromptTemplate:
+    """
+    A compiled prompt: render(**values) fills `{name}` fields with str(value).
+    `{{` and `}}` are literal braces; format specs and attribute lookups are
+    not supported, so slicing and formatting happen before rendering.
+    """
+
+    __slots__ = ("name", "text", "version", "fields", "tokens", "saved_tokens", "_pieces")
+
+    def __init__(self, name: str, source: str):
+        self.name = name
+        self.text = clean_template(source)
+        self.version = hashlib.sha256(f"{name}\0{self.text}".encode("utf-8")).hexdigest()[:12]
+        pieces, fields = [], []
+        for literal, field, spec, conversion in string.Formatter().parse(self.text):
+            if field is not None and (spec or conversion or not field.isidentifier()):
+                raise ValueError(f"Prompt {name!r}: unsupported field {{{field}}}")
+            pieces.append((literal, field))
+            if field is not None and field not in fields:
+                fields.append(field)
+        self._pieces = tuple(pieces)
+        self.fields = tuple(fields)
+        literal_text = "".join(literal for literal, _ in pieces)
+        # Tokens the template itself adds to every call, and what cleaning it saved
+        self.tokens = estimate_tokens(literal_text)
+        self.saved_tokens = estimate_tokens(source) - estimate_tokens(self.text)
+
+    def render(self, **values) -> str:
+        missing = [field for field in self.fields if field not in values]
+        if missing:
+            raise KeyError(f"Prompt {self.name!r} is missing {', '.join(missing)}")
+        return "".join(literal + ("" if field is None else str(values[field]))
+                       for literal, field in self._pieces).strip()
+
+    def __repr__(self) -> str:
+        return f"PromptTemplate({self.name!r}, version={self.version!r}, tokens={self.tokens})"
+
+
+class PromptRegistry:
+    """Process-wide name -> PromptTemplate map."""
+
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, source: str) -> PromptTemplate:
+        """Compile and register `source`; re-registering the same text returns the same template."""
+        template = PromptTemplate(name, source)
+        with self._lock:
+            existing = self._templates.get(name)
+            if existing is not None:
+                if existing.version != template.version:
+                    raise ValueError(f"Prompt {name!r} is already registered with different text")
+                return existing
+            self._templates[name] = template
+        return template
+
+    def __getitem__(self, name: str) -> PromptTemplate:
+        return self._templates[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._templates
+
+    def version(self, *names: str) -> str:
+        """One hash over the versions of `names`, for keys that depend on several templates."""
+        digest = hashlib.sha256()
+        for name in names:
+            digest.update(f"{name}={self._templates[name].version}\0".encode("utf-8"))
+        return digest.hexdigest()[:12]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "version": template.version,
+                    "tokens": template.tokens,
+                    "saved_tokens": template.saved_tokens,
+                    "fields": list(template.fields),
+                }
+                for name, template in sorted(self._templates.items())
+            }
+
+
+prompts = PromptRegistry()
+register = prompts.register
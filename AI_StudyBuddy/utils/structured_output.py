@@ -0,0 +1,242 @@
+"""
+Structured (JSON schema) model output.
+
+Schemas are plain JSON-schema dicts. compile_validator() turns one into a
+validator once, so checking a response is a walk over the value with no
+schema interpretation. When the installed google-generativeai supports
+response_schema the model is constrained to the schema; otherwise the schema
+is spelled out in the prompt and the validator does all the work.
+SchemaSet generates several named sections as one object and re-requests
+only the sections that came back missing or invalid. Used by core.quizzer
+and by the Flask backend.
+"""
+import hashlib
+import json
+import os
+
+from dotenv import load_dotenv
+
+try:
+    from google.generativeai.types.generation_types import GenerationConfig
+    SUPPORTS_RESPONSE_SCHEMA = "response_schema" in getattr(GenerationConfig, "__annotations__", {})
+except ImportError:
+    SUPPORTS_RESPONSE_SCHEMA = False
+
+load_dotenv()
+
+# Extra requests allowed for sections that fail validation
+STRUCTURED_RETRIES = int(os.getenv("STRUCTURED_RETRIES", 1))
+
+_TYPES = {
+    "string": str,
+    "array": list,
+    "object": dict,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+}
+
+# Schema keys Gemini's response_schema accepts; everything else (counts,
+# string lengths) is only enforced by the local validator
+_GEMINI_KEYS = ("type", "description", "enum", "required")
+
+
+def _compile(schema: dict):
+    kind = schema.get("type")
+    expected = _TYPES[kind] if kind else object
+    enum = frozenset(schema["enum"]) if "enum" in schema else None
+    min_length = schema.get("minLength", 0)
+    min_items = schema.get("minItems", 0)
+    max_items = schema.get("maxItems")
+    items = _compile(schema["items"]) if "items" in schema else None
+    properties = [(name, _compile(sub)) for name, sub in schema.get("properties", {}).items()]
+    required = tuple(schema.get("required", ()))
+
+    def check(value, path, errors):
+        # bool is an int subclass; only "boolean" (or no type) accepts it
+        if not isinstance(value, expected) or (isinstance(value, bool) and kind not in (None, "boolean")):
+            errors.append(f"{path}: expected {kind}")
+            return
+        if enum is not None and value not in enum:
+            errors.append(f"{path}: {value!r} is not one of {sorted(enum)}")
+        if min_length and len(value.strip()) < min_length:
+            errors.append(f"{path}: empty")
+        if kind == "array":
+            if len(value) < min_items or (max_items is not None and len(value) > max_items):
+                errors.append(f"{path}: {len(value)} items")
+            if items is not None:
+                for i, item in enumerate(value):
+                    items(item, f"{path}[{i}]", errors)
+        elif kind == "object":
+            for name in required:
+                if name not in value:
+                    errors.append(f"{path}.{name}: missing")
+            for name, sub in properties:
+                if name in value:
+                    sub(value[name], f"{path}.{name}", errors)
+
+    return check
+
+
+def compile_validator(schema: dict):
+    """
+    validate(value) -> list of "path: problem" strings, empty when valid.
+    Supports type, enum, properties, required, items, minItems, maxItems and
+    minLength (blank strings count as empty).
+    """
+    check = _compile(schema)
+
+    def validate(value) -> list:
+        errors = []
+        check(value, "$", errors)
+        return errors
+
+    return validate
+
+
+def gemini_schema(schema: dict) -> dict:
+    """`schema` reduced to the fields Gemini's response_schema understands."""
+    reduced = {key: schema[key] for key in _GEMINI_KEYS if key in schema}
+    if "items" in schema:
+        reduced["items"] = gemini_schema(schema["items"])
+    if "properties" in schema:
+        reduced["properties"] = {name: gemini_schema(sub) for name, sub in schema["properties"].items()}
+    return reduced
+
+
+def json_generation_config(schema: dict) -> dict:
+    """generation_config overrides for schema-constrained JSON, or {} if the SDK lacks them."""
+    if not SUPPORTS_RESPONSE_SCHEMA:
+        return {}
+    return {"response_mime_type": "application/json", "response_schema": gemini_schema(schema)}
+
+
+def schema_instructions(schema: dict) -> str:
+    """Prompt suffix asking for JSON matching `schema`, for models that cannot be constrained."""
+    return ("\n\nRespond with ONLY a JSON object (no markdown fences) matching this JSON schema:\n"
+            + json.dumps(schema, separators=(",", ":")))
+
+
+def extract_json_object(text: str):
+    """Return the first JSON object in `text` (tolerating ``` fences), or None."""
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class JsonArrayItems:
+    """
+    Incremental reader for streamed JSON: feed(text) returns the objects in
+    arrays completed so far, e.g. each question of {"questions": [...]} as
+    soon as its closing brace arrives. Only objects directly inside an array
+    at the top two levels are returned; text around the JSON (``` fences) is
+    skipped. Each character is scanned once.
+    """
+
+    __slots__ = ("_buffer", "_stack", "_start", "_in_string", "_escaped")
+
+    def __init__(self):
+        self._buffer = []
+        self._stack = []
+        self._start = None  # buffer index of the item being read
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> list:
+        items = []
+        stack = self._stack
+        for char in text:
+            if self._start is not None:
+                self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = bool(stack)
+            elif char in "{[":
+                if char == "{" and self._start is None and stack[-1:] == ["["] and len(stack) <= 2:
+                    self._start = len(stack) + 1
+                    self._buffer = ["{"]
+                stack.append(char)
+            elif char in "}]" and stack:
+                stack.pop()
+                if self._start is not None and len(stack) == self._start - 1:
+                    try:
+                        items.append(json.loads("".join(self._buffer)))
+                    except ValueError:
+                        pass
+                    self._start = None
+        return items
+
+
+class SchemaSet:
+    """
+    Named section schemas, each compiled once.
+
+    generate(call, names) asks for the sections as one JSON object and then
+    re-requests only those that failed validation, up to `retries` times.
+    """
+
+    def __init__(self, schemas: dict, retries: int = STRUCTURED_RETRIES):
+        self.schemas = schemas
+        self.retries = retries
+        self._validators = {name: compile_validator(schema) for name, schema in schemas.items()}
+        # Changes whenever a schema does, for cache keys of schema-validated output
+        self.version = hashlib.sha256(json.dumps(schemas, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+    def object_schema(self, names: list) -> dict:
+        """Schema of an object holding exactly the sections in `names`."""
+        return {
+            "type": "object",
+            "properties": {name: self.schemas[name] for name in names},
+            "required": list(names),
+        }
+
+    def validate(self, data: dict, names: list):
+        """(values, errors): valid sections of `data`, and problems per invalid section."""
+        values, errors = {}, {}
+        for name in names:
+            if name not in data:
+                errors[name] = ["missing"]
+                continue
+            problems = self._validators[name](data[name])
+            if problems:
+                errors[name] = problems
+            else:
+                values[name] = data[name]
+        return values, errors
+
+    def generate(self, call, names: list):
+        """
+        call(schema) returns the model's text for an object with the given
+        schema; a ValueError from it ends generation for the pending sections.
+
+        Returns (values, errors, attempts): valid values by section, a
+        ValueError for each section that never validated, and the section
+        names requested by each call.
+        """
+        values, errors, pending, attempts = {}, {}, list(names), []
+        while pending and len(attempts) <= self.retries:
+            attempts.append(pending)
+            try:
+                text = call(self.object_schema(pending))
+            except ValueError as e:
+                errors.update((name, e) for name in pending)
+                break
+            found, problems = self.validate(extract_json_object(text) or {}, pending)
+            values.update(found)
+            for name in found:
+                errors.pop(name, None)
+            for name, reasons in problems.items():
+                errors[name] = ValueError(f"Invalid structured {name}: {'; '.join(reasons[:3])}")
+            pending = list(problems)
+        return values, errors, attempts
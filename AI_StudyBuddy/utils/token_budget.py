@@ -0,0 +1,247 @@
+"""
+Token accounting and context budgets for LLM calls.
+
+count_tokens() is a local estimate of the model's tokenizer (no network, no
+vocabulary files): a word is a token plus one per further ~6 characters,
+and every punctuation mark, digit, newline and non-ASCII character adds
+one. Contexts are cut to token budgets at sentence or word boundaries
+(chat history is fitted to CHAT_HISTORY_TOKENS by utils.chat_history), and
+every call is checked against per-call caps, reserved against its
+request's budget and recorded (tokens in/out, latency) per label and per
+request. Used by utils.gemini_helper, utils.chat_history, core.* and the
+Flask backend.
+"""
+import contextlib
+import contextvars
+import os
+import re
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Hard per-call caps; prompts over the input cap are cut before sending
+LLM_MAX_INPUT_TOKENS = int(os.getenv("LLM_MAX_INPUT_TOKENS", 32000))
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", 2048))
+# Tokens a single request (all of its calls) may spend; 0 disables the check
+LLM_REQUEST_TOKEN_BUDGET = int(os.getenv("LLM_REQUEST_TOKEN_BUDGET", 0))
+# Chat history sent with follow-ups, and the most any one earlier turn may take
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", 1200))
+CHAT_TURN_TOKENS = int(os.getenv("CHAT_TURN_TOKENS", 300))
+
+_PUNCTUATION = ".,;:!?()[]{}<>\"'`*#=+-_/\\|@$%^&~"
+_DIGITS = "0123456789"
+_SENTENCE_END = re.compile(r"[.!?]\s")
+
+TRUNCATION_MARK = " …"
+
+
+class TokenBudgetExceeded(ValueError):
+    """Raised when a call would take a request past its token budget."""
+
+
+def count_tokens(text: str) -> int:
+    """Estimated model tokens in `text` (at least 1)."""
+    if not text:
+        return 1
+    # str.split / str.count only: this runs on every prompt and on whole documents
+    words = text.split()
+    # A word is a token, plus one per further 6 characters
+    tokens = len(words) + sum((len(word) - 1) // 6 for word in words)
+    tokens += sum(map(text.count, _PUNCTUATION))
+    tokens += sum(map(text.count, _DIGITS))
+    tokens += text.count("\n")
+    if not text.isascii():
+        # Other scripts (CJK in particular) run about a token per character
+        tokens += len(text) - len(text.encode("ascii", "ignore"))
+    return max(1, tokens)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, mark: str = TRUNCATION_MARK) -> str:
+    """
+    `text` cut to at most `max_tokens`, at the last sentence end (or word
+    break) before the limit, with `mark` appended when anything was cut.
+    """
+    total = count_tokens(text)
+    if total <= max_tokens:
+        return text
+    budget = max(1, max_tokens - count_tokens(mark))
+    # Start from the text's own characters-per-token ratio, then shrink until it fits
+    end = max(1, int(len(text) * budget / total))
+    while True:
+        cut = text[:end]
+        sentence = None
+        for sentence in _SENTENCE_END.finditer(cut):
+            pass
+        if sentence is not None and sentence.end() > end // 2:
+            cut = cut[:sentence.start() + 1]
+        elif " " in cut[end // 2:]:
+            cut = cut[:cut.rindex(" ")]
+        if count_tokens(cut) <= budget or end <= 1:
+            return cut.rstrip() + mark
+        end = int(end * 0.9)
+
+
+class Usage:
+    """
+    Token totals for one request (all calls made inside a ledger.request()
+    block), plus the tokens reserved by calls still in flight.
+    """
+
+    __slots__ = ("calls", "tokens_in", "tokens_out", "reserved", "budget", "_lock")
+
+    def __init__(self, budget: int = 0):
+        self.calls = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.reserved = 0
+        self.budget = budget
+        self._lock = threading.Lock()
+
+    @property
+    def total(self) -> int:
+        return self.tokens_in + self.tokens_out
+
+    def reserve(self, tokens: int) -> bool:
+        """Hold `tokens` for a call, or False if that would pass the budget."""
+        with self._lock:
+            if self.budget and self.total + self.reserved + tokens > self.budget:
+                return False
+            self.reserved += tokens
+            return True
+
+    def add(self, tokens_in: int, tokens_out: int, reserved: int = 0):
+        with self._lock:
+            self.calls += 1
+            self.tokens_in += tokens_in
+            self.tokens_out += tokens_out
+            self.reserved = max(0, self.reserved - reserved)
+
+    def merge(self, other: "Usage"):
+        """Add the calls and tokens of another scope (e.g. a shared run this request waited for)."""
+        with other._lock:
+            calls, tokens_in, tokens_out = other.calls, other.tokens_in, other.tokens_out
+        with self._lock:
+            self.calls += calls
+            self.tokens_in += tokens_in
+            self.tokens_out += tokens_out
+
+    def as_dict(self) -> dict:
+        return {"calls": self.calls, "tokens_in": self.tokens_in, "tokens_out": self.tokens_out}
+
+
+_current_usage = contextvars.ContextVar("llm_usage", default=None)
+
+
+class TokenLedger:
+    """
+    Tokens in/out and latency per call label (template or mode name).
+
+    prepare() applies the per-call caps before a call and reserves its
+    worst case (prompt plus output cap) in the request opened with
+    request(), if any, so concurrent calls cannot all pass the budget check
+    before any usage is recorded. record() adds the call to the label
+    totals and to the request, releasing what prepare() reserved.
+    record_failure() keeps only a failed call's prompt tokens, which the
+    provider may have billed, and releases its output share. Request scopes
+    are context variables, so worker threads see them when started with
+    contextvars.copy_context().
+    """
+
+    def __init__(self, max_input_tokens: int = LLM_MAX_INPUT_TOKENS,
+                 max_output_tokens: int = LLM_MAX_OUTPUT_TOKENS, request_budget: int = LLM_REQUEST_TOKEN_BUDGET):
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = max_output_tokens
+        self.request_budget = request_budget
+        self._lock = threading.Lock()
+        self._labels = {}
+        self.stats = {"calls": 0, "failed_calls": 0, "tokens_in": 0, "tokens_out": 0, "truncated_prompts": 0,
+                      "budget_rejections": 0}
+
+    @contextlib.contextmanager
+    def request(self, budget: int = None):
+        """Collect the usage of every call made in this block (and its copied contexts)."""
+        usage = Usage(self.request_budget if budget is None else budget)
+        token = _current_usage.set(usage)
+        try:
+            yield usage
+        finally:
+            _current_usage.reset(token)
+
+    def merge(self, usage: Usage):
+        """Add `usage`, gathered in a scope of its own, to the current request (if any)."""
+        current = _current_usage.get()
+        if current is not None:
+            current.merge(usage)
+
+    def prepare(self, prompt: str, max_output_tokens: int = None):
+        """
+        (prompt, tokens_in, max_output_tokens) for a call: the prompt cut to
+        the input cap and the output cap applied, with tokens_in +
+        max_output_tokens reserved in the current request. Raises
+        TokenBudgetExceeded if the call would take the request past its budget.
+        """
+        max_output_tokens = min(max_output_tokens or self.max_output_tokens, self.max_output_tokens)
+        tokens_in = count_tokens(prompt)
+        if tokens_in > self.max_input_tokens:
+            prompt = truncate_to_tokens(prompt, self.max_input_tokens)
+            tokens_in = count_tokens(prompt)
+            with self._lock:
+                self.stats["truncated_prompts"] += 1
+        usage = _current_usage.get()
+        if usage is not None and not usage.reserve(tokens_in + max_output_tokens):
+            with self._lock:
+                self.stats["budget_rejections"] += 1
+            raise TokenBudgetExceeded(
+                f"Token budget exceeded: {usage.total} of {usage.budget} tokens already used by this request"
+                f" ({usage.reserved} reserved by calls in flight)")
+        return prompt, tokens_in, max_output_tokens
+
+    def record(self, label: str, tokens_in: int, tokens_out: int, elapsed: float = 0.0, reserved: int = 0):
+        """Add a finished call; `reserved` is what prepare() held for it (tokens_in + max_output_tokens)."""
+        usage = _current_usage.get()
+        if usage is not None:
+            usage.add(tokens_in, tokens_out, reserved)
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["tokens_in"] += tokens_in
+            self.stats["tokens_out"] += tokens_out
+            entry = self._labels.setdefault(label, {"calls": 0, "tokens_in": 0, "tokens_out": 0, "seconds": 0.0})
+            entry["calls"] += 1
+            entry["tokens_in"] += tokens_in
+            entry["tokens_out"] += tokens_out
+            entry["seconds"] += elapsed
+
+    def record_failure(self, tokens_in: int, reserved: int = 0):
+        """Settle a failed call: its prompt tokens count against the request, the rest of `reserved` is released."""
+        usage = _current_usage.get()
+        if usage is not None:
+            usage.add(tokens_in, 0, reserved)
+        with self._lock:
+            self.stats["failed_calls"] += 1
+            self.stats["tokens_in"] += tokens_in
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            labels = {
+                label: {
+                    "calls": entry["calls"],
+                    "avg_tokens_in": round(entry["tokens_in"] / entry["calls"]),
+                    "avg_tokens_out": round(entry["tokens_out"] / entry["calls"]),
+                    "avg_ms": round(entry["seconds"] / entry["calls"] * 1000, 1),
+                }
+                for label, entry in sorted(self._labels.items())
+            }
+            return {**self.stats, "max_input_tokens": self.max_input_tokens,
+                    "max_output_tokens": self.max_output_tokens, "labels": labels}
+
+
+def response_tokens(completion, text: str, tokens_in: int):
+    """(tokens_in, tokens_out): the provider's counts when it reports them (core.ai_utils.Completion), else estimates."""
+    prompt_count = getattr(completion, "tokens_in", 0)
+    output_count = getattr(completion, "tokens_out", 0)
+    return prompt_count or tokens_in, output_count or (count_tokens(text) if text else 0)
+
+
+ledger = TokenLedger()
@@ -2,82 +2,165 @@
 Smart Study Assistant - Backend API
 Flask backend that fetches Wikipedia data and uses AI to generate study materials
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import requests
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 import json
 import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# LLM utilities shared with the Streamlit app (AI_StudyBuddy/utils)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AI_StudyBuddy'))
+
+from fanout import SECTION_TIMEOUT, SectionResult, SectionTimeout, run_sections, stream_sections
+from parsers import parse_quiz, parse_summary
+from single_flight import CoalescedTimeout, SingleFlight
+from study_cache import CACHE_ENABLED, create_cache, make_key, normalize_topic
+from topic_resolver import create_resolver
+from wiki_client import WikipediaClient
+from wiki_dump import WikiDumpStore
+from core.ai_utils import create_router
+from utils.llm_scheduler import (
+    PRIORITY_BATCH, SchedulerTimeout, get_scheduler, is_retryable_error, priority as llm_priority
+)
+from utils.prompts import prompts, register as register_prompt
+from utils.token_budget import TokenBudgetExceeded, ledger as token_ledger, response_tokens, truncate_to_tokens
+from utils.structured_output import (
+    SUPPORTS_RESPONSE_SCHEMA, SchemaSet, extract_json_object, json_generation_config, schema_instructions
+)
 
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend
 
-# Configure Gemini AI
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Configure the LLM providers (LLM_PROVIDERS, default Gemini; see AI_StudyBuddy/core/ai_utils.py)
 USE_MOCK_MODE = False
+llm_router = None
+
+# Bump when parsers change so cached study packs are regenerated; prompt
+# edits are picked up by the template versions (see study_cache_key)
+PARSER_VERSION = "1"
+# Default for /study?structured=: request schema-constrained JSON instead of free text
+STRUCTURED_OUTPUT = os.getenv("STUDY_STRUCTURED_OUTPUT", "0").strip().lower() in ('1', 'true', 'yes')
 
-if not GEMINI_API_KEY or GEMINI_API_KEY == "your_gemini_api_key_here":
-    print("⚠️  WARNING: Using MOCK MODE - API key not set. Add your key to .env for real AI responses.")
+try:
+    llm_router = create_router()
+except ValueError as e:
+    print(f"⚠️  WARNING: Using MOCK MODE - {e}. Add your key to .env for real AI responses.")
     USE_MOCK_MODE = True
-else:
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel("gemini-2.5-flash")
-    except Exception as e:
-        print(f"⚠️  Error configuring Gemini: {e}. Using MOCK MODE.")
-        USE_MOCK_MODE = True
+except Exception as e:
+    print(f"⚠️  Error configuring LLM providers: {e}. Using MOCK MODE.")
+    USE_MOCK_MODE = True
+
+llm_scheduler = get_scheduler()
+study_cache = create_cache()
+# Identical concurrent /study requests share one pipeline run
+COALESCE_TIMEOUT = float(os.getenv("STUDY_COALESCE_TIMEOUT", 60))
+# Threads that run coalesced pipelines under COALESCE_TIMEOUT
+COALESCE_WORKERS = int(os.getenv("STUDY_COALESCE_WORKERS", 32))
+study_flights = SingleFlight(max_workers=COALESCE_WORKERS)
+
+# Batch jobs share their own bounded pool so they cannot starve /study
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 4))
+BATCH_MAX_TOPICS = int(os.getenv("BATCH_MAX_TOPICS", 100))
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_CONCURRENCY, thread_name_prefix="study-batch")
+wikipedia = WikipediaClient()
+
+# "api" fetches from Wikipedia; "dump" reads a local store built with wiki_dump.py
+WIKI_BACKEND = os.getenv("WIKI_BACKEND", "api").lower()
+WIKI_DUMP_PATH = os.getenv("WIKI_DUMP_PATH", "wiki.dump")
+wiki_dump = WikiDumpStore(WIKI_DUMP_PATH) if WIKI_BACKEND == "dump" else None
+# Typed topics -> canonical titles; indexed on first use from the dump (its
+# saved index) and TOPIC_INDEX_PATH, and taught the canonical title of every
+# page fetched from the API (the TOPIC_INDEX_MAX_TITLES most recently used)
+topic_resolver = create_resolver(wiki_dump)
+
+
+def resolve_topic(topic: str) -> str:
+    """
+    Canonical title for `topic` (the topic without question words if unknown).
+    Typos are only corrected here when the index is the offline dump; in API
+    mode see corrected_topic.
+    """
+    return topic_resolver.resolve(topic).title
+
+
+def corrected_topic(topic: str, title: str):
+    """The closest known title for `topic` once `title` is known to be missing, or None."""
+    match = topic_resolver.resolve(topic, fuzzy=True)
+    return match.title if match.method == "fuzzy" and match.title != title else None
+
+
+def clip_wikipedia_text(text: str, topic: str) -> str:
+    """Collapse whitespace and keep the first 2000 characters (fallback text if empty)."""
+    text = re.sub(r'\s+', ' ', text or '').strip()
+    if len(text) > 2000:
+        text = text[:2000] + "..."
+    return text or f"Information about {topic}"
 
 
 def fetch_wikipedia_content(topic: str) -> str:
     """
     Fetch content from Wikipedia API for the given topic.
     Returns the first 2000 characters of the Wikipedia page content.
+    Pages come from the wiki_client content store when fresh, or from the
+    offline dump store when WIKI_BACKEND=dump. The topic is first resolved
+    to a canonical title (question words dropped, typos corrected against
+    the dump); in API mode a title that is not found is retried once as the
+    closest title seen before.
     """
+    title = resolve_topic(topic)
+    if wiki_dump is not None:
+        return clip_wikipedia_text(wiki_dump.get(title), topic)
     try:
-        # Clean topic name for URL
-        topic_clean = topic.strip().replace(" ", "_")
+        def fetch(title):
+            # Summary/extract and mobile-sections are fetched concurrently
+            topic_clean = title.replace(" ", "_")
+            page, content_page = wikipedia.get_many([
+                ("summary", topic_clean),
+                ("mobile-sections", topic_clean),
+            ])
+            if isinstance(page, Exception):
+                raise page
+            return page, content_page
         
-        # Wikipedia API endpoint for summary/extract
-        url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{topic_clean}"
-        response = requests.get(url, timeout=10, headers={'User-Agent': 'SmartStudyAssistant/1.0'})
+        page, content_page = fetch(title)
+        if not page.found:
+            correction = corrected_topic(topic, title)
+            if correction is not None:
+                title = correction
+                page, content_page = fetch(title)
         
-        if response.status_code == 200:
-            data = response.json()
+        if page.found:
+            topic_resolver.add(title, page.title)
             # Get extract (summary) - this is usually 2-3 paragraphs
-            extract = data.get("extract", "")
+            extract = page.data.get("extract", "")
             
-            # Try to get more detailed content from the full page
-            try:
-                # Use the mobile content API for cleaner text
-                content_url = f"https://en.wikipedia.org/api/rest_v1/page/mobile-sections/{topic_clean}"
-                content_response = requests.get(content_url, timeout=10, headers={'User-Agent': 'SmartStudyAssistant/1.0'})
+            # Use the mobile content for cleaner, more detailed text
+            if not isinstance(content_page, Exception) and content_page.found:
+                content_data = content_page.data
+                # Extract text from sections
+                full_text = extract
+                if 'lead' in content_data:
+                    full_text += " " + content_data['lead'].get('text', '')
+                if 'remaining' in content_data:
+                    for section in content_data['remaining'][:2]:  # First 2 sections
+                        if 'text' in section:
+                            full_text += " " + section['text']
+                
+                # Remove HTML tags and clean up
+                text = re.sub(r'<[^>]+>', '', full_text)
+                text = re.sub(r'\s+', ' ', text).strip()
                 
-                if content_response.status_code == 200:
-                    content_data = content_response.json()
-                    # Extract text from sections
-                    full_text = extract
-                    if 'lead' in content_data:
-                        full_text += " " + content_data['lead'].get('text', '')
-                    if 'remaining' in content_data:
-                        for section in content_data['remaining'][:2]:  # First 2 sections
-                            if 'text' in section:
-                                full_text += " " + section['text']
-                    
-                    # Remove HTML tags and clean up
-                    text = re.sub(r'<[^>]+>', '', full_text)
-                    text = re.sub(r'\s+', ' ', text).strip()
-                    
-                    # Limit to 2000 characters
-                    if len(text) > 2000:
-                        text = text[:2000] + "..."
-                    
-                    return text if text.strip() else extract
-            except:
-                pass  # Fall back to extract if detailed fetch fails
+                # Limit to 2000 characters
+                if len(text) > 2000:
+                    text = text[:2000] + "..."
+                
+                return text if text.strip() else extract
             
             # Return the extract if we have it
             if extract:
@@ -93,12 +176,37 @@ def fetch_wikipedia_content(topic: str) -> str:
         return f"Information about {topic}"
 
 
+def fetch_wikipedia_contents(topics: list) -> dict:
+    """
+    Bulk variant of fetch_wikipedia_content for batch jobs: {topic: content}
+    built from intro extracts, fetched up to 20 titles per request. Same
+    2000-character limit and fallback text as the single-topic fetch.
+    """
+    titles = {topic: resolve_topic(topic) for topic in topics}
+    if wiki_dump is not None:
+        return {topic: clip_wikipedia_text(wiki_dump.get(titles[topic]), topic) for topic in topics}
+    try:
+        extracts = wikipedia.get_extracts(list(titles.values()))
+    except Exception as e:
+        print(f"Error fetching Wikipedia: {e}")
+        extracts = {}
+    
+    return {topic: clip_wikipedia_text(extracts.get(titles[topic]), topic) for topic in topics}
+
+
 def generate_mock_response(prompt: str, topic: str) -> str:
     """Generate mock response when API key is not available."""
     prompt_lower = prompt.lower()
     # Clean topic - remove common question words
     topic_clean = topic.lower().replace("what is", "").replace("prove", "").replace("explain", "").strip()
     
+    if '"study_tip"' in prompt_lower:
+        # Bundle prompt: answer every requested section as one JSON object
+        sections = ["summary", "quiz", "study_tip"]
+        if '"math_question"' in prompt_lower:
+            sections.append("math_question")
+        return json.dumps(generate_mock_sections(topic, sections))
+    
     if "summary" in prompt_lower or "bullet" in prompt_lower:
         return f"""- {topic} is a fundamental concept with important applications in various fields.
 - Understanding {topic} requires knowledge of its core principles and mechanisms.
@@ -147,131 +255,735 @@ EXPLANATION: To solve this problem, start by identifying the known values, then
     return f"Information about {topic} based on general knowledge."
 
 
-def generate_ai_response(prompt: str, topic: str = None) -> str:
-    """Generate response using Gemini AI or mock data."""
+def generate_mock_sections(topic: str, sections: list) -> dict:
+    """Mock values for `sections`, shaped like a structured (JSON) response."""
+    mock = {
+        "summary": lambda: parse_summary(generate_mock_response("summary", topic)),
+        "quiz": lambda: parse_quiz(generate_mock_response("quiz", topic)),
+        "study_tip": lambda: generate_mock_response("tip", topic),
+        "math_question": lambda: parse_math_question(generate_mock_response("math", topic), topic),
+    }
+    return {name: mock[name]() for name in sections}
+
+
+def prepare_ai_call(prompt: str, schema: dict = None):
+    """
+    (prompt, tokens_in, generation_config) for one call: the schema
+    requested (in the config, or spelled out in the prompt when the SDK has
+    no response_schema) and the token caps and request budget applied.
+    """
+    generation_config = {}
+    if schema is not None:
+        generation_config.update(json_generation_config(schema))
+        if not SUPPORTS_RESPONSE_SCHEMA:
+            prompt += schema_instructions(schema)
+    prompt, tokens_in, max_output_tokens = token_ledger.prepare(prompt)
+    generation_config["max_output_tokens"] = max_output_tokens
+    return prompt, tokens_in, generation_config
+
+
+def generate_mock_text(prompt: str, topic: str = None, schema: dict = None) -> str:
+    """Mock mode's answer to `prompt` (JSON sections for a schema)."""
+    # Use provided topic or extract from prompt
+    if not topic:
+        topic_match = re.search(r'about\s+([^,\.\n]+)', prompt, re.IGNORECASE)
+        topic = topic_match.group(1).strip() if topic_match else "the topic"
+    if schema is not None:
+        return json.dumps(generate_mock_sections(topic, list(schema["properties"])))
+    return generate_mock_response(prompt, topic)
+
+
+def ai_error(error: Exception) -> ValueError:
+    """The ValueError reported for a failed LLM call (key, rate limit or generation failure)."""
+    if isinstance(error, SchedulerTimeout):
+        print(f"AI Error: {error}")
+        return ValueError(f"AI rate limit exceeded: {error}")
+    error_msg = str(error)
+    print(f"AI Error: {error_msg}")
+    # Check for API key errors
+    if "API key" in error_msg or "API_KEY" in error_msg or "API_KEY_INVALID" in error_msg:
+        return ValueError("Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in the .env file.")
+    if is_retryable_error(error):
+        return ValueError(f"AI rate limit exceeded: {error_msg}")
+    return ValueError(f"AI generation failed: {error_msg}")
+
+
+def generate_ai_response(prompt: str, topic: str = None, on_delta=None, schema: dict = None,
+                         label: str = "gemini") -> str:
+    """
+    Generate response using the configured LLM providers or mock data.
+    Calls go through the shared router (hedging, failover and circuit
+    breakers across providers - see AI_StudyBuddy/core/ai_utils.py).
+    If `on_delta` is given the completion is streamed and each text chunk is
+    passed to it as it arrives; the full text is still returned.
+    With `schema` (an object JSON schema) the model is asked for JSON matching
+    it: constrained by the API when the installed SDK supports
+    response_schema, otherwise by spelling the schema out in the prompt.
+    Prompts are cut to LLM_MAX_INPUT_TOKENS, output is capped at
+    LLM_MAX_OUTPUT_TOKENS, and tokens in/out are recorded under `label`.
+    """
+    prompt, tokens_in, generation_config = prepare_ai_call(prompt, schema)
+    reserved = tokens_in + generation_config["max_output_tokens"]  # held in the request's budget until recorded
+    
     if USE_MOCK_MODE:
-        # Use provided topic or extract from prompt
-        if not topic:
-            topic_match = re.search(r'about\s+([^,\.\n]+)', prompt, re.IGNORECASE)
-            topic = topic_match.group(1).strip() if topic_match else "the topic"
-        return generate_mock_response(prompt, topic)
+        text = generate_mock_text(prompt, topic, schema)
+        if on_delta is not None:
+            for piece in re.findall(r'\S+\s*', text):
+                on_delta(piece)
+        token_ledger.record(label, *response_tokens(None, text, tokens_in), reserved=reserved)
+        return text
+    
+    completions = []  # the last completion, for its token counts
+    
+    def complete():
+        completion = llm_router.complete(prompt, generation_config)
+        completions.append(completion)
+        return completion.text
+    
+    def stream(deltas):
+        # Past the first delta a failure fails the call: a retry would
+        # re-send text the client already has
+        chunks = []
+        for delta in deltas:
+            if delta:
+                chunks.append(delta)
+                on_delta(delta)
+        return "".join(chunks)
     
     try:
-        response = model.generate_content(prompt)
-        if response and response.text:
-            return response.text.strip()
+        # Calls are admitted by the shared scheduler (RPM/TPM budgets,
+        # priorities, retries on 429) - see utils/llm_scheduler.py. A stream
+        # is retried only until its first delta arrives, as in
+        # gemini_helper.stream_response()
+        start = time.perf_counter()
+        output_tokens = generation_config["max_output_tokens"]
+        try:
+            if on_delta is None:
+                text = llm_scheduler.submit(complete, prompt, output_tokens=output_tokens)
+            else:
+                text = stream(llm_scheduler.submit(lambda: llm_router.stream(prompt, generation_config), prompt,
+                                                   output_tokens=output_tokens))
+        except Exception:
+            # Only the prompt is counted; the output share goes back to the budget
+            token_ledger.record_failure(tokens_in, reserved)
+            raise
+        text = text.strip()
+        token_ledger.record(label, *response_tokens(completions[-1] if completions else None, text, tokens_in),
+                            time.perf_counter() - start, reserved)
+        if text:
+            return text
         else:
             raise ValueError("Empty response from AI")
     except Exception as e:
-        error_msg = str(e)
-        print(f"AI Error: {error_msg}")
-        # Check for API key errors
-        if "API key" in error_msg or "API_KEY" in error_msg or "API_KEY_INVALID" in error_msg:
-            raise ValueError("Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in the .env file.")
-        raise ValueError(f"AI generation failed: {error_msg}")
+        raise ai_error(e)
 
 
-def parse_summary(text: str) -> list:
-    """Parse AI summary into 3 bullet points."""
-    # Extract bullet points
-    bullets = re.findall(r'[-•*]\s*(.+?)(?=\n[-•*]|\n\n|$)', text, re.MULTILINE)
-    if bullets:
-        return bullets[:3]
+async def agenerate_ai_response(prompt: str, topic: str = None, schema: dict = None, label: str = "gemini") -> str:
+    """
+    generate_ai_response() for the ASGI app (asgi.py), without streaming:
+    the router's async provider clients are awaited, so a slow model call
+    holds neither a worker nor a thread.
+    """
+    prompt, tokens_in, generation_config = prepare_ai_call(prompt, schema)
+    reserved = tokens_in + generation_config["max_output_tokens"]  # held in the request's budget until recorded
     
-    # Fallback: split by newlines
-    lines = [line.strip() for line in text.split('\n') if line.strip() and not line.strip().startswith('#')]
-    return lines[:3] if lines else [text[:200]]
+    if USE_MOCK_MODE:
+        text = generate_mock_text(prompt, topic, schema)
+        token_ledger.record(label, *response_tokens(None, text, tokens_in), reserved=reserved)
+        return text
+    
+    completions = []
+    
+    async def complete():
+        completion = await llm_router.acomplete(prompt, generation_config)
+        completions.append(completion)
+        return completion.text
+    
+    try:
+        start = time.perf_counter()
+        try:
+            text = (await llm_scheduler.asubmit(complete, prompt,
+                                                output_tokens=generation_config["max_output_tokens"])).strip()
+        except BaseException:
+            # Failed or cancelled (request timeout): only the prompt is counted
+            token_ledger.record_failure(tokens_in, reserved)
+            raise
+        token_ledger.record(label, *response_tokens(completions[-1] if completions else None, text, tokens_in),
+                            time.perf_counter() - start, reserved)
+        if text:
+            return text
+        else:
+            raise ValueError("Empty response from AI")
+    except Exception as e:
+        raise ai_error(e)
+
+
+API_KEY_ERROR_BODY = {
+    "error": "Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in the backend/.env file.",
+    "details": "Get your free API key from: https://makersuite.google.com/app/apikey"
+}
+
+
+def is_api_key_error(error: Exception) -> bool:
+    """True if `error` is the missing/invalid key error raised by generate_ai_response."""
+    return isinstance(error, ValueError) and "API key" in str(error)
+
+
+RATE_LIMIT_ERROR_BODY = {
+    "error": "The AI service is busy right now (rate limit reached). Please try again in a moment."
+}
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True if `error` is the quota/queue error raised by generate_ai_response."""
+    return isinstance(error, ValueError) and "rate limit exceeded" in str(error)
+
+
+def default_study_tip(topic: str) -> str:
+    return f"Focus on understanding the core concepts of {topic} and practice applying them."
+
+
+def default_math_question(topic: str) -> dict:
+    return {
+        "question": f"Solve a quantitative problem related to {topic}",
+        "answer": "Apply the fundamental principles and formulas of the topic.",
+        "explanation": f"To solve problems involving {topic}, identify the given values, apply the relevant formulas, and solve step by step."
+    }
+
+
+def parse_math_question(text: str, topic: str) -> dict:
+    """Parse a QUESTION/ANSWER/EXPLANATION response into the math_question object."""
+    question_match = re.search(r'QUESTION:\s*(.+?)(?=ANSWER:|$)', text, re.DOTALL)
+    answer_match = re.search(r'ANSWER:\s*(.+?)(?=EXPLANATION:|$)', text, re.DOTALL)
+    explanation_match = re.search(r'EXPLANATION:\s*(.+?)$', text, re.DOTALL)
+
+    return {
+        "question": question_match.group(1).strip() if question_match else f"Calculate or solve a problem related to {topic}",
+        "answer": answer_match.group(1).strip() if answer_match else "The solution involves applying the relevant formula or principle.",
+        "explanation": explanation_match.group(1).strip() if explanation_match else text
+    }
+
+
+# Tokens of Wikipedia content included in each prompt (~1500 characters)
+PROMPT_CONTENT_TOKENS = int(os.getenv("STUDY_CONTENT_TOKENS", 400))
+
+
+def prompt_content(wiki_content: str) -> str:
+    """Wikipedia content cut to PROMPT_CONTENT_TOKENS at a sentence boundary."""
+    return truncate_to_tokens(wiki_content, PROMPT_CONTENT_TOKENS)
+
+SUMMARY_PROMPT = register_prompt("study.summary", """
+    Based on the following information about {topic}, create a concise summary with exactly 3 key bullet points.
+    Each bullet should be a single, clear sentence covering the most important aspects.
 
+    Information:
+    {wiki_content}
 
-def parse_quiz(text: str) -> list:
-    """Parse AI quiz into structured MCQ format."""
+    Format as:
+    - First key point
+    - Second key point
+    - Third key point
+""")
+
+QUIZ_PROMPT = register_prompt("study.quiz", """
+    Based on the following information about {topic}, create exactly 3 multiple-choice questions.
+    Each question should have 4 options (A, B, C, D) and clearly indicate the correct answer.
+
+    Information:
+    {wiki_content}
+
+    Format each question as:
+    Question 1: [question text]
+    A. [option A]
+    B. [option B]
+    C. [option C]
+    D. [option D]
+    Correct Answer: [A/B/C/D]
+
+    Question 2: ...
+""")
+
+STUDY_TIP_PROMPT = register_prompt("study.study_tip", """
+    Based on the following information about {topic}, provide ONE practical study tip
+    that would help a student learn and remember this topic effectively.
+    Keep it concise (1-2 sentences).
+
+    Information:
+    {wiki_content}
+""")
+
+MATH_PROMPT = register_prompt("study.math_question", """
+    Based on the following information about {topic}, create ONE quantitative or logic-based question.
+
+    Information:
+    {wiki_content}
+
+    Generate:
+    1. A challenging quantitative or logic question related to {topic}
+    2. The correct answer (with calculation if applicable)
+    3. A detailed explanation of how to solve it
+
+    Format your response as:
+    QUESTION: [the question]
+    ANSWER: [the answer]
+    EXPLANATION: [detailed explanation]
+""")
+
+
+# Prompt and parser (text, topic) -> value of each section
+SECTION_PROMPTS = {
+    "summary": SUMMARY_PROMPT,
+    "quiz": QUIZ_PROMPT,
+    "study_tip": STUDY_TIP_PROMPT,
+    "math_question": MATH_PROMPT,
+}
+
+SECTION_PARSERS = {
+    "summary": lambda text, topic: parse_summary(text),
+    "quiz": lambda text, topic: parse_quiz(text),
+    "study_tip": lambda text, topic: text.strip() or default_study_tip(topic),
+    "math_question": parse_math_question,
+}
+
+
+def generate_section(name: str, topic: str, wiki_content: str, on_delta=None):
+    """Generate one section from its own prompt."""
+    template = SECTION_PROMPTS[name]
+    prompt = template.render(topic=topic, wiki_content=prompt_content(wiki_content))
+    return SECTION_PARSERS[name](generate_ai_response(prompt, topic, on_delta, label=template.name), topic)
+
+
+async def agenerate_section(name: str, topic: str, wiki_content: str):
+    """generate_section() for the ASGI app."""
+    template = SECTION_PROMPTS[name]
+    prompt = template.render(topic=topic, wiki_content=prompt_content(wiki_content))
+    return SECTION_PARSERS[name](await agenerate_ai_response(prompt, topic, label=template.name), topic)
+
+
+def generate_summary_section(topic: str, wiki_content: str, on_delta=None) -> list:
+    """Generate summary (3 bullets)."""
+    return generate_section("summary", topic, wiki_content, on_delta)
+
+
+def generate_quiz_section(topic: str, wiki_content: str, on_delta=None) -> list:
+    """Generate quiz (3 MCQs)."""
+    return generate_section("quiz", topic, wiki_content, on_delta)
+
+
+def generate_study_tip_section(topic: str, wiki_content: str, on_delta=None) -> str:
+    """Generate study tip."""
+    return generate_section("study_tip", topic, wiki_content, on_delta)
+
+
+def generate_math_section(topic: str, wiki_content: str, on_delta=None) -> dict:
+    """Generate one quantitative/logic question."""
+    return generate_section("math_question", topic, wiki_content, on_delta)
+
+
+SECTION_GENERATORS = {
+    "summary": generate_summary_section,
+    "quiz": generate_quiz_section,
+    "study_tip": generate_study_tip_section,
+    "math_question": generate_math_section,
+}
+
+# Fallbacks used when a section fails; summary and quiz degrade to empty lists
+# so the rest of the pack can still be returned.
+SECTION_DEFAULTS = {
+    "summary": lambda topic: [],
+    "quiz": lambda topic: [],
+    "study_tip": default_study_tip,
+    "math_question": default_math_question,
+}
+
+
+def study_sections(mode: str) -> list:
+    """Section names generated for `mode`, in response order."""
+    sections = ["summary", "quiz", "study_tip"]
+    if mode == 'math':
+        sections.append("math_question")
+    return sections
+
+
+# JSON shape requested from the model in bundle mode, one entry per section
+BUNDLE_SCHEMA = {
+    "summary": '"summary": ["<key point 1>", "<key point 2>", "<key point 3>"]',
+    "quiz": '"quiz": [{"question": "<text>", "options": ["<A>", "<B>", "<C>", "<D>"], "correct": "<A|B|C|D>"}, ... exactly 3 items]',
+    "study_tip": '"study_tip": "<ONE practical study tip, 1-2 sentences>"',
+    "math_question": '"math_question": {"question": "<quantitative or logic question>", "answer": "<answer with calculation>", "explanation": "<step-by-step explanation>"}',
+}
+
+
+BUNDLE_PROMPT = register_prompt("study.bundle", """
+    Based on the following information about {topic}, create a study pack for a student.
+    The summary has exactly 3 single-sentence bullet points covering the most important aspects.
+    The quiz has exactly 3 multiple-choice questions with 4 options each.
+
+    Information:
+    {wiki_content}
+
+    Respond with ONLY a JSON object (no markdown fences) in this format:
+    {{
+    {schema}
+    }}
+""")
+
+
+def generate_bundle_text(topic: str, wiki_content: str, sections: list) -> str:
+    """Ask for every section in a single completion, as one JSON object."""
+    bundle_prompt = BUNDLE_PROMPT.render(topic=topic, wiki_content=prompt_content(wiki_content),
+                                         schema=",\n".join(BUNDLE_SCHEMA[name] for name in sections))
+    return generate_ai_response(bundle_prompt, topic, label=BUNDLE_PROMPT.name)
+
+
+def _clean_str(value):
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+
+def validate_summary(value):
+    if isinstance(value, str):
+        value = parse_summary(value)
+    if not isinstance(value, list):
+        return None
+    bullets = [_clean_str(item) for item in value]
+    bullets = [re.sub(r'^[-•*]\s*', '', b) for b in bullets if b]
+    return bullets[:3] or None
+
+
+def validate_quiz(value):
+    if isinstance(value, str):
+        value = parse_quiz(value)
+    if not isinstance(value, list):
+        return None
     questions = []
-    
-    # Split by "Question" markers
-    parts = re.split(r'(?:Question\s*\d+[:.]?\s*|^\d+[\.\)]\s*)', text, flags=re.MULTILINE | re.IGNORECASE)
-    
-    for part in parts[1:4]:  # Take first 3 questions
-        if not part.strip():
+    for item in value:
+        if not isinstance(item, dict):
             continue
-            
-        lines = [l.strip() for l in part.split('\n') if l.strip() and len(l.strip()) > 1]
-        if len(lines) < 2:
+        question = _clean_str(item.get("question"))
+        options = item.get("options")
+        correct = _clean_str(item.get("correct")) or ""
+        if not question or not isinstance(options, list) or len(options) != 4:
             continue
-            
-        question_text = lines[0].strip()
-        # Remove question number if present
-        question_text = re.sub(r'^\d+[\.\)]\s*', '', question_text)
-        options = []
-        correct_answer = None
-        
-        # Extract options (A-D format)
-        for line in lines[1:]:
-            option_match = re.match(r'^([A-D])[\.\)]\s*(.+)', line, re.IGNORECASE)
-            if option_match:
-                option_text = option_match.group(2).strip()
-                options.append(option_text)
-            elif 'correct' in line.lower() or 'answer' in line.lower():
-                # Extract correct answer
-                match = re.search(r'([A-D])', line, re.IGNORECASE)
-                if match:
-                    correct_answer = match.group(1).upper()
-        
-        # Ensure we have at least 2 options
-        if len(options) >= 2:
-            # Pad to 4 options if needed
-            while len(options) < 4:
-                options.append(f"Option {chr(65 + len(options))}")
-            
-            questions.append({
-                "question": question_text,
-                "options": options[:4],  # Max 4 options
-                "correct": correct_answer or "A"
-            })
-    
-    # If parsing failed, create structured format from text
-    if not questions or len(questions) < 3:
-        # Try alternative parsing: look for numbered questions
-        alt_parts = re.split(r'\n(?=\d+[\.\)]|\*\s*[A-Z])', text)
-        for part in alt_parts[:3]:
-            if len(questions) >= 3:
-                break
-            lines = [l.strip() for l in part.split('\n') if l.strip()]
-            if len(lines) >= 3:
-                question_text = lines[0]
-                options = [l for l in lines[1:5] if re.match(r'^[A-D]', l, re.IGNORECASE)]
-                if len(options) >= 2:
-                    questions.append({
-                        "question": question_text,
-                        "options": [re.sub(r'^[A-D][\.\)]\s*', '', opt).strip() for opt in options[:4]],
-                        "correct": "A"
-                    })
-    
-    # Final fallback: create basic questions
-    if len(questions) < 3:
-        sentences = re.split(r'[.!?]+', text)
-        for i in range(min(3 - len(questions), len(sentences) // 4)):
-            start = (len(questions) * 4) + i * 4
-            if start < len(sentences):
-                question_text = sentences[start].strip()
-                if question_text:
-                    questions.append({
-                        "question": question_text + "?",
-                        "options": [
-                            sentences[start + 1].strip() if start + 1 < len(sentences) else "Option A",
-                            sentences[start + 2].strip() if start + 2 < len(sentences) else "Option B",
-                            sentences[start + 3].strip() if start + 3 < len(sentences) else "Option C",
-                            "None of the above"
-                        ],
-                        "correct": "A"
-                    })
-    
-    return questions[:3]  # Return max 3 questions
+        options = [_clean_str(opt) for opt in options]
+        if not all(options) or correct[:1].upper() not in ("A", "B", "C", "D"):
+            continue
+        questions.append({"question": question, "options": options, "correct": correct[:1].upper()})
+    return questions[:3] if len(questions) >= 3 else None
+
+
+def validate_math_question(value):
+    if not isinstance(value, dict):
+        return None
+    fields = {key: _clean_str(value.get(key)) for key in ("question", "answer", "explanation")}
+    return fields if all(fields.values()) else None
+
+
+# Each validator returns the cleaned section or None. Free-text values are
+# run through the regular parsers first, so a model that ignores the schema
+# for one section still gets a usable result.
+BUNDLE_VALIDATORS = {
+    "summary": validate_summary,
+    "quiz": validate_quiz,
+    "study_tip": _clean_str,
+    "math_question": validate_math_question,
+}
+
+
+def generate_bundle_sections(topic: str, wiki_content: str, sections: list):
+    """
+    Generate `sections` with one combined-prompt call.
+
+    Returns (values, failed): validated section values and the names that
+    still need their own generation call.
+    """
+    data = extract_json_object(generate_bundle_text(topic, wiki_content, sections)) or {}
+    values = {}
+    for name in sections:
+        value = BUNDLE_VALIDATORS[name](data.get(name))
+        if value is not None:
+            values[name] = value
+    return values, [name for name in sections if name not in values]
+
+
+# JSON schemas for structured mode. Counts and non-blank strings are checked
+# by the compiled validators; the model is only constrained on shape.
+_TEXT = {"type": "string", "minLength": 1}
+STUDY_SCHEMAS = SchemaSet({
+    "summary": {
+        "type": "array", "items": _TEXT, "minItems": 3,
+        "description": "Exactly 3 single-sentence key points",
+    },
+    "quiz": {
+        "type": "array", "minItems": 3,
+        "description": "Exactly 3 multiple-choice questions",
+        "items": {
+            "type": "object",
+            "properties": {
+                "question": _TEXT,
+                "options": {"type": "array", "items": _TEXT, "minItems": 4, "maxItems": 4,
+                            "description": "Options A, B, C and D, without their letters"},
+                "correct": {"type": "string", "enum": ["A", "B", "C", "D"]},
+            },
+            "required": ["question", "options", "correct"],
+        },
+    },
+    "study_tip": dict(_TEXT, description="ONE practical study tip, 1-2 sentences"),
+    "math_question": {
+        "type": "object",
+        "properties": {
+            "question": dict(_TEXT, description="A quantitative or logic question"),
+            "answer": dict(_TEXT, description="The answer, with calculation if applicable"),
+            "explanation": dict(_TEXT, description="Step-by-step explanation"),
+        },
+        "required": ["question", "answer", "explanation"],
+    },
+})
+
+
+STRUCTURED_PROMPT = register_prompt("study.structured", """
+    Based on the following information about {topic}, create study material for a student.
+    Cover the most important aspects; quiz questions have exactly one correct option.
+
+    Information:
+    {wiki_content}
+""")
+
+
+def generate_structured_text(topic: str, wiki_content: str, schema: dict) -> str:
+    """Ask for the sections in `schema` as one schema-constrained JSON object."""
+    structured_prompt = STRUCTURED_PROMPT.render(topic=topic, wiki_content=prompt_content(wiki_content))
+    return generate_ai_response(structured_prompt, topic, schema=schema, label=STRUCTURED_PROMPT.name)
+
+
+def generate_structured_sections(topic: str, wiki_content: str, sections: list):
+    """
+    Generate `sections` as validated JSON, re-requesting only the sections
+    that fail validation (STRUCTURED_RETRIES times). Nothing is scraped from
+    free text. Returns (values, failed, attempts) as SchemaSet.generate does.
+    """
+    values, failed, attempts = STUDY_SCHEMAS.generate(
+        lambda schema: generate_structured_text(topic, wiki_content, schema), sections)
+    # Already valid; this only trims whitespace, extra items and bullet marks
+    values = {name: BUNDLE_VALIDATORS[name](value) for name, value in values.items()}
+    return values, failed, attempts
+
+
+def new_study_pack(topic: str, mode: str, values: dict) -> dict:
+    """The /study payload for `mode` built from {section: value}."""
+    pack = {
+        "topic": topic,
+        "mode": "math" if mode == 'math' else "normal",
+    }
+    for name in study_sections(mode):
+        pack[name] = values[name]
+    pack["source"] = "Wikipedia + Gemini AI"
+    return pack
+
+
+def complete_study_pack(topic: str, mode: str, values: dict, failed: dict) -> dict:
+    """
+    Build the payload from generated `values`, filling sections in `failed`
+    ({name: error}) with their defaults. An API key error or an exceeded
+    token budget is raised as is; losing both summary and quiz is raised
+    as ValueError.
+    """
+    for error in failed.values():
+        if is_api_key_error(error) or isinstance(error, TokenBudgetExceeded):
+            raise error
+    if "summary" in failed and "quiz" in failed:
+        raise ValueError(f"AI generation failed: {failed['summary']}")
+
+    for name, error in failed.items():
+        print(f"Section '{name}' failed for {topic!r}: {error}")
+        values[name] = SECTION_DEFAULTS[name](topic)
+    return new_study_pack(topic, mode, values)
+
+
+def assemble_study_pack(topic: str, mode: str, bundle: bool = False, structured: bool = False):
+    """
+    Fetch Wikipedia content and generate every section of the study pack.
+    Returns (pack, failed) where `failed` lists sections that fell back to
+    their defaults.
+
+    Sections run concurrently (see fanout.py). With `bundle`, one combined
+    prompt is tried first and only sections that fail validation are
+    regenerated separately; the pack then carries a "generation" report.
+    With `structured`, every section comes from schema-validated JSON
+    (see generate_structured_sections) and the report is always included.
+    A failed or timed-out section falls back to its default; an API key
+    error, an exceeded token budget, or losing both summary and quiz, is
+    raised as ValueError.
+    """
+    start = time.perf_counter()
+    wiki_content = fetch_wikipedia_content(topic)
+    sections = study_sections(mode)
+
+    if structured:
+        values, failed, attempts = generate_structured_sections(topic, wiki_content, sections)
+        pack = complete_study_pack(topic, mode, values, failed)
+        pack["generation"] = {
+            "path": "structured",
+            "retried_sections": [name for name in sections if any(name in names for names in attempts[1:])],
+            "failed_sections": list(failed),
+            "llm_calls": len(attempts),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000),
+        }
+        return pack, list(failed)
+
+    values, pending = {}, sections
+    if bundle:
+        try:
+            values, pending = generate_bundle_sections(topic, wiki_content, sections)
+        except ValueError as e:
+            if is_api_key_error(e) or isinstance(e, TokenBudgetExceeded):
+                raise
+            print(f"Bundle generation failed for {topic!r}: {e}")
+
+    results = run_sections({
+        name: (lambda generate=SECTION_GENERATORS[name]: generate(topic, wiki_content))
+        for name in pending
+    })
+
+    failed = {name: result.error for name, result in results.items() if not result.ok}
+    values.update((name, result.value) for name, result in results.items() if result.ok)
+    pack = complete_study_pack(topic, mode, values, failed)
+
+    if bundle:
+        if not pending:
+            path = "bundle"
+        elif len(pending) == len(sections):
+            path = "sections"
+        else:
+            path = "bundle+sections"
+        pack["generation"] = {
+            "path": path,
+            "fallback_sections": pending,
+            "llm_calls": 1 + len(pending),
+            "elapsed_ms": round((time.perf_counter() - start) * 1000),
+        }
+    return pack, list(failed)
+
+
+def study_cache_key(topic: str, mode: str, bundle: bool = False, structured: bool = False,
+                    source: str = "page") -> str:
+    """
+    Cache key of a study pack. `source` names the Wikipedia text it was
+    generated from: "page" (fetch_wikipedia_content) or "intro" (the intro
+    extracts of fetch_wikipedia_contents), so packs from one never answer
+    requests for the other.
+    """
+    mode = "math" if mode == 'math' else "normal"
+    model_name = "mock" if USE_MOCK_MODE else llm_router.models
+    # Every template the pack may be built from (bundle falls back to the section prompts)
+    if structured:
+        # Packs are validated against STUDY_SCHEMAS, so a schema edit retires them too
+        names, variant = ["study.structured"], f"+structured.{STUDY_SCHEMAS.version}"
+    else:
+        names = [f"study.{name}" for name in SECTION_GENERATORS] + (["study.bundle"] if bundle else [])
+        variant = "+bundle" if bundle else ""
+    if source != "page":
+        variant += f"+{source}"
+    version = f"{PARSER_VERSION}.{prompts.version(*names)}{variant}"
+    return make_key(resolve_topic(topic), mode, model_name, version)
+
+
+def build_study_pack(topic: str, mode: str, bundle: bool = False, cache_policy: str = "use",
+                     structured: bool = False):
+    """
+    Return (pack, cache_status) for `topic`, serving from the study pack
+    cache when possible.
+
+    cache_policy is "use" (read and write), "refresh" (regenerate and
+    overwrite) or "bypass" (neither). cache_status is "hit", "miss",
+    "refresh", "bypass" or "coalesced" when the pack came from an identical
+    request already in flight. Packs with failed sections are never cached.
+    Packs are generated for the resolved title; "topic" echoes the request.
+    On a hit, the "generation" report's llm_calls and elapsed_ms describe
+    the cache lookup.
+    """
+    use_cache = CACHE_ENABLED and cache_policy != "bypass"
+    title = resolve_topic(topic)
+    key = study_cache_key(title, mode, bundle, structured)
+    if use_cache and cache_policy == "use":
+        start = time.perf_counter()
+        cached = study_cache.get(key)
+        if cached is not None:
+            pack = dict(cached, topic=topic)
+            if "generation" in pack:
+                # Report this response's cost and latency, not the original generation's
+                pack["generation"] = dict(pack["generation"], llm_calls=0,
+                                          elapsed_ms=round((time.perf_counter() - start) * 1000))
+            return pack, "hit"
+
+    def generate():
+        pack, failed = assemble_study_pack(title, mode, bundle, structured)
+        stored = use_cache and not failed
+        if stored:
+            study_cache.set(key, pack)
+        return pack, failed, stored
+
+    (pack, failed, stored), shared = study_flights.do(key, generate, timeout=COALESCE_TIMEOUT)
+    if use_cache and not failed and not stored:
+        # Joined a run started with cache=0: this request's policy stores the pack
+        study_cache.set(key, pack)
+    pack = dict(pack, topic=topic)
+    if shared:
+        return pack, "coalesced"
+    if not use_cache:
+        return pack, "bypass"
+    return pack, "miss" if cache_policy == "use" else "refresh"
+
+
+def study_options(args) -> dict:
+    """build_study_pack() keyword arguments from /study query parameters (Flask or Starlette)."""
+    structured = args.get('structured', '').strip().lower()
+    if args.get('cache', '').strip().lower() in ('0', 'false', 'no'):
+        cache_policy = "bypass"
+    elif args.get('refresh', '').strip().lower() in ('1', 'true', 'yes'):
+        cache_policy = "refresh"
+    else:
+        cache_policy = "use"
+    return {
+        "topic": args.get('topic', '').strip(),
+        "mode": args.get('mode', '').strip().lower(),
+        "bundle": args.get('bundle', '').strip().lower() in ('1', 'true', 'yes'),
+        "cache_policy": cache_policy,
+        "structured": structured in ('1', 'true', 'yes') if structured else STRUCTURED_OUTPUT,
+    }
+
+
+def study_error(error: Exception):
+    """(body, status, headers) for a /study failure reported to the client, or None for unexpected errors."""
+    if isinstance(error, TokenBudgetExceeded):
+        return {"error": str(error)}, 429, {}
+    if isinstance(error, CoalescedTimeout):
+        return {"error": str(error)}, 504, {}
+    if isinstance(error, ValueError):
+        if is_api_key_error(error):
+            return API_KEY_ERROR_BODY, 401, {}
+        if is_rate_limit_error(error):
+            return RATE_LIMIT_ERROR_BODY, 503, {'Retry-After': '30'}
+    return None
+
+
+def study_headers(cache_status: str, usage) -> dict:
+    return {
+        'X-Cache': cache_status.upper(),
+        # Tokens spent by this request (0 on cache hits and coalesced requests)
+        'X-LLM-Tokens': f"in={usage.tokens_in}, out={usage.tokens_out}, calls={usage.calls}",
+    }
 
 
 @app.route('/study', methods=['GET'])
 def study_endpoint():
     """
-    Main study endpoint: /study?topic=<topic>&mode=<mode>
+    Main study endpoint: /study?topic=<topic>&mode=<mode>[&bundle=1][&structured=1]
+    
+    With bundle=1 all sections are requested in one combined prompt, and a
+    "generation" object reports which path produced them. structured=1
+    (default: STUDY_STRUCTURED_OUTPUT) requests schema-validated JSON and
+    retries only the sections that fail validation; it takes precedence
+    over bundle.
     
     Returns:
     - summary: list of 3 bullet points
@@ -280,245 +992,326 @@ def study_endpoint():
     - math_question: (if mode=math) object with question, answer, explanation
     """
     try:
-        topic = request.args.get('topic', '').strip()
-        mode = request.args.get('mode', '').strip().lower()
+        options = study_options(request.args)
         
-        if not topic:
+        if not options["topic"]:
             return jsonify({
                 "error": "Topic parameter is required"
             }), 400
         
-        # Fetch Wikipedia content
-        wiki_content = fetch_wikipedia_content(topic)
-        
-        if mode == 'math':
-            # Math mode: Generate summary, quiz, study tip, AND one quantitative/logic question
-            try:
-                # Generate summary (3 bullets)
-                summary_prompt = f"""
-                Based on the following information about {topic}, create a concise summary with exactly 3 key bullet points.
-                Each bullet should be a single, clear sentence covering the most important aspects.
-                
-                Information:
-                {wiki_content[:1500]}
-                
-                Format as:
-                - First key point
-                - Second key point  
-                - Third key point
-                """
-                
-                summary_text = generate_ai_response(summary_prompt, topic)
-                summary = parse_summary(summary_text)
-            except ValueError as e:
-                if "API key" in str(e):
-                    return jsonify({
-                        "error": "Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in the backend/.env file.",
-                        "details": "Get your free API key from: https://makersuite.google.com/app/apikey"
-                    }), 401
+        try:
+            with token_ledger.request() as usage:
+                pack, cache_status = build_study_pack(**options)
+        except (ValueError, CoalescedTimeout) as e:
+            error = study_error(e)
+            if error is None:
                 raise
-            
-            try:
-                # Generate quiz (3 MCQs)
-                quiz_prompt = f"""
-                Based on the following information about {topic}, create exactly 3 multiple-choice questions.
-                Each question should have 4 options (A, B, C, D) and clearly indicate the correct answer.
-                
-                Information:
-                {wiki_content[:1500]}
-                
-                Format each question as:
-                Question 1: [question text]
-                A. [option A]
-                B. [option B]
-                C. [option C]
-                D. [option D]
-                Correct Answer: [A/B/C/D]
-                
-                Question 2: ...
-                """
-                
-                quiz_text = generate_ai_response(quiz_prompt, topic)
-                quiz = parse_quiz(quiz_text)
-            except ValueError as e:
-                if "API key" in str(e):
-                    return jsonify({
-                        "error": "Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in the backend/.env file.",
-                        "details": "Get your free API key from: https://makersuite.google.com/app/apikey"
-                    }), 401
-                raise
-            
-            try:
-                # Generate study tip
-                tip_prompt = f"""
-                Based on the following information about {topic}, provide ONE practical study tip 
-                that would help a student learn and remember this topic effectively.
-                Keep it concise (1-2 sentences).
-                
-                Information:
-                {wiki_content[:1500]}
-                """
-                
-                study_tip = generate_ai_response(tip_prompt, topic).strip()
-                if not study_tip:
-                    study_tip = f"Focus on understanding the core concepts of {topic} and practice applying them."
-            except ValueError as e:
-                if "API key" in str(e):
-                    return jsonify({
-                        "error": "Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in the backend/.env file.",
-                        "details": "Get your free API key from: https://makersuite.google.com/app/apikey"
-                    }), 401
-                # If study tip fails, use a default
-                study_tip = f"Focus on understanding the core concepts of {topic} and practice applying them."
-            
-            try:
-                # Generate math question
-                math_prompt = f"""
-                Based on the following information about {topic}, create ONE quantitative or logic-based question.
-                
-                Information:
-                {wiki_content[:1500]}
-                
-                Generate:
-                1. A challenging quantitative or logic question related to {topic}
-                2. The correct answer (with calculation if applicable)
-                3. A detailed explanation of how to solve it
-                
-                Format your response as:
-                QUESTION: [the question]
-                ANSWER: [the answer]
-                EXPLANATION: [detailed explanation]
-                """
-                
-                math_response = generate_ai_response(math_prompt, topic)
-                
-                # Parse math response
-                question_match = re.search(r'QUESTION:\s*(.+?)(?=ANSWER:|$)', math_response, re.DOTALL)
-                answer_match = re.search(r'ANSWER:\s*(.+?)(?=EXPLANATION:|$)', math_response, re.DOTALL)
-                explanation_match = re.search(r'EXPLANATION:\s*(.+?)$', math_response, re.DOTALL)
-                
-                math_question = {
-                    "question": question_match.group(1).strip() if question_match else f"Calculate or solve a problem related to {topic}",
-                    "answer": answer_match.group(1).strip() if answer_match else "The solution involves applying the relevant formula or principle.",
-                    "explanation": explanation_match.group(1).strip() if explanation_match else math_response
-                }
-            except ValueError as e:
-                if "API key" in str(e):
-                    return jsonify({
-                        "error": "Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in the backend/.env file.",
-                        "details": "Get your free API key from: https://makersuite.google.com/app/apikey"
-                    }), 401
-                # If math question fails, create a basic one
-                math_question = {
-                    "question": f"Solve a quantitative problem related to {topic}",
-                    "answer": "Apply the fundamental principles and formulas of the topic.",
-                    "explanation": f"To solve problems involving {topic}, identify the given values, apply the relevant formulas, and solve step by step."
-                }
-            
-            return jsonify({
-                "topic": topic,
-                "mode": "math",
-                "summary": summary,
-                "quiz": quiz,
-                "study_tip": study_tip,
-                "math_question": math_question,
-                "source": "Wikipedia + Gemini AI"
-            }), 200
+            body, status, headers = error
+            return jsonify(body), status, headers
         
-        else:
-            # Normal mode: Generate summary, quiz, and study tip
-            
-            try:
-                # Generate summary (3 bullets)
-                summary_prompt = f"""
-                Based on the following information about {topic}, create a concise summary with exactly 3 key bullet points.
-                Each bullet should be a single, clear sentence covering the most important aspects.
-                
-                Information:
-                {wiki_content[:1500]}
-                
-                Format as:
-                - First key point
-                - Second key point  
-                - Third key point
-                """
-                
-                summary_text = generate_ai_response(summary_prompt, topic)
-                summary = parse_summary(summary_text)
-            except ValueError as e:
-                if "API key" in str(e):
-                    return jsonify({
-                        "error": "Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in the backend/.env file.",
-                        "details": "Get your free API key from: https://makersuite.google.com/app/apikey"
-                    }), 401
-                raise
+        response = jsonify(pack)
+        response.headers.update(study_headers(cache_status, usage))
+        return response, 200
+    
+    except Exception as e:
+        return jsonify({
+            "error": f"Internal server error: {str(e)}"
+        }), 500
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/study/stream', methods=['GET'])
+def study_stream_endpoint():
+    """
+    Streaming study endpoint: /study/stream?topic=<topic>&mode=<mode>[&tokens=1]
+    
+    Server-Sent Events, in order of completion:
+    - section: {"section": name, "value": ...} as each section is ready
+    - delta: {"section": name, "text": ...} model output chunks (tokens=1 only)
+    - done: the same payload /study returns
+    - error: {"error": ...} if the pack cannot be generated; always the
+      last event, including for failures after the response has started
+    """
+    topic = request.args.get('topic', '').strip()
+    mode = request.args.get('mode', '').strip().lower()
+    tokens = request.args.get('tokens', '').strip().lower() in ('1', 'true', 'yes')
+    
+    if not topic:
+        return jsonify({
+            "error": "Topic parameter is required"
+        }), 400
+    
+    def pack_events():
+        title = resolve_topic(topic)
+        key = study_cache_key(title, mode)
+        cached = study_cache.get(key) if CACHE_ENABLED else None
+        if cached is not None:
+            pack = dict(cached, topic=topic)
+            for name in study_sections(mode):
+                yield sse_event("section", {"section": name, "value": pack[name]})
+            yield sse_event("done", pack)
+            return
+        
+        wiki_content = fetch_wikipedia_content(title)
+        tasks = {
+            name: (lambda on_delta, generate=SECTION_GENERATORS[name]:
+                   generate(title, wiki_content, on_delta if tokens else None))
+            for name in study_sections(mode)
+        }
+        
+        values, failed = {}, {}
+        for event in stream_sections(tasks):
+            if event[0] == "delta":
+                yield sse_event("delta", {"section": event[1], "text": event[2]})
+                continue
             
+            result = event[1]
+            if result.ok:
+                values[result.name] = result.value
+            elif is_api_key_error(result.error):
+                yield sse_event("error", API_KEY_ERROR_BODY)
+                return
+            else:
+                print(f"Section '{result.name}' failed for {topic!r}: {result.error}")
+                failed[result.name] = result.error
+                values[result.name] = SECTION_DEFAULTS[result.name](title)
+            yield sse_event("section", {
+                "section": result.name,
+                "value": values[result.name],
+                "elapsed_ms": round(result.elapsed * 1000),
+            })
+        
+        if "summary" in failed and "quiz" in failed:
+            yield sse_event("error", {"error": f"Internal server error: AI generation failed: {failed['summary']}"})
+            return
+        
+        pack = new_study_pack(title, mode, values)
+        if CACHE_ENABLED and not failed:
+            study_cache.set(key, pack)
+        yield sse_event("done", dict(pack, topic=topic))
+    
+    def events():
+        # The 200 and its headers are already sent: failures end the stream with an error event
+        try:
+            yield from pack_events()
+        except Exception as e:
+            print(f"Study stream failed for {topic!r}: {e}")
+            error = study_error(e)
+            yield sse_event("error", error[0] if error else {"error": f"Internal server error: {str(e)}"})
+    
+    return Response(stream_with_context(events()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # stop reverse proxies from buffering the stream
+    })
+
+
+def run_at_batch_priority(fn, *args):
+    """Run fn(*args) with its LLM calls queued behind interactive requests."""
+    with llm_priority(PRIORITY_BATCH):
+        return fn(*args)
+
+
+def run_batch_sections(tasks: dict, timeout: float = None):
+    """
+    Run {(key, section): fn} on the batch pool at batch priority, yielding
+    (key, SectionResult) as each section finishes. A section gets `timeout`
+    (SECTION_TIMEOUT) from when a worker picks it up; one still queued fails
+    once the pool has made no progress for that long, so a hung model call
+    cannot stall the rest of the batch. Late results are discarded.
+    """
+    timeout = SECTION_TIMEOUT if timeout is None else timeout
+    started = {}
+    
+    def run(task, fn):
+        started[task] = time.perf_counter()
+        return run_at_batch_priority(fn)
+    
+    def deadline(future):
+        return started.get(futures[future], progress) + timeout
+    
+    futures = {_batch_executor.submit(run, task, fn): task for task, fn in tasks.items()}
+    progress = time.perf_counter()
+    pending = set(futures)
+    while pending:
+        done, _ = wait(pending, timeout=max(0.0, min(map(deadline, pending)) - time.perf_counter()),
+                       return_when=FIRST_COMPLETED)
+        now = time.perf_counter()
+        for future in done:
+            pending.discard(future)
+            (key, name), elapsed = futures[future], now - started.get(futures[future], now)
             try:
-                # Generate quiz (3 MCQs)
-                quiz_prompt = f"""
-                Based on the following information about {topic}, create exactly 3 multiple-choice questions.
-                Each question should have 4 options (A, B, C, D) and clearly indicate the correct answer.
-                
-                Information:
-                {wiki_content[:1500]}
-                
-                Format each question as:
-                Question 1: [question text]
-                A. [option A]
-                B. [option B]
-                C. [option C]
-                D. [option D]
-                Correct Answer: [A/B/C/D]
-                
-                Question 2: ...
-                """
-                
-                quiz_text = generate_ai_response(quiz_prompt, topic)
-                quiz = parse_quiz(quiz_text)
-            except ValueError as e:
-                if "API key" in str(e):
-                    return jsonify({
-                        "error": "Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in the backend/.env file.",
-                        "details": "Get your free API key from: https://makersuite.google.com/app/apikey"
-                    }), 401
-                raise
+                yield key, SectionResult(name, value=future.result(), elapsed=elapsed)
+            except Exception as e:
+                yield key, SectionResult(name, error=e, elapsed=elapsed)
+        if done:
+            progress = now
+        for future in [future for future in pending if deadline(future) <= now]:
+            # The worker cannot be interrupted; a queued section is dropped
+            future.cancel()
+            pending.discard(future)
+            key, name = futures[future]
+            yield key, SectionResult(name, error=SectionTimeout(f"Section '{name}' timed out after {timeout:.0f}s"),
+                                     elapsed=now - started.get(futures[future], now))
+
+
+def parse_batch_items(body) -> list:
+    """
+    Normalise a /study/batch body into [(topic, mode), ...].
+    Accepts {"topics": ["A", {"topic": "B", "mode": "math"}], "mode": "..."};
+    raises ValueError on malformed input.
+    """
+    if not isinstance(body, dict) or not isinstance(body.get("topics"), list):
+        raise ValueError('Request body must be JSON like {"topics": ["Photosynthesis", "Calculus"]}')
+    default_mode = str(body.get("mode") or "").strip().lower()
+    items = []
+    for entry in body["topics"]:
+        if isinstance(entry, dict):
+            topic, mode = entry.get("topic"), entry.get("mode", default_mode)
+        else:
+            topic, mode = entry, default_mode
+        if not isinstance(topic, str) or not topic.strip():
+            raise ValueError(f"Invalid topic entry: {entry!r}")
+        items.append((topic.strip(), str(mode or "").strip().lower()))
+    if len(items) > BATCH_MAX_TOPICS:
+        raise ValueError(f"At most {BATCH_MAX_TOPICS} topics per batch")
+    return items
+
+
+@app.route('/study/batch', methods=['POST'])
+def study_batch_endpoint():
+    """
+    Batch study endpoint: POST /study/batch {"topics": [...], "mode": "math"}
+    
+    Topics are deduplicated (same normalization as the cache), Wikipedia
+    content is fetched in bulk, and every LLM call goes through a shared pool
+    of BATCH_MAX_CONCURRENCY workers; a section that misses
+    STUDY_SECTION_TIMEOUT falls back to its default. Streams NDJSON, one
+    line per unique topic as it completes:
+    - {"topic", "mode", "requested": [...], "status": "ok", "result": <pack>}
+    - {"topic", "mode", "requested": [...], "status": "error", "error": "..."}
+    followed by a final {"done": true, "stats": {...}} line.
+    """
+    try:
+        items = parse_batch_items(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Packs built from intro extracts are cached apart from /study's; the
+    # offline store gives both endpoints the same text
+    source = "page" if wiki_dump is not None else "intro"
+    jobs = {}
+    for topic, mode in items:
+        title = resolve_topic(topic)
+        key = study_cache_key(title, mode, source=source)
+        if key not in jobs:
+            jobs[key] = {"topic": topic, "title": title, "mode": "math" if mode == 'math' else "normal",
+                         "requested": []}
+        jobs[key]["requested"].append(topic)
+    
+    def line(job, **fields):
+        return json.dumps({"topic": job["topic"], "mode": job["mode"], "requested": job["requested"], **fields}) + "\n"
+    
+    def results():
+        start = time.perf_counter()
+        stats = {"requested": len(items), "unique": len(jobs), "cached": 0, "ok": 0, "errors": 0}
+        
+        pending = {}
+        for key, job in jobs.items():
+            cached = study_cache.get(key) if CACHE_ENABLED else None
+            if cached is not None:
+                stats["cached"] += 1
+                stats["ok"] += 1
+                yield line(job, status="ok", result=dict(cached, topic=job["topic"]))
+            else:
+                pending[key] = job
+        
+        contents = fetch_wikipedia_contents([job["title"] for job in pending.values()]) if pending else {}
+        tasks = {}
+        for key, job in pending.items():
+            job["values"], job["failed"] = {}, {}
+            job["remaining"] = set(study_sections(job["mode"]))
+            for name in job["remaining"]:
+                tasks[key, name] = (lambda generate=SECTION_GENERATORS[name], title=job["title"],
+                                    wiki_content=contents[job["title"]]: generate(title, wiki_content))
+        
+        for key, result in run_batch_sections(tasks):
+            job = pending[key]
+            if result.ok:
+                job["values"][result.name] = result.value
+            else:
+                job["failed"][result.name] = result.error
+            job["remaining"].discard(result.name)
+            if job["remaining"]:
+                continue
             
             try:
-                # Generate study tip
-                tip_prompt = f"""
-                Based on the following information about {topic}, provide ONE practical study tip 
-                that would help a student learn and remember this topic effectively.
-                Keep it concise (1-2 sentences).
-                
-                Information:
-                {wiki_content[:1500]}
-                """
-                
-                study_tip = generate_ai_response(tip_prompt, topic).strip()
-                if not study_tip:
-                    study_tip = f"Focus on understanding the core concepts of {topic} and practice applying them."
+                pack = complete_study_pack(job["title"], job["mode"], job["values"], job["failed"])
             except ValueError as e:
-                if "API key" in str(e):
-                    return jsonify({
-                        "error": "Invalid or missing Gemini API key. Please check your GEMINI_API_KEY in the backend/.env file.",
-                        "details": "Get your free API key from: https://makersuite.google.com/app/apikey"
-                    }), 401
-                # If study tip fails, use a default
-                study_tip = f"Focus on understanding the core concepts of {topic} and practice applying them."
-            
-            return jsonify({
-                "topic": topic,
-                "mode": "normal",
-                "summary": summary,
-                "quiz": quiz,
-                "study_tip": study_tip,
-                "source": "Wikipedia + Gemini AI"
-            }), 200
+                stats["errors"] += 1
+                error = API_KEY_ERROR_BODY["error"] if is_api_key_error(e) else str(e)
+                yield line(job, status="error", error=error)
+                continue
+            if CACHE_ENABLED and not job["failed"]:
+                study_cache.set(key, pack)
+            stats["ok"] += 1
+            yield line(job, status="ok", result=dict(pack, topic=job["topic"]))
+        
+        stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000)
+        yield json.dumps({"done": True, "stats": stats}) + "\n"
     
-    except Exception as e:
-        return jsonify({
-            "error": f"Internal server error: {str(e)}"
-        }), 500
+    return Response(stream_with_context(results()), mimetype='application/x-ndjson', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@app.route('/study/cache', methods=['GET'])
+def study_cache_stats():
+    """Hit/miss counters and entry counts for the study pack cache."""
+    return jsonify({"enabled": CACHE_ENABLED, **study_cache.snapshot(), "wikipedia": dict(wiki_dump.stats if wiki_dump else wikipedia.stats)}), 200
+
+
+@app.route('/study/cache', methods=['DELETE'])
+def study_cache_invalidate():
+    """
+    Invalidate cached packs: /study/cache?topic=<topic>[&mode=<mode>]
+    drops one topic (all modes unless given); no topic clears everything.
+    """
+    topic = request.args.get('topic', '').strip()
+    mode = request.args.get('mode', '').strip().lower()
+    if not topic:
+        study_cache.clear()
+        return jsonify({"cleared": True}), 200
+
+    prefix = normalize_topic(resolve_topic(topic)) + "|"
+    if mode:
+        prefix += ("math" if mode == 'math' else "normal") + "|"
+    return jsonify({"invalidated": study_cache.delete_prefix(prefix)}), 200
+
+
+def study_metrics_snapshot() -> dict:
+    return {
+        "single_flight": study_flights.snapshot(),
+        "llm_scheduler": llm_scheduler.snapshot(),
+        "llm_router": llm_router.snapshot() if llm_router is not None else None,
+        "topic_resolver": topic_resolver.snapshot(),
+        "prompts": prompts.snapshot(),
+        "tokens": token_ledger.snapshot(),
+    }
+
+
+@app.route('/study/metrics', methods=['GET'])
+def study_metrics():
+    """
+    Request coalescing, LLM scheduler queue depth / wait times, provider
+    latency / circuit breaker state, topic resolution counters, prompt
+    versions and token usage per prompt.
+    """
+    return jsonify(study_metrics_snapshot()), 200
 
 
 @app.route('/health', methods=['GET'])
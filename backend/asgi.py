@@ -0,0 +1,188 @@
+"""
+Smart Study Assistant - ASGI server profile
+Serves /study and /health from an event loop (Starlette on uvicorn) so one
+slow model call no longer ties up a server worker: section prompts are
+awaited through the router's async provider clients and the scheduler's
+asubmit(), and each worker process handles many requests concurrently.
+Work that is still blocking (Wikipedia fetches, bundle and structured
+packs) runs on a bounded thread pool. Every other route is served by the
+Flask app (app.py), mounted underneath.
+
+Run with: python asgi.py  (ASGI_WORKERS worker processes on PORT)
+     or:  uvicorn asgi:app --host 0.0.0.0 --port 5001 --workers 4 --timeout-graceful-shutdown 30
+"""
+import asyncio
+import functools
+import os
+import time
+import warnings
+
+import uvicorn
+from anyio import CapacityLimiter, to_thread
+from dotenv import load_dotenv
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+import app as backend
+from fanout import SECTION_TIMEOUT, SectionResult, SectionTimeout
+from single_flight import AsyncSingleFlight, CoalescedTimeout
+from utils.token_budget import ledger as token_ledger
+
+with warnings.catch_warnings():
+    # Deprecated in favour of a2wsgi, which is not a dependency; only the
+    # routes without an async variant go through it
+    warnings.simplefilter("ignore")
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+load_dotenv()
+
+# A /study request still running after this many seconds gets a 504
+STUDY_REQUEST_TIMEOUT = float(os.getenv("STUDY_REQUEST_TIMEOUT", 60))
+# Threads per worker for blocking work (Wikipedia fetches, bundle/structured packs)
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", 32))
+ASGI_WORKERS = int(os.getenv("ASGI_WORKERS", 4))
+# Seconds in-flight requests get to finish on shutdown or reload
+ASGI_GRACEFUL_TIMEOUT = int(os.getenv("ASGI_GRACEFUL_TIMEOUT", 30))
+ASGI_KEEPALIVE_TIMEOUT = int(os.getenv("ASGI_KEEPALIVE_TIMEOUT", 5))
+# Connections a worker accepts before answering 503 (0 = unlimited)
+ASGI_MAX_CONNECTIONS = int(os.getenv("ASGI_MAX_CONNECTIONS", 0))
+
+thread_limiter = CapacityLimiter(ASGI_THREADS)
+# Identical concurrent /study requests in this worker share one pipeline run
+study_flights = AsyncSingleFlight()
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """fn(*args, **kwargs) on the bounded thread pool, in a copy of the request's context."""
+    return await to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=thread_limiter)
+
+
+async def run_section(name: str, topic: str, wiki_content: str, timeout: float = None) -> SectionResult:
+    """One section with its deadline; errors come back on the result, as with fanout.run_sections."""
+    timeout = SECTION_TIMEOUT if timeout is None else timeout
+    start = time.perf_counter()
+    try:
+        value = await asyncio.wait_for(backend.agenerate_section(name, topic, wiki_content), timeout)
+    except asyncio.TimeoutError:
+        return SectionResult(name, error=SectionTimeout(f"Section '{name}' timed out after {timeout:.0f}s"),
+                             elapsed=time.perf_counter() - start)
+    except Exception as e:
+        return SectionResult(name, error=e, elapsed=time.perf_counter() - start)
+    return SectionResult(name, value=value, elapsed=time.perf_counter() - start)
+
+
+async def assemble_study_pack(topic: str, mode: str):
+    """app.assemble_study_pack() for the per-section path, with the sections awaited concurrently."""
+    # No async HTTP client in the tree: the pooled requests client runs on a thread
+    wiki_content = await run_blocking(backend.fetch_wikipedia_content, topic)
+    sections = backend.study_sections(mode)
+    results = await asyncio.gather(*(run_section(name, topic, wiki_content) for name in sections))
+    failed = {result.name: result.error for result in results if not result.ok}
+    values = {result.name: result.value for result in results if result.ok}
+    return backend.complete_study_pack(topic, mode, values, failed), list(failed)
+
+
+async def build_study_pack(topic: str, mode: str, bundle: bool = False, cache_policy: str = "use",
+                           structured: bool = False):
+    """
+    app.build_study_pack() on the event loop: same cache keys, cache
+    policies and statuses. Bundle and structured packs are built by the
+    threaded pipeline on the thread pool.
+    """
+    if bundle or structured:
+        return await run_blocking(backend.build_study_pack, topic, mode, bundle=bundle, cache_policy=cache_policy,
+                                  structured=structured)
+    use_cache = backend.CACHE_ENABLED and cache_policy != "bypass"
+    title = backend.resolve_topic(topic)
+    key = backend.study_cache_key(title, mode)
+    if use_cache and cache_policy == "use":
+        # Memory first, then a local SQLite read: cheap enough for the loop
+        cached = backend.study_cache.get(key)
+        if cached is not None:
+            return dict(cached, topic=topic), "hit"
+
+    async def generate():
+        # Runs in a fresh context (see AsyncSingleFlight) and may outlive the
+        # request that started it, so its calls go to a token scope of its own
+        with token_ledger.request() as usage:
+            pack, failed = await assemble_study_pack(title, mode)
+        stored = use_cache and not failed
+        if stored:
+            backend.study_cache.set(key, pack)
+        return pack, failed, stored, usage
+
+    (pack, failed, stored, usage), shared = await study_flights.do(key, generate,
+                                                                   timeout=backend.COALESCE_TIMEOUT)
+    if not shared:
+        # The leader's response reports the run's tokens (X-LLM-Tokens)
+        token_ledger.merge(usage)
+    if use_cache and not failed and not stored:
+        # Joined a run started with cache=0: this request's policy stores the pack
+        backend.study_cache.set(key, pack)
+    pack = dict(pack, topic=topic)
+    if shared:
+        return pack, "coalesced"
+    if not use_cache:
+        return pack, "bypass"
+    return pack, "miss" if cache_policy == "use" else "refresh"
+
+
+async def study_endpoint(request):
+    """/study as in app.py, plus a 504 once the request passes STUDY_REQUEST_TIMEOUT."""
+    try:
+        options = backend.study_options(request.query_params)
+        if not options["topic"]:
+            return JSONResponse({"error": "Topic parameter is required"}, 400)
+
+        try:
+            with token_ledger.request() as usage:
+                pack, cache_status = await asyncio.wait_for(build_study_pack(**options), STUDY_REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            return JSONResponse({"error": f"Request timed out after {STUDY_REQUEST_TIMEOUT:.0f}s"}, 504)
+        except (ValueError, CoalescedTimeout) as e:
+            error = backend.study_error(e)
+            if error is None:
+                raise
+            body, status, headers = error
+            return JSONResponse(body, status, headers)
+
+        return JSONResponse(pack, 200, backend.study_headers(cache_status, usage))
+
+    except Exception as e:
+        return JSONResponse({"error": f"Internal server error: {str(e)}"}, 500)
+
+
+async def study_metrics(request):
+    """app.py's /study/metrics, with this worker's async request coalescing."""
+    return JSONResponse(dict(backend.study_metrics_snapshot(), async_single_flight=study_flights.snapshot()))
+
+
+async def health_check(request):
+    """Health check endpoint."""
+    return JSONResponse({"status": "healthy", "service": "Smart Study Assistant API"})
+
+
+# The Flask app sets its own CORS headers on the mounted routes
+_cors = [Middleware(CORSMiddleware, allow_origins=["*"])]
+
+app = Starlette(routes=[
+    Route('/study', study_endpoint, methods=['GET'], middleware=_cors),
+    Route('/study/metrics', study_metrics, methods=['GET'], middleware=_cors),
+    Route('/health', health_check, methods=['GET'], middleware=_cors),
+    Mount('/', app=WSGIMiddleware(backend.app)),
+])
+
+
+if __name__ == '__main__':
+    uvicorn.run(
+        "asgi:app",
+        host='0.0.0.0',
+        port=int(os.getenv('PORT', 5001)),
+        workers=ASGI_WORKERS,
+        timeout_graceful_shutdown=ASGI_GRACEFUL_TIMEOUT,
+        timeout_keep_alive=ASGI_KEEPALIVE_TIMEOUT,
+        limit_concurrency=ASGI_MAX_CONNECTIONS or None,
+    )
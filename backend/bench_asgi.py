@@ -0,0 +1,94 @@
+"""
+/study throughput benchmark: Flask dev server vs the ASGI profile
+Serves /study from the threaded Werkzeug server (python app.py) and from
+uvicorn (asgi.py) in this process, with every model call answered by a
+FakeProvider after a fixed latency and Wikipedia stubbed out, and fires
+concurrent uncached requests at each.
+
+Run with: python bench_asgi.py [--requests 200] [--concurrency 50] [--latency-ms 500]
+"""
+import argparse
+import logging
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import uvicorn
+from werkzeug.serving import make_server
+
+import app
+import asgi
+from core.ai_utils import FakeProvider, LLMRouter
+from utils.llm_scheduler import LLMScheduler
+
+
+def serve_flask():
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # no access log
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+def serve_asgi():
+    server = uvicorn.Server(uvicorn.Config(asgi.app, host="127.0.0.1", port=0, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return f"http://127.0.0.1:{port}", stop
+
+
+def run(label: str, base_url: str, total: int, concurrency: int):
+    local = threading.local()
+
+    def timed(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        response = session.get(f"{base_url}/study", params={"topic": f"Topic {i}", "mode": "math", "cache": "0"},
+                               timeout=120)
+        response.raise_for_status()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(timed, range(total)))
+    wall = time.perf_counter() - start
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<24} p50 {p50:8.1f} ms   p99 {p99:8.1f} ms   {total / wall:7.1f} requests/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=500)
+    args = parser.parse_args()
+
+    # Four model calls per math-mode pack; no rate limits or caching in the way
+    app.USE_MOCK_MODE = False
+    app.llm_router = LLMRouter([FakeProvider(latency=args.latency_ms / 1000)], hedge=False)
+    app.llm_scheduler = LLMScheduler(rpm=10 ** 7, tpm=10 ** 12)
+    app.fetch_wikipedia_content = lambda topic: f"{topic} is a topic. " * 20
+
+    print(f"{args.requests} uncached /study?mode=math requests, concurrency {args.concurrency}, "
+          f"{args.latency_ms:.0f} ms per model call\n")
+    for label, serve in (("Flask (Werkzeug)", serve_flask), ("ASGI (uvicorn)", serve_asgi)):
+        base_url, stop = serve()
+        try:
+            run(label, base_url, args.requests, args.concurrency)
+        finally:
+            stop()
+
+
+if __name__ == "__main__":
+    main()
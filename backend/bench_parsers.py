@@ -0,0 +1,39 @@
+"""
+Micro-benchmark: original regex parsers vs parsers.py
+Run with: python bench_parsers.py [--repeat 2000]
+
+Times parse_quiz / parse_summary on every entry of parser_corpus.json and
+reports microseconds per call for both implementations.
+"""
+import argparse
+import timeit
+
+from parsers import parse_quiz, parse_summary
+from test_parsers import legacy_parse_quiz, legacy_parse_summary, load_corpus
+
+
+def per_call_us(fn, text: str, repeat: int) -> float:
+    return min(timeit.repeat(lambda: fn(text), number=repeat, repeat=3)) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    pairs = {"quiz": (legacy_parse_quiz, parse_quiz), "summary": (legacy_parse_summary, parse_summary)}
+    totals = {"quiz": [0.0, 0.0], "summary": [0.0, 0.0]}
+    print(f"{'corpus entry':38} {'kind':8} {'original':>10} {'new':>10} {'speedup':>8}")
+    for entry in load_corpus():
+        old_fn, new_fn = pairs[entry["kind"]]
+        old = per_call_us(old_fn, entry["text"], args.repeat)
+        new = per_call_us(new_fn, entry["text"], args.repeat)
+        totals[entry["kind"]][0] += old
+        totals[entry["kind"]][1] += new
+        print(f"{entry['name']:38} {entry['kind']:8} {old:8.1f}us {new:8.1f}us {old / new:7.2f}x")
+    for kind, (old, new) in totals.items():
+        print(f"{'total':38} {kind:8} {old:8.1f}us {new:8.1f}us {old / new:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Wikipedia fetch latency benchmark
+Compares the old fetch pattern (two serial requests.get calls, new
+connection each time) with the pooled WikipediaClient fetching summary and
+mobile-sections concurrently, against a local fake Wikipedia server.
+
+Run with: python bench_wiki_client.py [--requests 200] [--concurrency 8] [--latency-ms 20]
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from wiki_client import WikiContentStore, WikipediaClient
+
+
+class FakeWikipedia(BaseHTTPRequestHandler):
+    """Keep-alive server answering every summary/mobile-sections request after `latency`."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.02
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        endpoint, title = self.path.split("/")[-2:]
+        if endpoint == "summary":
+            data = {"titles": {"canonical": title}, "extract": f"{title} is a topic. " * 20}
+        else:
+            data = {"lead": {"text": f"<p>{title} lead.</p>" * 20}, "remaining": [{"text": "<p>More.</p>"}]}
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def fetch_serial(base_url: str, title: str):
+    """The original pattern: summary, then mobile-sections, no Session."""
+    headers = {'User-Agent': 'SmartStudyAssistant/1.0'}
+    requests.get(f"{base_url}/page/summary/{title}", timeout=10, headers=headers).json()
+    requests.get(f"{base_url}/page/mobile-sections/{title}", timeout=10, headers=headers).json()
+
+
+def run(label: str, fetch, total: int, concurrency: int):
+    def timed(i):
+        start = time.perf_counter()
+        fetch(f"Topic_{i}")
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(timed, range(total)))
+    wall = time.perf_counter() - start
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<28} p50 {p50:7.1f} ms   p99 {p99:7.1f} ms   {total / wall:7.1f} fetches/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    FakeWikipedia.latency = args.latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeWikipedia)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/api/rest_v1"
+
+    print(f"{args.requests} topic fetches, concurrency {args.concurrency}, "
+          f"server latency {args.latency_ms:.0f} ms per request\n")
+    try:
+        run("serial requests.get", lambda title: fetch_serial(base_url, title),
+            args.requests, args.concurrency)
+
+        # Distinct titles per run keep the content store from answering
+        client = WikipediaClient(base_url, WikiContentStore(":memory:"))
+        run("pooled + concurrent", lambda title: client.get_many([("summary", title), ("mobile-sections", title)]),
+            args.requests, args.concurrency)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Smart Study Assistant - Section fan-out
+Runs the independent study-pack sections (summary, quiz, tip, math question)
+concurrently on a bounded worker pool so a request costs roughly the slowest
+Gemini call instead of the sum of all of them.
+"""
+import contextvars
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MAX_WORKERS = int(os.getenv("STUDY_MAX_WORKERS", 8))
+SECTION_TIMEOUT = float(os.getenv("STUDY_SECTION_TIMEOUT", 30))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="study-section")
+
+
+class SectionTimeout(Exception):
+    """Raised (as a section error) when a section misses its deadline."""
+
+
+class SectionResult:
+    """Outcome of one section: either `value` or `error` is set."""
+
+    __slots__ = ("name", "value", "error", "elapsed")
+
+    def __init__(self, name, value=None, error=None, elapsed=0.0):
+        self.name = name
+        self.value = value
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def run_sections(tasks: dict, timeout: float = None) -> dict:
+    """
+    Run each callable in `tasks` ({name: fn}) on the shared pool.
+
+    Every section gets the same deadline, measured from submission. Sections
+    that raise or miss the deadline come back with `error` set instead of
+    failing the whole batch, so callers can return partial results.
+    Returns {name: SectionResult} in the order of `tasks`.
+    """
+    timeout = SECTION_TIMEOUT if timeout is None else timeout
+    start = time.perf_counter()
+    # Workers run in a copy of the caller's context (per-request token usage)
+    futures = {name: _executor.submit(contextvars.copy_context().run, _timed, fn) for name, fn in tasks.items()}
+    wait(futures.values(), timeout=timeout)
+
+    results = {}
+    for name, future in futures.items():
+        if not future.done():
+            # The worker thread cannot be interrupted; it finishes in the
+            # background and its result is discarded.
+            future.cancel()
+            results[name] = SectionResult(
+                name,
+                error=SectionTimeout(f"Section '{name}' timed out after {timeout:.0f}s"),
+                elapsed=time.perf_counter() - start,
+            )
+            continue
+        try:
+            value, elapsed = future.result()
+            results[name] = SectionResult(name, value=value, elapsed=elapsed)
+        except Exception as e:
+            results[name] = SectionResult(name, error=e, elapsed=time.perf_counter() - start)
+    return results
+
+
+def stream_sections(tasks: dict, timeout: float = None):
+    """
+    Streaming counterpart of run_sections for {name: fn(on_delta)} tasks.
+
+    Yields ("delta", name, text) for every chunk a section reports through
+    its `on_delta` callback and ("result", SectionResult) as each section
+    finishes, in completion order. Sections still running at the deadline
+    are yielded as SectionTimeout results.
+    """
+    timeout = SECTION_TIMEOUT if timeout is None else timeout
+    events = queue.Queue()
+    start = time.perf_counter()
+
+    def run(name, fn):
+        try:
+            value = fn(lambda text: events.put(("delta", name, text)))
+            events.put(("result", SectionResult(name, value=value, elapsed=time.perf_counter() - start)))
+        except Exception as e:
+            events.put(("result", SectionResult(name, error=e, elapsed=time.perf_counter() - start)))
+
+    for name, fn in tasks.items():
+        _executor.submit(contextvars.copy_context().run, run, name, fn)
+
+    pending = set(tasks)
+    while pending:
+        try:
+            event = events.get(timeout=max(0.0, start + timeout - time.perf_counter()))
+        except queue.Empty:
+            for name in tasks:
+                if name in pending:
+                    yield ("result", SectionResult(
+                        name,
+                        error=SectionTimeout(f"Section '{name}' timed out after {timeout:.0f}s"),
+                        elapsed=time.perf_counter() - start,
+                    ))
+            return
+        if event[0] == "result":
+            pending.discard(event[1].name)
+        yield event
@@ -0,0 +1,187 @@
+"""
+Smart Study Assistant - Model output parsers
+Parsers for the summary and quiz sections. Patterns are compiled once; quiz
+output is split into lines once and walked by a small state machine, and the
+fallback layouts (bare numbered blocks, sentence questions) reuse those lines
+instead of re-splitting the text.
+
+Results match the original regex parsers (see test_parsers.py) except that
+the correct-answer letter is read after "Correct Answer:" rather than being
+the first A-D letter on the line, and a "Question" marker whose number is on
+the following line is no longer recognised.
+"""
+import re
+
+_BULLET = re.compile(r'[-•*]\s*(.+?)(?=\n[-•*]|\n\n|$)', re.MULTILINE)
+# "Question 2:" anywhere in a line, or "2." / "2)" at the start of one
+_QUESTION_MARKER = re.compile(r'question\s*\d+[:.]?\s*', re.IGNORECASE)
+_NUMBERED = re.compile(r'\d+[.)]\s*')
+# The letter after "Correct Answer:" / "Answer is" - not the C of "Correct"
+_ANSWER = re.compile(r'(?i:correct|answer)\b.*?(?:\b([A-D])\b|\b([a-d])(?:[.)]|\s*$))')
+_SENTENCE_BREAK = re.compile(r'[.!?]+')
+
+QUIZ_QUESTIONS = 3
+
+
+def parse_summary(text: str) -> list:
+    """Parse AI summary into 3 bullet points."""
+    bullets = _BULLET.findall(text)
+    if bullets:
+        return bullets[:3]
+
+    # Fallback: non-empty lines that are not headings
+    lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            lines.append(line)
+            if len(lines) == 3:
+                break
+    return lines or [text[:200]]
+
+
+def _add_line(block: list, fragment: str):
+    fragment = fragment.strip()
+    if len(fragment) > 1:
+        block.append(fragment)
+
+
+def _question_blocks(lines: list) -> list:
+    """
+    Lines of the first QUIZ_QUESTIONS blocks, each starting after a
+    "Question N" marker or a line-leading "N." / "N)". Text before the first
+    marker is dropped; one-character lines are ignored. Stops reading once
+    the last block is closed.
+    """
+    blocks = []
+    current = None  # None until the first marker
+    for raw in lines:
+        pos = 0
+        # Cheap character checks first; most lines need no regex at all
+        numbered = _NUMBERED.match(raw) if raw[:1].isdecimal() else None
+        if numbered:
+            if current is not None:
+                blocks.append(current)
+                if len(blocks) == QUIZ_QUESTIONS:
+                    return blocks
+            current = []
+            pos = numbered.end()
+        if 'q' in raw or 'Q' in raw:
+            for marker in _QUESTION_MARKER.finditer(raw, pos):
+                if current is not None:
+                    _add_line(current, raw[pos:marker.start()])
+                    blocks.append(current)
+                    if len(blocks) == QUIZ_QUESTIONS:
+                        return blocks
+                current = []
+                pos = marker.end()
+        if current is not None:
+            _add_line(current, raw[pos:])
+    if current is not None:
+        blocks.append(current)
+    return blocks
+
+
+def _parse_block(block: list):
+    """One MCQ from a block's lines, or None without a question and two options."""
+    if len(block) < 2:
+        return None
+    question = block[0]
+    numbered = _NUMBERED.match(question) if question[:1].isdecimal() else None
+    if numbered:
+        question = question[numbered.end():]
+    options, correct = [], None
+    for line in block[1:]:
+        # "A. text" / "b) text"; lines are stripped, so text follows any label longer than 2
+        if len(line) > 2 and line[1] in '.)' and line[0] in 'ABCDabcd':
+            options.append(line[2:].strip())
+            continue
+        lowered = line.lower()
+        if 'correct' in lowered or 'answer' in lowered:
+            answer = _ANSWER.search(line)
+            if answer:
+                correct = (answer.group(1) or answer.group(2)).upper()
+    if len(options) < 2:
+        return None
+    while len(options) < 4:
+        options.append(f"Option {chr(65 + len(options))}")
+    return {"question": question, "options": options[:4], "correct": correct or "A"}
+
+
+def _starts_loose_block(lines: list, i: int) -> bool:
+    """True if line i begins a block in the loose layout: "N." / "N)" or "* Capitalised"."""
+    raw = lines[i]
+    if raw[:1].isdecimal() and _NUMBERED.match(raw):
+        return True
+    if not raw.startswith('*'):
+        return False
+    rest = raw[1:].lstrip()
+    if not rest:
+        # A lone "*" binds to the next non-blank line
+        rest = next((line.lstrip() for line in lines[i + 1:] if line.strip()), "")
+    return rest[:1].isascii() and rest[:1].isupper()
+
+
+def _loose_questions(lines: list, needed: int) -> list:
+    """
+    Fallback for blocks without recognised markers: up to three blocks split
+    before "N." / "* X" lines, each a question line followed by lines
+    starting with A-D.
+    """
+    starts = [0]
+    for i in range(1, len(lines)):
+        if len(starts) > QUIZ_QUESTIONS:
+            break
+        if _starts_loose_block(lines, i):
+            starts.append(i)
+    starts.append(len(lines))
+
+    questions = []
+    for start, stop in zip(starts[:QUIZ_QUESTIONS], starts[1:]):
+        if len(questions) >= needed:
+            break
+        block = [line.strip() for line in lines[start:stop] if line.strip()]
+        if len(block) < 3:
+            continue
+        options = []
+        for line in block[1:5]:
+            if line[0] in 'ABCDabcd':
+                # Only upper-case labels are removed here, as before
+                options.append(line[2:].strip() if line[0] in 'ABCD' and line[1:2] in ('.', ')') else line)
+        if len(options) >= 2:
+            questions.append({"question": block[0], "options": options[:4], "correct": "A"})
+    return questions
+
+
+def parse_quiz(text: str) -> list:
+    """Parse AI quiz into structured MCQ format."""
+    lines = text.split('\n')
+    questions = []
+    for block in _question_blocks(lines):
+        question = _parse_block(block)
+        if question:
+            questions.append(question)
+
+    if len(questions) < QUIZ_QUESTIONS:
+        questions.extend(_loose_questions(lines, QUIZ_QUESTIONS - len(questions)))
+
+    # Final fallback: every four sentences make a question and its options
+    if len(questions) < QUIZ_QUESTIONS:
+        sentences = _SENTENCE_BREAK.split(text)
+        for i in range(min(QUIZ_QUESTIONS - len(questions), len(sentences) // 4)):
+            start = (len(questions) * 4) + i * 4
+            if start < len(sentences):
+                question_text = sentences[start].strip()
+                if question_text:
+                    questions.append({
+                        "question": question_text + "?",
+                        "options": [
+                            sentences[start + 1].strip() if start + 1 < len(sentences) else "Option A",
+                            sentences[start + 2].strip() if start + 2 < len(sentences) else "Option B",
+                            sentences[start + 3].strip() if start + 3 < len(sentences) else "Option C",
+                            "None of the above"
+                        ],
+                        "correct": "A"
+                    })
+
+    return questions[:QUIZ_QUESTIONS]
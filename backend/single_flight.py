@@ -0,0 +1,152 @@
+"""
+Smart Study Assistant - Request coalescing
+Single-flight execution: concurrent calls with the same key wait for one
+in-flight computation and share its result (or its exception) instead of
+each running the full Wikipedia + Gemini pipeline.
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads running timed computations; more leaders than this queue for a thread
+SINGLE_FLIGHT_WORKERS = 32
+
+
+class CoalescedTimeout(Exception):
+    """Raised to a waiting caller when the shared computation overruns its timeout."""
+
+
+class _Call:
+    __slots__ = ("done", "value", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    do(key, fn) runs fn() once per key at a time. The first caller (leader)
+    starts it; callers arriving while it runs block until it finishes, then
+    receive the same value or re-raise the same error.
+
+    With a timeout, fn() runs on a pool of `max_workers` threads (in a copy
+    of the leader's context) and the leader waits for it like everyone
+    else, so a hung computation times out every caller, leader included.
+    It keeps running and later callers still join it until it finishes.
+    """
+
+    def __init__(self, max_workers: int = SINGLE_FLIGHT_WORKERS):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="single-flight")
+        self._stats = {"leaders": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    def do(self, key, fn, timeout: float = None):
+        """Return (value, shared) where `shared` is True for coalesced callers."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+                self._stats["leaders"] += 1
+            else:
+                call.waiters += 1
+                leader = False
+                self._stats["coalesced"] += 1
+
+        if leader:
+            if timeout is None:
+                self._run(key, call, fn)
+            else:
+                self._executor.submit(contextvars.copy_context().run, self._run, key, call, fn)
+
+        try:
+            finished = call.done.wait(timeout)
+        finally:
+            if not leader:
+                with self._lock:
+                    call.waiters -= 1
+        if not finished:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            if leader:
+                raise CoalescedTimeout(f"Timed out after {timeout:.0f}s generating the response")
+            raise CoalescedTimeout(f"Timed out after {timeout:.0f}s waiting for an identical request")
+        if call.error is not None:
+            raise call.error
+        return call.value, not leader
+
+    def _run(self, key, call, fn):
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+            stats["waiting"] = sum(call.waiters for call in self._calls.values())
+        return stats
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop (the ASGI app): do(key, fn)
+    awaits fn() once per key at a time. The computation runs as its own
+    task, so a caller that times out or disconnects, leader included, does
+    not cancel it for the callers still waiting on it. The task starts in a
+    fresh context: it outlives its leader, so it must not carry the leader's
+    context variables (its token budget scope, its priority).
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._waiters = {}  # task -> callers waiting on it
+        self._stats = {"leaders": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    def _finished(self, key, task):
+        del self._tasks[key]
+        self._waiters.pop(task, None)
+        if task.cancelled() or task.exception() is not None:
+            self._stats["errors"] += 1
+
+    async def do(self, key, fn, timeout: float = None):
+        """Return (value, shared) where `shared` is True for coalesced callers."""
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = contextvars.Context().run(asyncio.ensure_future, fn())
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self._stats["leaders"] += 1
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), timeout), False
+            except asyncio.TimeoutError:
+                self._stats["timeouts"] += 1
+                raise CoalescedTimeout(f"Timed out after {timeout:.0f}s generating the response")
+
+        self._stats["coalesced"] += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout), True
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise CoalescedTimeout(f"Timed out after {timeout:.0f}s waiting for an identical request")
+        finally:
+            if task in self._waiters:
+                self._waiters[task] -= 1
+
+    def snapshot(self) -> dict:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._tasks)
+        stats["waiting"] = sum(self._waiters.values())
+        return stats
@@ -0,0 +1,251 @@
+"""
+Smart Study Assistant - Study pack cache
+Two-tier cache for generated study packs: an in-process LRU with TTL and an
+optional SQLite tier that survives restarts. Keys are built from the
+normalized topic, mode, model and prompt version, so "Photosynthesis",
+"  photosynthesis " and "What is photosynthesis?" share one entry.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_ENABLED = os.getenv("STUDY_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+CACHE_TTL = float(os.getenv("STUDY_CACHE_TTL", 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.getenv("STUDY_CACHE_MAX_ENTRIES", 512))
+CACHE_DB_PATH = os.getenv("STUDY_CACHE_DB", "")
+
+# Question words that do not change which study pack is generated; the same
+# words are stripped by generate_mock_response in app.py.
+_TOPIC_PREFIXES = re.compile(r'^(?:(?:what|who)\s+(?:is|are|was|were)|explain|prove|define|describe)\s+', re.IGNORECASE)
+
+
+def strip_question(topic: str) -> str:
+    """Collapse whitespace and drop question prefixes/punctuation, keeping case."""
+    text = re.sub(r'\s+', ' ', topic).strip()
+    text = _TOPIC_PREFIXES.sub('', text)
+    text = re.sub(r'^(?:the|a|an)\s+', '', text, flags=re.IGNORECASE)
+    return text.strip(' ?!.') or topic.strip()
+
+
+def normalize_topic(topic: str) -> str:
+    """Case-fold, collapse whitespace and drop question prefixes/punctuation."""
+    return strip_question(topic).lower()
+
+
+def make_key(topic: str, mode: str, model: str, prompt_version: str) -> str:
+    return "|".join((normalize_topic(topic), mode, model, prompt_version))
+
+
+class CacheStats:
+    """Hit/miss counters shared by every tier of a cache."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0}
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / lookups, 3) if lookups else 0.0
+        return counts
+
+
+class MemoryCache:
+    """Thread-safe LRU cache with per-entry TTL and a maximum entry count."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                del self._entries[key]
+                self.stats.incr("expired")
+                entry = None
+            if entry is None:
+                self.stats.incr("misses")
+                return None
+            self._entries.move_to_end(key)
+        self.stats.incr("hits")
+        return entry[1]
+
+    def set(self, key: str, value, ttl: float = None):
+        expires = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats.incr("evictions")
+        self.stats.incr("sets")
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    On-disk tier storing JSON values with an expiry timestamp.
+    Oldest entries (by last write) are evicted beyond `max_entries`.
+    """
+
+    def __init__(self, path: str, ttl: float = CACHE_TTL, max_entries: int = 20000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, stored REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_stored ON cache (stored)")
+        self._conn.commit()
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.stats.incr("expired")
+                row = None
+        if row is None:
+            self.stats.incr("misses")
+            return None
+        self.stats.incr("hits")
+        return json.loads(row[0])
+
+    def set(self, key: str, value, ttl: float = None):
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires, stored) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires, now),
+            )
+            removed = self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY stored DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self._conn.commit()
+        self.stats.incr("sets")
+        if removed > 0:
+            self.stats.incr("evictions", removed)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM cache WHERE key = ?", (key,)).rowcount
+            self._conn.commit()
+        return deleted > 0
+
+    def delete_prefix(self, prefix: str) -> int:
+        escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self._lock:
+            deleted = self._conn.execute(
+                "DELETE FROM cache WHERE key LIKE ? ESCAPE '\\'", (escaped + "%",)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class TieredCache:
+    """
+    Memory tier in front of an optional disk tier. Disk hits are promoted
+    into memory; writes go to both tiers.
+    """
+
+    def __init__(self, memory: MemoryCache, disk: SQLiteCache = None):
+        self.memory = memory
+        self.disk = disk
+        self.stats = CacheStats()
+
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        self.stats.incr("hits" if value is not None else "misses")
+        return value
+
+    def set(self, key: str, value, ttl: float = None):
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl)
+        self.stats.incr("sets")
+
+    def delete(self, key: str) -> bool:
+        deleted = self.memory.delete(key)
+        if self.disk is not None:
+            deleted = self.disk.delete(key) or deleted
+        return deleted
+
+    def delete_prefix(self, prefix: str) -> int:
+        deleted = self.memory.delete_prefix(prefix)
+        if self.disk is not None:
+            deleted = max(deleted, self.disk.delete_prefix(prefix))
+        return deleted
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def snapshot(self) -> dict:
+        stats = self.stats.snapshot()
+        stats["memory"] = dict(self.memory.stats.snapshot(), entries=len(self.memory))
+        if self.disk is not None:
+            stats["disk"] = dict(self.disk.stats.snapshot(), entries=len(self.disk))
+        return stats
+
+
+def create_cache() -> TieredCache:
+    """Build the cache described by the STUDY_CACHE_* environment variables."""
+    disk = SQLiteCache(CACHE_DB_PATH, ttl=CACHE_TTL) if CACHE_DB_PATH else None
+    return TieredCache(MemoryCache(CACHE_MAX_ENTRIES, CACHE_TTL), disk)
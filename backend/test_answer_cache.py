@@ -0,0 +1,106 @@
+"""
+Semantic answer cache test cases (Streamlit Explainer/Quizzer/Summarizer)
+Run with: python test_answer_cache.py  (no server or API key needed)
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AI_StudyBuddy'))
+
+from core.answer_cache import SemanticCache  # noqa: E402
+
+MODES = frozenset({"explainer", "quizzer"})
+
+
+def make_cache(**options):
+    options.setdefault("modes", MODES)
+    return SemanticCache(**options)
+
+
+def test_paraphrases_hit():
+    cache = make_cache()
+    cache.put("explainer", "v1", "explain heap sort", "", "Heap sort builds a heap...")
+    for question in ("What is heapsort?", "heap sort", "Explain heap sorts please"):
+        assert cache.get("explainer", "v1", question) == "Heap sort builds a heap...", question
+    assert cache.snapshot()["semantic_hits"] >= 1
+    print("✅ Paraphrase test passed")
+
+
+def test_different_concepts_miss():
+    cache = make_cache()
+    pairs = [
+        ("explain supervised learning", "explain unsupervised learning"),
+        ("advantages of linked lists", "disadvantages of linked lists"),
+        ("explain B tree", "explain B+ tree"),
+        ("give me 5 questions on cells", "give me 10 questions on cells"),
+    ]
+    for stored, asked in pairs:
+        cache.put("explainer", "v1", stored, "", f"answer to {stored}")
+        assert cache.get("explainer", "v1", asked) is None, asked
+        assert cache.get("explainer", "v1", stored) == f"answer to {stored}"
+    print("✅ Different concept test passed")
+
+
+def test_modes_namespaces_and_failures():
+    cache = make_cache()
+    # Callers name a namespace per mode and prompt version, as explain_concept does
+    cache.put("explainer", "explainer:v1", "explain cells", "", "Cells are units of life.")
+    assert cache.get("explainer", "explainer:v1", "explain cells") == "Cells are units of life."
+    assert cache.get("quizzer", "quizzer:v1", "explain cells") is None
+    assert cache.get("explainer", "explainer:v2", "explain cells") is None
+    # Modes outside `modes` are never stored or served
+    cache.put("summarizer", "summarizer:v1", "explain cells", "", "summary")
+    assert cache.get("summarizer", "summarizer:v1", "explain cells") is None
+    assert "summarizer:v1" not in cache.snapshot()["entries"]
+    # Error messages are not cached, as a value or at the end of a stream
+    cache.put("quizzer", "v1", "quiz on atoms", "", "❌ Error generating quiz")
+    assert cache.get("quizzer", "v1", "quiz on atoms") is None
+    assert "".join(cache.remember(iter(["Atoms ", "⚠️ cut off"]), "quizzer", "v1", "quiz on atoms")) == \
+        "Atoms ⚠️ cut off"
+    assert cache.get("quizzer", "v1", "quiz on atoms") is None
+    assert list(cache.remember(iter(["Atoms ", "are small."]), "quizzer", "v1", "quiz on atoms"))
+    assert cache.get("quizzer", "v1", "quiz on atoms") == "Atoms are small."
+    print("✅ Mode isolation test passed")
+
+
+def test_context_gate():
+    cache = make_cache()
+    cache.put("explainer", "v1", "explain it simply", "User: explain photosynthesis", "Plants make sugar.")
+    assert cache.get("explainer", "v1", "explain it simply", "User: explain photosynthesis") == "Plants make sugar."
+    assert cache.get("explainer", "v1", "explain it simply", "User: explain recursion") is None
+    assert cache.get("explainer", "v1", "explain it simply") is None  # no context vs context
+    print("✅ Context gate test passed")
+
+
+def test_ttl_and_lru_eviction():
+    now = [0.0]
+    cache = make_cache(max_entries=2, ttl=100, clock=lambda: now[0])
+    cache.put("explainer", "v1", "explain cells", "", "cells")
+    now[0] = 1
+    cache.put("explainer", "v1", "explain atoms", "", "atoms")
+    now[0] = 2
+    assert cache.get("explainer", "v1", "explain cells") == "cells"  # atoms is now least recently used
+    now[0] = 3
+    cache.put("explainer", "v1", "explain stars", "", "stars")
+    assert cache.get("explainer", "v1", "explain atoms") is None
+    assert cache.get("explainer", "v1", "explain cells") == "cells"
+    assert cache.snapshot()["evictions"] == 1
+    now[0] = 200
+    assert cache.get("explainer", "v1", "explain cells") is None
+    snapshot = cache.snapshot()
+    assert snapshot["expired"] == 2 and snapshot["entries"] == {"v1": 0}
+    print("✅ TTL/LRU test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Semantic Answer Cache Test Suite")
+    print("=" * 50)
+    test_paraphrases_hit()
+    test_different_concepts_miss()
+    test_modes_namespaces_and_failures()
+    test_context_gate()
+    test_ttl_and_lru_eviction()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
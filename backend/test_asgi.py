@@ -0,0 +1,181 @@
+"""
+ASGI server profile test cases (async /study, timeouts, coalescing)
+Run with: python test_asgi.py  (fake LLM provider, no server or API key needed)
+"""
+import asyncio
+import contextvars
+import time
+
+from starlette.testclient import TestClient
+
+import app
+import asgi
+from core.ai_utils import FakeProvider, LLMRouter
+from single_flight import AsyncSingleFlight, CoalescedTimeout
+from utils.llm_scheduler import LLMScheduler
+from utils.token_budget import ledger as token_ledger
+
+
+class FakeBackend:
+    """Routes app.py's LLM calls to a FakeProvider with `latency` and stubs the Wikipedia fetch."""
+
+    def __init__(self, latency: float):
+        self.provider = FakeProvider(latency=latency)
+
+    def __enter__(self):
+        self.saved = app.USE_MOCK_MODE, app.llm_router, app.llm_scheduler, app.fetch_wikipedia_content
+        app.USE_MOCK_MODE = False
+        app.llm_router = LLMRouter([self.provider], hedge=False)
+        app.llm_scheduler = LLMScheduler(rpm=100000, tpm=10 ** 9)
+        app.fetch_wikipedia_content = lambda topic: f"{topic} is a topic."
+        return self.provider
+
+    def __exit__(self, *exc):
+        app.USE_MOCK_MODE, app.llm_router, app.llm_scheduler, app.fetch_wikipedia_content = self.saved
+
+
+def test_concurrent_requests_share_the_loop():
+    """20 requests of four 0.2s model calls each finish in about 0.2s, without a thread per call."""
+    with FakeBackend(latency=0.2) as provider:
+        async def run():
+            return await asyncio.gather(*(
+                asgi.build_study_pack(f"Topic {i}", "math", cache_policy="bypass") for i in range(20)))
+
+        start = time.perf_counter()
+        results = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+    assert provider.calls == 80
+    assert elapsed < 1.0, f"requests were serialized ({elapsed:.2f}s)"
+    assert all(status == "bypass" and set(pack) >= {"summary", "quiz", "math_question"} for pack, status in results)
+    print(f"✅ Concurrency test passed ({elapsed:.2f}s)")
+
+
+def test_study_endpoint_and_cache():
+    with FakeBackend(latency=0.0):
+        client = TestClient(asgi.app)
+        app.study_cache.clear()
+        first = client.get("/study?topic=Osmosis", headers={"Origin": "http://localhost:3000"})
+        second = client.get("/study?topic=Osmosis")
+        assert first.status_code == second.status_code == 200
+        assert first.headers["X-Cache"] == "MISS" and second.headers["X-Cache"] == "HIT"
+        assert first.headers["X-LLM-Tokens"].endswith("calls=3")
+        assert first.headers["Access-Control-Allow-Origin"] == "*"
+        assert first.json()["summary"] == second.json()["summary"]
+        assert client.get("/study").status_code == 400
+        assert client.get("/health").json()["status"] == "healthy"
+        # Routes without an async variant are served by the mounted Flask app
+        assert "enabled" in client.get("/study/cache").json()
+        assert client.get("/study/metrics").json()["async_single_flight"]["leaders"] >= 1
+    print("✅ Endpoint test passed")
+
+
+def test_request_timeout():
+    original = asgi.STUDY_REQUEST_TIMEOUT
+    asgi.STUDY_REQUEST_TIMEOUT = 0.2
+    try:
+        with FakeBackend(latency=2.0):
+            start = time.perf_counter()
+            response = TestClient(asgi.app).get("/study?topic=Slow&cache=0")
+            elapsed = time.perf_counter() - start
+    finally:
+        asgi.STUDY_REQUEST_TIMEOUT = original
+    assert response.status_code == 504 and "timed out" in response.json()["error"]
+    assert elapsed < 1.5
+    print("✅ Request timeout test passed")
+
+
+def test_async_single_flight():
+    flight, runs = AsyncSingleFlight(), []
+
+    async def compute():
+        runs.append(1)
+        await asyncio.sleep(0.1)
+        return "pack"
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("k", compute) for _ in range(5)))
+        # A follower's timeout does not cancel the shared run
+        leader = asyncio.ensure_future(flight.do("slow", compute))
+        await asyncio.sleep(0)
+        try:
+            await flight.do("slow", compute, timeout=0.01)
+            assert False, "follower did not time out"
+        except CoalescedTimeout:
+            pass
+        return results, await leader
+
+    results, leader = asyncio.run(run())
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+    assert leader == ("pack", False) and len(runs) == 2
+    assert flight.snapshot() == {"leaders": 2, "coalesced": 5, "timeouts": 1, "errors": 0,
+                                 "in_flight": 0, "waiting": 0}
+
+    async def hung_leader():
+        try:
+            await flight.do("hung", compute, timeout=0.01)
+            assert False, "leader did not time out"
+        except CoalescedTimeout:
+            pass
+        # The run was not cancelled with its leader
+        return await flight.do("hung", compute)
+
+    assert asyncio.run(hung_leader()) == ("pack", True) and len(runs) == 3
+    print("✅ Async single-flight test passed")
+
+
+def test_run_blocking_copies_the_request_context():
+    request_var = contextvars.ContextVar("request_var", default=None)
+
+    def work():
+        seen = request_var.get()
+        request_var.set("changed in the thread")
+        return seen
+
+    async def run():
+        request_var.set("request")
+        seen = await asgi.run_blocking(work)
+        return seen, request_var.get()
+
+    # The thread sees the request's values; its own changes stay in its copy
+    assert asyncio.run(run()) == ("request", "request")
+    print("✅ run_blocking context test passed")
+
+
+def test_shared_run_has_its_own_token_scope():
+    original = app.COALESCE_TIMEOUT
+    app.COALESCE_TIMEOUT = 0.1
+    try:
+        with FakeBackend(latency=0.3) as provider:
+            async def run():
+                with token_ledger.request() as usage:
+                    try:
+                        await asgi.build_study_pack("Late", "normal", cache_policy="bypass")
+                        assert False, "leader did not time out"
+                    except CoalescedTimeout:
+                        pass
+                    # The run finishes after the leader gave up
+                    while provider.calls < 3 or asgi.study_flights.snapshot()["in_flight"]:
+                        await asyncio.sleep(0.05)
+                return usage
+
+            usage = asyncio.run(run())
+    finally:
+        app.COALESCE_TIMEOUT = original
+    # ...without charging the request that had already answered 504
+    assert (usage.calls, usage.tokens_in, usage.tokens_out) == (0, 0, 0)
+    print("✅ Shared run token scope test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("ASGI Server Profile Test Suite")
+    print("=" * 50)
+    test_concurrent_requests_share_the_loop()
+    test_study_endpoint_and_cache()
+    test_request_timeout()
+    test_async_single_flight()
+    test_run_blocking_copies_the_request_context()
+    test_shared_run_has_its_own_token_scope()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
@@ -0,0 +1,130 @@
+"""
+Batch study-pack API test cases
+Run with: python test_batch.py  (no server or API key needed)
+"""
+import json
+import threading
+import time
+
+import app
+
+
+def _batch(body):
+    original_bulk = app.fetch_wikipedia_contents
+    app.fetch_wikipedia_contents = lambda topics: {t: f"Information about {t}" for t in topics}
+    try:
+        response = app.app.test_client().post("/study/batch", json=body)
+    finally:
+        app.fetch_wikipedia_contents = original_bulk
+    return response, [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_batch_dedupes_and_streams_results():
+    print("Testing /study/batch...")
+    app.study_cache.clear()
+    response, lines = _batch({"topics": ["Osmosis", " osmosis", {"topic": "Vectors", "mode": "math"}]})
+
+    assert response.mimetype == "application/x-ndjson"
+    results, done = lines[:-1], lines[-1]
+    assert len(results) == 2
+    by_topic = {r["topic"]: r for r in results}
+    assert by_topic["Osmosis"]["requested"] == ["Osmosis", "osmosis"]
+    assert "math_question" in by_topic["Vectors"]["result"]
+    assert done["stats"]["unique"] == 2 and done["stats"]["ok"] == 2
+    print("✅ Batch test passed")
+
+
+def test_batch_reports_per_topic_errors():
+    print("\nTesting per-topic errors...")
+    app.study_cache.clear()
+    original = dict(app.SECTION_GENERATORS)
+
+    def failing_for(name):
+        def generate(topic, wiki_content):
+            if topic == "Broken":
+                raise ValueError("AI generation failed: boom")
+            return original[name](topic, wiki_content)
+        return generate
+
+    app.SECTION_GENERATORS.update(summary=failing_for("summary"), quiz=failing_for("quiz"))
+    try:
+        _, lines = _batch({"topics": ["Broken", "Fine"]})
+    finally:
+        app.SECTION_GENERATORS.update(original)
+
+    status = {line["topic"]: line["status"] for line in lines[:-1]}
+    assert status == {"Broken": "error", "Fine": "ok"}
+    assert lines[-1]["stats"]["errors"] == 1
+    print("✅ Per-topic error test passed")
+
+
+def test_batch_section_timeout():
+    print("\nTesting hung batch sections...")
+    app.study_cache.clear()
+    original, original_timeout = dict(app.SECTION_GENERATORS), app.SECTION_TIMEOUT
+    release = threading.Event()
+
+    def hangs_for_slow(topic, wiki_content):
+        if topic == "Slow":
+            release.wait(10)
+        return original["study_tip"](topic, wiki_content)
+
+    app.SECTION_GENERATORS["study_tip"] = hangs_for_slow
+    app.SECTION_TIMEOUT = 0.3
+    try:
+        start = time.perf_counter()
+        _, lines = _batch({"topics": ["Slow", "Fine"]})
+        elapsed = time.perf_counter() - start
+    finally:
+        release.set()
+        app.SECTION_GENERATORS.update(original)
+        app.SECTION_TIMEOUT = original_timeout
+
+    assert elapsed < 3, f"batch waited for the hung section ({elapsed:.1f}s)"
+    by_topic = {line["topic"]: line for line in lines[:-1]}
+    assert by_topic["Slow"]["status"] == by_topic["Fine"]["status"] == "ok"
+    # The hung section fell back to its default and the partial pack was not cached
+    assert by_topic["Slow"]["result"]["study_tip"] == app.SECTION_DEFAULTS["study_tip"]("Slow")
+    assert app.study_cache.get(app.study_cache_key("Slow", "", source="intro")) is None
+    print("✅ Batch section timeout test passed")
+
+
+def test_batch_packs_cached_apart_from_study():
+    print("\nTesting batch cache keys...")
+    app.study_cache.clear()
+    _, lines = _batch({"topics": ["Diffusion"]})
+    assert lines[-1]["stats"]["cached"] == 0
+    # Packs generated from intro extracts do not answer /study, nor the other way round
+    assert app.study_cache.get(app.study_cache_key("Diffusion", "", source="intro")) is not None
+    assert app.study_cache.get(app.study_cache_key("Diffusion", "")) is None
+    original_fetch = app.fetch_wikipedia_content
+    app.fetch_wikipedia_content = lambda topic: f"Full page about {topic}"
+    try:
+        client = app.app.test_client()
+        assert client.get("/study?topic=Diffusion").headers["X-Cache"] == "MISS"
+    finally:
+        app.fetch_wikipedia_content = original_fetch
+    _, lines = _batch({"topics": ["Diffusion"]})
+    assert lines[-1]["stats"]["cached"] == 1
+    print("✅ Batch cache key test passed")
+
+
+def test_batch_rejects_bad_body():
+    print("\nTesting invalid batch body...")
+    response = app.app.test_client().post("/study/batch", json={"topics": "Calculus"})
+    assert response.status_code == 400
+    print("✅ Invalid body test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Batch API Test Suite")
+    print("=" * 50)
+    test_batch_dedupes_and_streams_results()
+    test_batch_reports_per_topic_errors()
+    test_batch_section_timeout()
+    test_batch_packs_cached_apart_from_study()
+    test_batch_rejects_bad_body()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
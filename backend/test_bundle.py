@@ -0,0 +1,97 @@
+"""
+Bundle (single combined prompt) mode test cases
+Run with: python test_bundle.py  (no server or API key needed)
+"""
+import time
+
+import app
+
+
+def _study(query, bundle_text=None):
+    original_bundle, original_fetch = app.generate_bundle_text, app.fetch_wikipedia_content
+    app.fetch_wikipedia_content = lambda topic: f"Information about {topic}"
+    if bundle_text is not None:
+        app.generate_bundle_text = lambda topic, wiki_content, sections: bundle_text
+    try:
+        return app.app.test_client().get(f"/study?{query}&cache=0")
+    finally:
+        app.generate_bundle_text, app.fetch_wikipedia_content = original_bundle, original_fetch
+
+
+def test_bundle_single_call():
+    """A valid bundle answers every section with one model call."""
+    print("Testing bundle mode (valid JSON)...")
+    response = _study("topic=Calculus&mode=math&bundle=1")
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["generation"]["path"] == "bundle"
+    assert data["generation"]["llm_calls"] == 1
+    assert len(data["summary"]) == 3 and len(data["quiz"]) == 3
+    assert set(data["math_question"]) == {"question", "answer", "explanation"}
+    print("✅ Bundle single-call test passed")
+
+
+def test_bundle_per_section_fallback():
+    """Free-text sections are parsed; invalid ones are regenerated on their own."""
+    print("\nTesting bundle mode (partial JSON)...")
+    bundle_text = '```json\n{"summary": "- one\\n- two\\n- three", "quiz": [{"question": "Q?"}], "study_tip": "Draw it."}\n```'
+    response = _study("topic=Calculus&bundle=1", bundle_text)
+
+    data = response.get_json()
+    assert data["summary"] == ["one", "two", "three"]
+    assert data["study_tip"] == "Draw it."
+    assert len(data["quiz"]) == 3
+    assert data["generation"]["path"] == "bundle+sections"
+    assert data["generation"]["fallback_sections"] == ["quiz"]
+    print("✅ Bundle fallback test passed")
+
+
+def test_bundle_unparseable():
+    """Garbage from the model falls back to the regular per-section path."""
+    print("\nTesting bundle mode (no JSON)...")
+    data = _study("topic=Calculus&bundle=1", "Sorry, I can't do that.").get_json()
+
+    assert data["generation"]["path"] == "sections"
+    assert len(data["quiz"]) == 3
+    print("✅ Bundle unparseable test passed")
+
+
+def test_cache_hit_reports_its_own_timings():
+    """A cached bundle pack does not repeat the original call count and latency."""
+    print("\nTesting bundle mode (cache hit)...")
+    original_bundle, original_fetch = app.generate_bundle_text, app.fetch_wikipedia_content
+    app.fetch_wikipedia_content = lambda topic: f"Information about {topic}"
+
+    def slow_bundle(topic, wiki_content, sections):
+        time.sleep(0.2)
+        return original_bundle(topic, wiki_content, sections)
+
+    app.generate_bundle_text = slow_bundle
+    app.study_cache.clear()
+    try:
+        client = app.app.test_client()
+        miss = client.get("/study?topic=Enzymes&bundle=1")
+        hit = client.get("/study?topic=Enzymes&bundle=1")
+    finally:
+        app.generate_bundle_text, app.fetch_wikipedia_content = original_bundle, original_fetch
+    assert (miss.headers["X-Cache"], hit.headers["X-Cache"]) == ("MISS", "HIT")
+    generated, served = miss.get_json()["generation"], hit.get_json()["generation"]
+    assert generated["llm_calls"] == 1 and generated["elapsed_ms"] >= 200
+    assert served["llm_calls"] == 0 and served["elapsed_ms"] < 200 and served["path"] == generated["path"]
+    # The stored pack keeps its original report
+    assert client.get("/study?topic=Enzymes&bundle=1").get_json()["generation"]["path"] == "bundle"
+    print("✅ Bundle cache hit test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Bundle Mode Test Suite")
+    print("=" * 50)
+    test_bundle_single_call()
+    test_bundle_per_section_fallback()
+    test_bundle_unparseable()
+    test_cache_hit_reports_its_own_timings()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
@@ -0,0 +1,92 @@
+"""
+Chat history store test cases (Streamlit chat context and paging)
+Run with: python test_chat_history.py  (no server or API key needed)
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AI_StudyBuddy'))
+
+from utils.chat_history import SUMMARY_PREFIX, ChatHistory  # noqa: E402
+from utils.token_budget import count_tokens  # noqa: E402
+
+
+def chat(turns: int, **options) -> ChatHistory:
+    history = ChatHistory(**options)
+    for i in range(turns):
+        history.append("user", f"Question {i} about topic {i}")
+        history.append("assistant", f"Answer {i}. " * 30)
+    return history
+
+
+def test_short_chat_is_sent_verbatim():
+    history = chat(2, max_tokens=1000)
+    assert history.summary == "" and history.folded == 0
+    assert history.context().splitlines() == [message.line for message in history]
+    assert history.context().startswith("User: Question 0 about topic 0\nAssistant: Answer 0.")
+    assert ChatHistory().context() == "" and not ChatHistory()
+    print("✅ Verbatim context test passed")
+
+
+def test_window_folds_into_summary():
+    history = chat(20, max_tokens=300, summary_tokens=80, turn_tokens=60)
+    context = history.context()
+    lines = context.splitlines()
+    assert count_tokens(context) <= 300
+    # The newest turns are verbatim, each cut to turn_tokens; older user turns are summarized
+    assert lines[-1].startswith("Assistant: Answer 19.") and lines[-1].endswith("…")
+    assert "User: Question 19 about topic 19" in lines
+    assert lines[0].startswith(SUMMARY_PREFIX) and "Question 0" not in lines[0]
+    assert history.folded == len(history) - (len(lines) - 1)
+    # Only user turns name topics; assistant turns are dropped when folded
+    assert "Answer" not in history.summary
+    print("✅ Rolling summary test passed")
+
+
+def test_summary_evicts_oldest_topics():
+    history = chat(40, max_tokens=200, summary_tokens=40, turn_tokens=40)
+    snapshot = history.snapshot()
+    folded_topics = [message.content for message in list(history)[:snapshot["folded"]] if message.role == "user"]
+    assert snapshot["dropped_topics"] > 0
+    assert snapshot["summary_topics"] + snapshot["dropped_topics"] == len(folded_topics)
+    assert count_tokens(history.summary) <= 40
+    # The newest folded topics are kept
+    assert history.summary.endswith(folded_topics[-1])
+    assert count_tokens(history.context()) <= 200
+    print("✅ Topic eviction test passed")
+
+
+def test_oversized_turn_is_kept():
+    history = ChatHistory(max_tokens=50, summary_tokens=10, turn_tokens=200)
+    history.append("user", "Explain cells")
+    history.append("assistant", "Cells are the units of life. " * 40)
+    # The newest turn stays even though it alone is over budget
+    assert history.context().splitlines()[-1].startswith("Assistant: Cells are")
+    assert history.snapshot()["window_messages"] == 1
+    print("✅ Oversized turn test passed")
+
+
+def test_paging_newest_first():
+    history = chat(25)  # 50 messages
+    assert history.pages(size=20) == 3
+    assert [m.content for m in history.page(0, size=20)] == [m.content for m in list(history)[30:]]
+    assert history.page(1, size=20) == list(history)[10:30]
+    assert history.page(2, size=20) == list(history)[:10]
+    assert history.page(3, size=20) == []
+    assert ChatHistory().pages() == 0
+    assert history.page(0, size=20)[0].as_dict() == {"role": "user", "content": "Question 15 about topic 15"}
+    print("✅ Paging test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Chat History Test Suite")
+    print("=" * 50)
+    test_short_chat_is_sent_verbatim()
+    test_window_folds_into_summary()
+    test_summary_evicts_oldest_topics()
+    test_oversized_turn_is_kept()
+    test_paging_newest_first()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
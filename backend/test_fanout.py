@@ -0,0 +1,141 @@
+"""
+Section fan-out test cases
+Run with: python test_fanout.py  (no server or API key needed)
+"""
+import json
+import time
+
+import app
+from fanout import run_sections, stream_sections, SectionTimeout
+
+
+def test_sections_run_concurrently():
+    """Four 0.2s sections should finish in about 0.2s, not 0.8s."""
+    print("Testing concurrent section execution...")
+    tasks = {name: (lambda name=name: time.sleep(0.2) or name) for name in ("a", "b", "c", "d")}
+    start = time.perf_counter()
+    results = run_sections(tasks, timeout=5)
+    elapsed = time.perf_counter() - start
+
+    assert all(r.ok for r in results.values())
+    assert elapsed < 0.6, f"sections ran serially ({elapsed:.2f}s)"
+    print(f"✅ Concurrency test passed ({elapsed:.2f}s)")
+
+
+def test_partial_results():
+    """A failing or slow section is reported without losing the others."""
+    print("\nTesting partial results...")
+
+    def boom():
+        raise ValueError("AI generation failed: boom")
+
+    results = run_sections({
+        "ok": lambda: 42,
+        "boom": boom,
+        "slow": lambda: time.sleep(1),
+    }, timeout=0.3)
+
+    assert results["ok"].value == 42
+    assert isinstance(results["boom"].error, ValueError)
+    assert isinstance(results["slow"].error, SectionTimeout)
+    print("✅ Partial results test passed")
+
+
+def test_study_pack_falls_back_per_section():
+    """/study still returns 200 with defaults when only the tip fails."""
+    print("\nTesting /study with a failing section...")
+    original_tip, original_fetch = app.SECTION_GENERATORS["study_tip"], app.fetch_wikipedia_content
+
+    def failing_tip(topic, wiki_content):
+        raise ValueError("AI generation failed: quota")
+
+    app.SECTION_GENERATORS["study_tip"] = failing_tip
+    app.fetch_wikipedia_content = lambda topic: f"Information about {topic}"
+    try:
+        response = app.app.test_client().get("/study?topic=Calculus&mode=math&cache=0")
+    finally:
+        app.SECTION_GENERATORS["study_tip"] = original_tip
+        app.fetch_wikipedia_content = original_fetch
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert set(data) == {"topic", "mode", "summary", "quiz", "study_tip", "math_question", "source"}
+    assert data["study_tip"] == app.default_study_tip("Calculus")
+    assert len(data["quiz"]) == 3
+    print("✅ Section fallback test passed")
+
+
+def test_stream_sections_in_completion_order():
+    """Faster sections are yielded first, with their deltas before their result."""
+    print("\nTesting streamed sections...")
+
+    def section(delay, text):
+        def run(on_delta):
+            time.sleep(delay)
+            on_delta(text)
+            return text
+        return run
+
+    events = list(stream_sections({"slow": section(0.2, "s"), "fast": section(0.0, "f")}, timeout=5))
+    assert [e[0] for e in events] == ["delta", "result", "delta", "result"]
+    assert [e[1].name for e in events if e[0] == "result"] == ["fast", "slow"]
+    print("✅ Streamed sections test passed")
+
+
+def test_study_stream_matches_study():
+    """/study/stream emits every section and ends with the /study payload."""
+    print("\nTesting /study/stream...")
+    original_fetch = app.fetch_wikipedia_content
+    app.fetch_wikipedia_content = lambda topic: f"Information about {topic}"
+    client = app.app.test_client()
+    try:
+        client.delete("/study/cache")
+        stream = client.get("/study/stream?topic=Algebra&mode=math&tokens=1")
+        expected = client.get("/study?topic=Algebra&mode=math&cache=0").get_json()
+    finally:
+        app.fetch_wikipedia_content = original_fetch
+
+    assert stream.mimetype == "text/event-stream"
+    events = [block.split("\n", 1) for block in stream.get_data(as_text=True).strip().split("\n\n")]
+    names = [header.replace("event: ", "") for header, _ in events]
+    assert names.count("section") == 4 and "delta" in names and names[-1] == "done"
+    assert json.loads(events[-1][1].replace("data: ", "", 1)) == expected
+    print("✅ Stream endpoint test passed")
+
+
+def test_study_stream_reports_late_errors():
+    """A failure after the stream has started ends it with an error event instead of cutting it off."""
+    print("\nTesting /study/stream errors...")
+    original_fetch = app.fetch_wikipedia_content
+
+    def broken_fetch(topic):
+        raise RuntimeError("connection reset")
+
+    app.fetch_wikipedia_content = broken_fetch
+    try:
+        app.study_cache.clear()
+        response = app.app.test_client().get("/study/stream?topic=Geometry")
+        body = response.get_data(as_text=True)
+    finally:
+        app.fetch_wikipedia_content = original_fetch
+
+    assert response.status_code == 200
+    events = [block.split("\n", 1) for block in body.strip().split("\n\n")]
+    assert events[-1][0] == "event: error"
+    assert json.loads(events[-1][1].replace("data: ", "", 1)) == {"error": "Internal server error: connection reset"}
+    print("✅ Stream error test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Section Fan-out Test Suite")
+    print("=" * 50)
+    test_sections_run_concurrently()
+    test_partial_results()
+    test_study_pack_falls_back_per_section()
+    test_stream_sections_in_completion_order()
+    test_study_stream_matches_study()
+    test_study_stream_reports_late_errors()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
@@ -0,0 +1,221 @@
+"""
+LLM router (hedging, failover, circuit breakers) test cases
+Run with: python test_llm_router.py  (no server or API key needed)
+"""
+import asyncio
+import time
+
+import app
+from core.ai_utils import FakeProvider, LLMRouter, NoProviderAvailable, create_router
+from utils.llm_scheduler import LLMScheduler
+
+
+def test_failover_and_ewma_routing():
+    slow, fast = FakeProvider("slow", latency=0.05), FakeProvider("fast")
+    router = LLMRouter([slow, fast], hedge=False)
+    assert [p.name for p in router.order()] == ["slow", "fast"]  # unmeasured: configured order
+    assert router.complete("q", {}).provider == "slow"
+    slow.error = ValueError("503 Service Unavailable")
+    assert router.complete("q", {}).provider == "fast"
+    assert router.stats["failovers"] == 1
+    slow.error = None
+    # Both measured now: the fastest goes first
+    assert [p.name for p in router.order()] == ["fast", "slow"]
+    assert router.complete("q", {}).provider == "fast"
+    print("✅ Failover/EWMA test passed")
+
+
+def test_hedged_request():
+    slow, fast = FakeProvider("slow", latency=0.5), FakeProvider("fast", reply=lambda prompt: "fast answer")
+    router = LLMRouter([slow, fast], hedge_delay=0.05)
+    start = time.perf_counter()
+    completion = router.complete("q", {})
+    assert completion.text == "fast answer" and time.perf_counter() - start < 0.4
+    assert router.stats["hedges"] == 1 and router.stats["hedge_wins"] == 1
+    # Once enough calls are measured the hedge delay is the p95, not the default
+    router = LLMRouter([FakeProvider("a", latency=0.01)], min_samples=3, hedge_delay=5.0, min_hedge_delay=0.0)
+    for _ in range(3):
+        router.complete("q", {})
+    assert router._delay(router.providers[0], "complete") < 0.5
+    print("✅ Hedged request test passed")
+
+
+def test_async_hedge_and_failover():
+    slow, fast = FakeProvider("slow", latency=0.5), FakeProvider("fast", latency=0.01, reply=lambda prompt: "fast")
+    router = LLMRouter([slow, fast], hedge_delay=0.05)
+
+    async def race():
+        start = time.perf_counter()
+        completion = await router.acomplete("q", {})
+        return completion, time.perf_counter() - start
+
+    completion, elapsed = asyncio.run(race())
+    assert completion.text == "fast" and elapsed < 0.4
+    assert router.stats["hedges"] == 1 and router.stats["hedge_wins"] == 1
+    # The losing call was cancelled: no failure counted against it
+    assert router.snapshot()["providers"]["slow"]["failures"] == 0
+    router = LLMRouter([FakeProvider("broken", error=ValueError("503 Service Unavailable")), fast], hedge=False)
+    assert asyncio.run(router.acomplete("q", {})).provider == "fast"
+    assert router.stats["failovers"] == 1
+    print("✅ Async hedge/failover test passed")
+
+
+def test_circuit_breaker():
+    now = [0.0]
+    broken, backup = FakeProvider("broken"), FakeProvider("backup")
+    router = LLMRouter([broken, backup], hedge=False, clock=lambda: now[0], max_failures=2, cooldown=30)
+    assert router.complete("q", {}).provider == "broken"
+    broken.error = ValueError("500 Internal")
+    for _ in range(4):
+        assert router.complete("q", {}).provider == "backup"
+    assert broken.calls == 3  # open after two failures: skipped without a call
+    assert router.snapshot()["providers"]["broken"]["state"] == "open"
+    now[0] = 31
+    router.complete("q", {})
+    assert broken.calls == 4  # one trial call, which failed: open again
+    router.complete("q", {})
+    assert broken.calls == 4
+    broken.error = None
+    now[0] = 62
+    assert router.complete("q", {}).provider == "broken"
+    assert router.snapshot()["providers"]["broken"]["state"] == "closed"
+    print("✅ Circuit breaker test passed")
+
+
+def test_all_providers_down():
+    router = LLMRouter([FakeProvider("a", error=ValueError("first")), FakeProvider("b", error=ValueError("last"))],
+                       hedge=False, max_failures=1, cooldown=60)
+    try:
+        router.complete("q", {})
+        assert False, "failure not raised"
+    except ValueError as e:
+        assert str(e) == "last"
+    try:
+        router.complete("q", {})
+        assert False, "open breakers not reported"
+    except NoProviderAvailable:
+        pass
+    assert router.stats["unavailable"] == 1
+    print("✅ All providers down test passed")
+
+
+def test_stream_failover_and_hedge():
+    broken = FakeProvider("broken", error=ValueError("503 Service Unavailable"))
+    router = LLMRouter([broken, FakeProvider("ok", reply=lambda prompt: "streamed answer")], hedge=False)
+    assert "".join(router.stream("q", {})) == "streamed answer "
+    slow = FakeProvider("slow", latency=0.5, reply=lambda prompt: "slow")
+    router = LLMRouter([slow, FakeProvider("fast", reply=lambda prompt: "fast")], hedge_delay=0.05)
+    start = time.perf_counter()
+    assert "".join(router.stream("q", {})).strip() == "fast" and time.perf_counter() - start < 0.4
+    print("✅ Stream failover/hedge test passed")
+
+
+def test_create_router():
+    router = create_router("fake")
+    assert router.models == "fake"
+    try:
+        create_router("fake,unknown")
+        assert False, "unknown provider accepted"
+    except ValueError:
+        pass
+    print("✅ Router factory test passed")
+
+
+def test_backend_uses_router():
+    original_mock, original_router = app.USE_MOCK_MODE, app.llm_router
+    app.USE_MOCK_MODE = False
+    app.llm_router = LLMRouter([FakeProvider("down", error=ValueError("500 Internal")),
+                                FakeProvider("up", reply=lambda prompt: "Cells are units of life.")], hedge=False)
+    try:
+        assert app.generate_ai_response("Explain cells", "Cells") == "Cells are units of life."
+        deltas = []
+        assert app.generate_ai_response("Explain cells", "Cells", on_delta=deltas.append) == "Cells are units of life."
+        assert "".join(deltas).strip() == "Cells are units of life."
+        assert app.app.test_client().get("/study/metrics").get_json()["llm_router"]["failovers"] == 2
+    finally:
+        app.USE_MOCK_MODE, app.llm_router = original_mock, original_router
+    print("✅ Backend router test passed")
+
+
+class BrokenStream(FakeProvider):
+    """Streams its first word, then fails with a retryable error."""
+
+    def stream(self, prompt: str, config: dict):
+        self.calls += 1
+        yield "Hello "
+        raise ValueError("503 Service Unavailable")
+
+
+def test_stream_not_retried_after_first_delta():
+    provider = BrokenStream("gemini")
+    saved = app.USE_MOCK_MODE, app.llm_router, app.llm_scheduler
+    app.USE_MOCK_MODE = False
+    app.llm_router = LLMRouter([provider], hedge=False)
+    app.llm_scheduler = LLMScheduler(rpm=10 ** 6, tpm=10 ** 9, sleep=lambda seconds: None)
+    deltas = []
+    try:
+        app.generate_ai_response("Say hello", "Hello", on_delta=deltas.append)
+        assert False, "mid-stream failure was swallowed"
+    except Exception as e:
+        assert "503" in str(e)
+    finally:
+        app.USE_MOCK_MODE, app.llm_router, app.llm_scheduler = saved
+    assert deltas == ["Hello "] and provider.calls == 1
+    print("✅ Mid-stream failure test passed")
+
+
+def test_rate_limits_do_not_open_breaker():
+    """Three 429s in one scheduled call answer 503, and the provider is used again once quota is back."""
+    quota = FakeProvider("gemini", error=ValueError("429 Resource has been exhausted (e.g. check quota)."),
+                         reply=lambda prompt: "Cells are units of life.")
+    saved = app.USE_MOCK_MODE, app.llm_router, app.llm_scheduler, app.fetch_wikipedia_content
+    app.USE_MOCK_MODE = False
+    app.llm_router = LLMRouter([quota], hedge=False, max_failures=2)
+    app.llm_scheduler = LLMScheduler(rpm=10 ** 6, tpm=10 ** 9, sleep=lambda seconds: None)
+    app.fetch_wikipedia_content = lambda topic: f"{topic} are units of life."
+    try:
+        response = app.app.test_client().get("/study?topic=Cells&cache=0")
+        assert response.status_code == 503 and response.headers["Retry-After"] == "30"
+        assert app.llm_router.snapshot()["providers"]["gemini"]["state"] == "closed"
+        quota.error = None
+        assert app.app.test_client().get("/study?topic=Cells&cache=0").status_code == 200
+        # A breaker that is open for real errors is retried and reported as busy, not as a failure
+        app.llm_router = LLMRouter([FakeProvider("down", error=ValueError("500 Internal"))], hedge=False,
+                                   max_failures=1)
+        assert app.app.test_client().get("/study?topic=Cells&cache=0").status_code == 503
+    finally:
+        app.USE_MOCK_MODE, app.llm_router, app.llm_scheduler, app.fetch_wikipedia_content = saved
+    print("✅ Rate limit/breaker test passed")
+
+
+def test_hedges_charged_to_scheduler():
+    scheduler = LLMScheduler(rpm=100, tpm=10 ** 6)
+    router = LLMRouter([FakeProvider("slow", latency=0.3), FakeProvider("fast")], hedge_delay=0.05,
+                       on_hedge=scheduler.charge)
+    scheduler.submit(lambda: router.complete("Explain cells", {"max_output_tokens": 100}), "Explain cells",
+                     output_tokens=100)
+    snapshot = scheduler.snapshot()
+    assert snapshot["admitted"] == 1 and snapshot["charged"] == 1
+    assert snapshot["request_budget"] < 99
+    assert create_router("fake").on_hedge is not None
+    print("✅ Hedge admission test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("LLM Router Test Suite")
+    print("=" * 50)
+    test_failover_and_ewma_routing()
+    test_hedged_request()
+    test_async_hedge_and_failover()
+    test_circuit_breaker()
+    test_all_providers_down()
+    test_stream_failover_and_hedge()
+    test_create_router()
+    test_backend_uses_router()
+    test_stream_not_retried_after_first_delta()
+    test_rate_limits_do_not_open_breaker()
+    test_hedges_charged_to_scheduler()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
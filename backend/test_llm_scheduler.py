@@ -0,0 +1,196 @@
+"""
+LLM scheduler test cases (rate limits, priorities, retries)
+Run with: python test_llm_scheduler.py  (uses a fake model client, no API key needed)
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AI_StudyBuddy'))
+
+from utils.llm_scheduler import (  # noqa: E402
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, LLMScheduler, SchedulerTimeout, current_priority, priority
+)
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel: records calls, fails on demand."""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+
+    def generate_content(self, prompt):
+        self.calls.append(prompt)
+        if self.failures:
+            raise self.failures.pop(0)
+        return f"answer to {prompt}"
+
+
+def test_request_budget_delays_calls():
+    print("Testing RPM budget...")
+    scheduler, model = LLMScheduler(rpm=600), FakeModel()
+    scheduler.requests.level = 0  # budget exhausted; refills at 10 requests/s
+    start = time.perf_counter()
+    scheduler.submit(lambda: model.generate_content("q"), "q")
+    assert time.perf_counter() - start >= 0.09
+    assert scheduler.snapshot()["max_wait_ms"] >= 90
+    print("✅ RPM budget test passed")
+
+
+def test_token_budget_delays_large_prompts():
+    print("\nTesting TPM budget...")
+    scheduler = LLMScheduler(rpm=6000, tpm=60000)
+    scheduler.tokens.level = 0  # refills at 1000 tokens/s
+    start = time.perf_counter()
+    scheduler.submit(lambda: "ok", "word " * 100, output_tokens=100)  # ~200 tokens
+    assert time.perf_counter() - start >= 0.18
+    print("✅ TPM budget test passed")
+
+
+def test_interactive_served_before_batch():
+    print("\nTesting priorities...")
+    scheduler, order = LLMScheduler(rpm=600), []
+    scheduler.requests.level = 0
+
+    def call(name, level):
+        scheduler.submit(lambda: order.append(name), name, level=level)
+
+    batch = threading.Thread(target=call, args=("batch", PRIORITY_BATCH))
+    batch.start()
+    time.sleep(0.02)
+    assert scheduler.snapshot()["queued_batch"] == 1
+    call("interactive", PRIORITY_INTERACTIVE)
+    batch.join()
+    assert order == ["interactive", "batch"]
+    print("✅ Priority test passed")
+
+
+def test_rate_limit_errors_retried_with_backoff():
+    print("\nTesting retries...")
+    delays = []
+    scheduler = LLMScheduler(max_retries=3, base_delay=1.0, sleep=delays.append)
+    model = FakeModel([Exception("429 Resource has been exhausted (e.g. check quota)")] * 2)
+
+    assert scheduler.submit(lambda: model.generate_content("q"), "q") == "answer to q"
+    assert len(model.calls) == 3 and scheduler.snapshot()["retries"] == 2
+    assert 0 <= delays[0] <= 1.0 and 0 <= delays[1] <= 2.0  # full jitter, doubling cap
+    print("✅ Retry test passed")
+
+
+def test_other_errors_not_retried():
+    print("\nTesting non-retryable errors...")
+    scheduler = LLMScheduler(sleep=lambda s: None)
+    model = FakeModel([ValueError("API_KEY_INVALID")])
+    try:
+        scheduler.submit(lambda: model.generate_content("q"), "q")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    assert len(model.calls) == 1 and scheduler.snapshot()["failed"] == 1
+    print("✅ Non-retryable error test passed")
+
+
+def test_queue_timeout():
+    print("\nTesting queue timeout...")
+    scheduler = LLMScheduler(rpm=0.6)
+    scheduler.requests.level = 0
+    try:
+        scheduler.submit(lambda: "never", "q", timeout=0.05)
+        assert False, "expected SchedulerTimeout"
+    except SchedulerTimeout:
+        pass
+    assert scheduler.snapshot()["queue_depth"] == 0
+    print("✅ Queue timeout test passed")
+
+
+def test_priority_scoped_to_context():
+    print("\nTesting priority scopes...")
+    with priority(PRIORITY_BATCH):
+        with priority(PRIORITY_INTERACTIVE + 1):
+            assert current_priority() == PRIORITY_INTERACTIVE + 1
+        assert current_priority() == PRIORITY_BATCH
+        # Other threads keep the default
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(current_priority()))
+        thread.start()
+        thread.join()
+        assert seen == [PRIORITY_INTERACTIVE]
+    assert current_priority() == PRIORITY_INTERACTIVE
+
+    async def task(level, started, seen):
+        with priority(level):
+            started.set()
+            await asyncio.sleep(0.01)
+            seen.append((level, current_priority()))
+
+    async def main():
+        # A batch task does not leak its priority into a task interleaved with it
+        seen, started = [], asyncio.Event()
+        batch = asyncio.create_task(task(PRIORITY_BATCH, started, seen))
+        await started.wait()
+        assert current_priority() == PRIORITY_INTERACTIVE
+        await asyncio.gather(batch, task(PRIORITY_INTERACTIVE, asyncio.Event(), seen))
+        return seen
+
+    assert sorted(asyncio.run(main())) == [(PRIORITY_INTERACTIVE, PRIORITY_INTERACTIVE),
+                                           (PRIORITY_BATCH, PRIORITY_BATCH)]
+    print("✅ Priority scope test passed")
+
+
+def test_async_calls_queue_on_the_loop():
+    print("\nTesting async admission...")
+    scheduler, order = LLMScheduler(rpm=600), []
+    scheduler.requests.level = 0  # refills at 10 requests/s
+
+    async def call(name, level):
+        async def fn():
+            order.append(name)
+        await scheduler.asubmit(fn, name, level=level)
+
+    async def main():
+        threads = threading.active_count()
+        batch = [asyncio.create_task(call(f"batch{i}", PRIORITY_BATCH)) for i in range(3)]
+        await asyncio.sleep(0.02)
+        # Queued calls wait on the loop, not in executor threads
+        assert scheduler.snapshot()["queued_batch"] == 3
+        assert threading.active_count() == threads
+        # A thread submitting interactively is still served first
+        interactive = asyncio.get_running_loop().run_in_executor(
+            None, lambda: scheduler.submit(lambda: order.append("interactive"), "q"))
+        # A cancelled call leaves the queue and wakes the next one
+        batch[0].cancel()
+        await asyncio.gather(interactive, *batch[1:])
+        assert batch[0].cancelled()
+
+    asyncio.run(main())
+    assert order == ["interactive", "batch1", "batch2"]
+    snapshot = scheduler.snapshot()
+    assert snapshot["queue_depth"] == 0 and snapshot["in_flight"] == 0 and snapshot["completed"] == 3
+    try:
+        scheduler.requests.level = 0
+        asyncio.run(scheduler.asubmit(lambda: asyncio.sleep(0), "q", timeout=0.05))
+        assert False, "expected SchedulerTimeout"
+    except SchedulerTimeout:
+        pass
+    assert scheduler.snapshot()["queue_depth"] == 0
+    print("✅ Async admission test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("LLM Scheduler Test Suite")
+    print("=" * 50)
+    test_request_budget_delays_calls()
+    test_token_budget_delays_large_prompts()
+    test_interactive_served_before_batch()
+    test_rate_limit_errors_retried_with_backoff()
+    test_other_errors_not_retried()
+    test_queue_timeout()
+    test_priority_scoped_to_context()
+    test_async_calls_queue_on_the_loop()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
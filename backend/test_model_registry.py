@@ -0,0 +1,68 @@
+"""
+Shared model registry test cases (lazy clients, warm-up and call timings)
+Run with: python test_model_registry.py  (fake LLM provider, no API key needed)
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AI_StudyBuddy'))
+
+from core.ai_utils import FakeProvider, LLMRouter  # noqa: E402
+from utils import gemini_helper  # noqa: E402
+from utils.gemini_helper import ModelRegistry  # noqa: E402
+
+
+def test_registry_is_lazy_and_shared():
+    registry = ModelRegistry("fake")
+    timings = registry.timings()
+    assert timings["cold_start_ms"] is None and timings["calls"] == 0 and "router" not in timings
+    router = registry.get()
+    assert registry.get() is router and router.models == "fake"
+    timings = registry.timings()
+    assert timings["cold_start_ms"] is not None and timings["router"]["providers"]["fake"]["calls"] == 0
+    print("✅ Lazy registry test passed")
+
+
+def test_timings_through_fake_backend():
+    registry = ModelRegistry("fake")
+    registry.get().providers[0].latency = 0.02
+    saved = gemini_helper.registry
+    gemini_helper.registry = registry
+    try:
+        assert gemini_helper.generate_response("Explain cells", mode="explainer").startswith("[fake] ")
+        streamed = "".join(gemini_helper.stream_response("Explain atoms", mode="explainer"))
+        assert streamed.startswith("[fake] ") and "❌" not in streamed
+    finally:
+        gemini_helper.registry = saved
+    timings = registry.timings()
+    assert timings["providers"] == "fake"
+    assert timings["calls"] == 2 and timings["streams"] == 1
+    assert timings["avg_call_ms"] >= 20 and timings["avg_first_token_ms"] >= 20
+    assert 0 <= timings["avg_lookup_ms"] < timings["avg_call_ms"]
+    assert timings["router"]["providers"]["fake"]["calls"] == 2
+    print("✅ Registry timings test passed")
+
+
+def test_warm_up_pings_every_provider():
+    first, second = FakeProvider("first"), FakeProvider("second")
+    router = LLMRouter([first, second], hedge=False)
+    router.warm_up()
+    assert first.calls == second.calls == 0  # clients only
+    router.warm_up(ping=True)
+    assert first.calls == second.calls == 1
+    registry = ModelRegistry("fake")
+    registry.warm_up(ping=True)
+    assert registry.get().providers[0].calls == 1
+    print("✅ Warm-up ping test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Model Registry Test Suite")
+    print("=" * 50)
+    test_registry_is_lazy_and_shared()
+    test_timings_through_fake_backend()
+    test_warm_up_pings_every_provider()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
@@ -0,0 +1,101 @@
+"""
+Extracted PDF text cache test cases (Streamlit PDF upload)
+Run with: python test_pdf_cache.py  (no server or API key needed)
+"""
+import io
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AI_StudyBuddy'))
+
+import core.pdf_cache as pdf_cache  # noqa: E402
+from core.pdf_cache import PDFTextCache, cached_extract_text, content_hash  # noqa: E402
+
+
+def disk_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".txt"))
+
+
+def test_memory_lru_eviction():
+    cache = PDFTextCache(max_entries=2)
+    cache.put("a", "alpha")
+    cache.put("b", "beta")
+    assert cache.get("a") == "alpha"  # b is now least recently used
+    cache.put("c", "gamma")
+    assert cache.get("b") is None
+    assert cache.get("a") == "alpha" and cache.get("c") == "gamma"
+    assert cache.stats["memory_hits"] == 3 and cache.stats["misses"] == 1
+    print("✅ Memory LRU test passed")
+
+
+def test_disk_tier_cap_and_lru():
+    with tempfile.TemporaryDirectory() as directory:
+        cache = PDFTextCache(max_entries=1, directory=directory, max_bytes=25)
+        cache.put("a", "a" * 10)
+        cache.put("b", "b" * 10)
+        os.utime(cache._path("a"), (1, 1))
+        os.utime(cache._path("b"), (2, 2))
+        # A disk hit refreshes the file's mtime, so b becomes least recently used
+        assert cache.get("a") == "a" * 10
+        assert cache.stats["disk_hits"] == 1
+        cache.put("c", "c" * 10)
+        assert disk_files(directory) == ["a.txt", "c.txt"]
+        assert cache.stats["evictions"] == 1
+        # Texts larger than the whole cap stay in memory only
+        cache.put("big", "x" * 26)
+        assert disk_files(directory) == ["a.txt", "c.txt"]
+        # A fresh process (empty memory tier) is served from disk
+        restarted = PDFTextCache(max_entries=1, directory=directory, max_bytes=25)
+        assert restarted.get("c") == "c" * 10 and restarted.get("b") is None
+        assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+    print("✅ Disk tier test passed")
+
+
+def test_keyed_on_content_and_max_chars():
+    calls = []
+    original = pdf_cache.extract_text
+
+    def fake_extract(source, max_chars=None):
+        calls.append(max_chars)
+        text = source.read().decode()
+        return text[:max_chars] if max_chars is not None else text
+
+    pdf_cache.extract_text = fake_extract
+    try:
+        cache = PDFTextCache()
+        assert cached_extract_text(io.BytesIO(b"first document"), max_chars=5, cache=cache) == "first"
+        # Same bytes in a new upload: served from the cache
+        assert cached_extract_text(io.BytesIO(b"first document"), max_chars=5, cache=cache) == "first"
+        # Another max_chars or other content: extracted again
+        assert cached_extract_text(io.BytesIO(b"first document"), max_chars=8, cache=cache) == "first do"
+        assert cached_extract_text(io.BytesIO(b"other document"), max_chars=5, cache=cache) == "other"
+    finally:
+        pdf_cache.extract_text = original
+    assert calls == [5, 8, 5]
+    assert cache.key("abc", None) == "abc-full" and cache.key("abc", 5) == "abc-5"
+    print("✅ Cache key test passed")
+
+
+def test_hash_restores_stream_position():
+    upload = io.BytesIO(b"x" * (3 * 1024 * 1024 + 7))
+    upload.seek(42)
+    digest = content_hash(upload)
+    assert upload.tell() == 42
+    upload.seek(0)
+    assert content_hash(upload) == digest and upload.tell() == 0
+    assert content_hash(io.BytesIO(b"y" + upload.getvalue()[1:])) != digest
+    print("✅ Stream position test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("PDF Text Cache Test Suite")
+    print("=" * 50)
+    test_memory_lru_eviction()
+    test_disk_tier_cap_and_lru()
+    test_keyed_on_content_and_max_chars()
+    test_hash_restores_stream_position()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
@@ -0,0 +1,109 @@
+"""
+PDF extraction test cases (Streamlit PDF upload and summarization)
+Run with: python test_pdf_handler.py  (no server or API key needed)
+"""
+import io
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AI_StudyBuddy'))
+
+from core.pdf_cache import PDFTextCache, cached_extract_text  # noqa: E402
+from core.pdf_handler import extract_text, extract_text_parallel, iter_pdf_pages, iter_pdf_pages_parallel  # noqa: E402
+
+
+def make_pdf(pages) -> bytes:
+    """A minimal PDF with one line of Helvetica text per page."""
+    count = len(pages)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{4 + 2 * i} 0 R" for i in range(count)), count),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 72 712 Td ({text}) Tj ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+PAGES = [f"Page {i} text" for i in range(1, 13)]
+PDF = make_pdf(PAGES)
+
+
+def test_pages_in_order():
+    texts = list(iter_pdf_pages(io.BytesIO(PDF)))
+    assert [text.strip() for text in texts] == PAGES
+    assert extract_text(io.BytesIO(PDF)) == "".join(texts)
+    print("✅ Page order test passed")
+
+
+def test_early_stop_at_max_chars():
+    seen = []
+    pages = iter_pdf_pages(io.BytesIO(PDF))
+    first_two = len(next(pages)) + len(next(pages))
+
+    import core.pdf_handler as pdf_handler
+    original = pdf_handler.iter_pdf_pages
+
+    def counting(source):
+        for text in original(source):
+            seen.append(text)
+            yield text
+
+    pdf_handler.iter_pdf_pages = counting
+    try:
+        text = extract_text(io.BytesIO(PDF), max_chars=first_two - 1)
+    finally:
+        pdf_handler.iter_pdf_pages = original
+    assert len(seen) == 2, "pages after max_chars were extracted"
+    assert len(text) == first_two - 1
+    assert extract_text(io.BytesIO(PDF)).startswith(text)
+    print("✅ Early stop test passed")
+
+
+def test_parallel_matches_sequential():
+    sequential = extract_text(io.BytesIO(PDF))
+    # Several workers, ranges that do not divide the page count, and the
+    # single-worker fallback all give the sequential text
+    assert list(iter_pdf_pages_parallel(PDF, workers=3, pages_per_task=5)) == list(iter_pdf_pages(io.BytesIO(PDF)))
+    assert extract_text_parallel(PDF, workers=2) == sequential
+    assert extract_text_parallel(PDF, workers=1) == sequential
+    print("✅ Parallel extraction test passed")
+
+
+def test_cached_full_extraction():
+    cache = PDFTextCache(max_entries=4)
+    upload = io.BytesIO(PDF)
+    preview = cached_extract_text(upload, max_chars=20, cache=cache)
+    upload.seek(10)
+    full = cached_extract_text(upload, cache=cache)
+    assert upload.tell() == 10
+    assert full == extract_text(io.BytesIO(PDF)) and full.startswith(preview)
+    assert cached_extract_text(upload, cache=cache) == full
+    assert cache.stats["memory_hits"] == 1 and cache.stats["misses"] == 2
+    print("✅ Cached full extraction test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("PDF Extraction Test Suite")
+    print("=" * 50)
+    test_pages_in_order()
+    test_early_stop_at_max_chars()
+    test_parallel_matches_sequential()
+    test_cached_full_extraction()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
@@ -0,0 +1,99 @@
+"""
+Prompt template registry test cases
+Run with: python test_prompts.py  (no server or API key needed)
+"""
+import app
+from utils.prompts import PromptRegistry, PromptTemplate
+from utils.structured_output import SchemaSet
+
+
+def test_template_cleaned_and_rendered():
+    template = PromptTemplate("t", """
+        About {topic}:
+            - keep nested indentation
+        {{literal}} {content}
+    """)
+    assert template.text == "About {topic}:\n    - keep nested indentation\n{{literal}} {content}"
+    assert template.fields == ("topic", "content")
+    assert template.render(topic="Cells", content="text ") == "About Cells:\n    - keep nested indentation\n{literal} text"
+    assert template.saved_tokens > 0
+    try:
+        template.render(topic="Cells")
+        assert False, "missing field accepted"
+    except KeyError:
+        pass
+    for bad in ("{content[:1500]}", "{topic!r}", "{score:.2f}"):
+        try:
+            PromptTemplate("bad", bad)
+            assert False, f"{bad} accepted"
+        except ValueError:
+            pass
+    print("✅ Template test passed")
+
+
+def test_versions():
+    registry = PromptRegistry()
+    first = registry.register("a", "Explain {topic}.")
+    # Indentation-only edits keep the version; wording edits change it
+    assert registry.register("a", "    Explain {topic}.   ") is first
+    assert PromptTemplate("a", "Explain {topic} simply.").version != first.version
+    assert PromptTemplate("b", "Explain {topic}.").version != first.version
+    try:
+        registry.register("a", "Explain {topic} simply.")
+        assert False, "conflicting registration accepted"
+    except ValueError:
+        pass
+    registry.register("b", "Quiz on {topic}.")
+    assert registry.version("a", "b") != registry.version("b", "a")
+    assert set(registry.snapshot()) == {"a", "b"}
+    print("✅ Version test passed")
+
+
+def test_study_prompts_registered():
+    snapshot = app.prompts.snapshot()
+    for name in ("study.summary", "study.quiz", "study.study_tip", "study.math_question", "study.bundle",
+                 "study.structured"):
+        assert snapshot[name]["fields"][:2] == ["topic", "wiki_content"], name
+    prompt = app.QUIZ_PROMPT.render(topic="Cells", wiki_content="x" * 5000)
+    assert prompt.startswith("Based on the following information about Cells")
+    assert "\n    " not in prompt
+    print("✅ Study prompt test passed")
+
+
+def test_cache_key_tracks_template_versions():
+    key = app.study_cache_key("Cells", "normal")
+    structured_key = app.study_cache_key("Cells", "normal", structured=True)
+    assert key != app.study_cache_key("Cells", "normal", bundle=True) and key != structured_key
+    original = app.prompts._templates["study.quiz"]
+    app.prompts._templates["study.quiz"] = PromptTemplate("study.quiz", original.text + "\nBe concise.")
+    try:
+        assert app.study_cache_key("Cells", "normal") != key
+        # The structured path does not use the quiz prompt
+        assert app.study_cache_key("Cells", "normal", structured=True) == structured_key
+    finally:
+        app.prompts._templates["study.quiz"] = original
+    assert app.study_cache_key("Cells", "normal") == key
+    # Structured packs also depend on the section schemas
+    schemas = app.STUDY_SCHEMAS
+    changed = dict(schemas.schemas, summary=dict(schemas.schemas["summary"], minItems=5))
+    app.STUDY_SCHEMAS = SchemaSet(changed)
+    try:
+        assert app.study_cache_key("Cells", "normal", structured=True) != structured_key
+        assert app.study_cache_key("Cells", "normal") == key
+    finally:
+        app.STUDY_SCHEMAS = schemas
+    assert SchemaSet(dict(schemas.schemas)).version == schemas.version
+    print("✅ Cache key test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Prompt Template Test Suite")
+    print("=" * 50)
+    test_template_cleaned_and_rendered()
+    test_versions()
+    test_study_prompts_registered()
+    test_cache_key_tracks_template_versions()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
@@ -0,0 +1,124 @@
+"""
+PDF retrieval (BM25 index) test cases (Streamlit PDF follow-up questions)
+Run with: python test_retrieval.py  (no server or API key needed)
+"""
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AI_StudyBuddy'))
+
+from core import retrieval  # noqa: E402
+from core.retrieval import BM25Index, IndexStore  # noqa: E402
+
+TOPICS = {
+    "photosynthesis": "Photosynthesis turns light, water and carbon dioxide into glucose in the chloroplast.",
+    "mitosis": "Mitosis splits one nucleus into two identical nuclei during cell division.",
+    "osmosis": "Osmosis moves water across a membrane towards the higher solute concentration.",
+    "enzymes": "Enzymes lower the activation energy of reactions and are shaped by temperature and pH.",
+    "respiration": "Respiration releases energy from glucose in the mitochondria, producing carbon dioxide.",
+}
+
+
+def document(repeat: int = 8) -> str:
+    """One paragraph block per topic, each long enough to form its own chunks."""
+    return "\n\n".join("\n\n".join([sentence] * repeat) for sentence in TOPICS.values())
+
+
+def test_bm25_ranking():
+    index = BM25Index.build(document(), chunk_tokens=60)
+    assert len(index.chunks) >= len(TOPICS)
+    best = index.search("What happens in mitosis?", k=1)
+    assert len(best) == 1 and "Mitosis" in best[0]
+    # Rarer terms outweigh common ones: "chloroplast" only appears with photosynthesis
+    scores = index.scores("glucose chloroplast")
+    assert "chloroplast" in index.chunks[int(scores.argmax())]
+    # Results come back in document order, and an unmatched query falls back to the opening chunks
+    results = index.search("osmosis enzymes", k=4)
+    assert [index.chunks.index(chunk) for chunk in results] == sorted(index.chunks.index(chunk) for chunk in results)
+    assert index.search("quantum chromodynamics", k=2) == index.chunks[:2]
+    assert BM25Index.build("").search("anything") == []
+    print("✅ BM25 ranking test passed")
+
+
+def test_index_persistence():
+    text = document()
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, "indexes")
+        store = IndexStore(directory=directory)
+        assert not os.path.exists(directory)  # created on the first save, not on construction
+        built = store.get(text)
+        files = os.listdir(directory)
+        assert files == [f"{store.key(text)}.npz"]
+        # A fresh store (a new process) loads the saved index instead of rebuilding it
+        loaded = IndexStore(directory=directory).get(text)
+        assert loaded is not built and loaded.chunks == built.chunks and loaded.vocab == built.vocab
+        assert (loaded.scores("water membrane") == built.scores("water membrane")).all()
+        # A corrupt file is rebuilt and replaced
+        with open(os.path.join(directory, files[0]), "wb") as f:
+            f.write(b"not an index")
+        assert IndexStore(directory=directory).get(text).chunks == built.chunks
+        assert IndexStore(directory=directory).get(text).chunks == built.chunks
+    # Without a directory nothing touches the disk
+    assert IndexStore(directory="").get(text).chunks == built.chunks
+    assert os.path.isabs(retrieval.RETRIEVAL_INDEX_DIR) or not retrieval.RETRIEVAL_INDEX_DIR
+    print("✅ Index persistence test passed")
+
+
+def test_disk_cap_evicts_least_recently_used():
+    texts = [document(repeat) for repeat in (6, 7, 8)]
+    with tempfile.TemporaryDirectory() as directory:
+        store = IndexStore(directory=directory, max_entries=1)
+        paths = [os.path.join(directory, f"{store.key(text)}.npz") for text in texts[:2]]
+        for i, text in enumerate(texts[:2]):
+            store.get(text)
+            os.utime(paths[i], (i + 1, i + 1))
+        size = max(os.path.getsize(path) for path in paths)
+        # Loading the first index from disk marks it used: the second is now least recently used
+        restarted = IndexStore(directory=directory, max_entries=1, max_bytes=int(size * 2.5))
+        restarted.get(texts[0])
+        restarted.get(texts[2])
+        assert sorted(os.listdir(directory)) == sorted([os.path.basename(paths[0]),
+                                                        f"{store.key(texts[2])}.npz"])
+        assert restarted.stats["evictions"] == 1
+        # The evicted index is rebuilt on its next use
+        assert restarted.get(texts[1]).chunks == BM25Index.build(texts[1]).chunks
+    print("✅ Index disk cap test passed")
+
+
+def test_memory_lru():
+    store = IndexStore(directory="", max_entries=2)
+    first = store.get("Cells divide by mitosis.")
+    store.get("Water moves by osmosis.")
+    assert store.get("Cells divide by mitosis.") is first
+    store.get("Enzymes speed up reactions.")  # evicts the osmosis index, not the one just used
+    assert store.get("Cells divide by mitosis.") is first
+    assert len(store._memory) == 2
+    print("✅ Index memory LRU test passed")
+
+
+def test_relevant_context():
+    original = retrieval.index_store
+    retrieval.index_store = IndexStore(directory="")
+    try:
+        context = retrieval.relevant_context(document(), "Where does respiration release energy?", k=2)
+    finally:
+        retrieval.index_store = original
+    excerpts = context.split("\n\n---\n\n")
+    assert 1 <= len(excerpts) <= 2
+    assert "mitochondria" in excerpts[0] and "Mitosis" not in context
+    print("✅ Relevant context test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("PDF Retrieval Test Suite")
+    print("=" * 50)
+    test_bm25_ranking()
+    test_index_persistence()
+    test_disk_cap_evicts_least_recently_used()
+    test_memory_lru()
+    test_relevant_context()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
@@ -0,0 +1,187 @@
+"""
+Request coalescing test cases
+Run with: python test_single_flight.py  (no server or API key needed)
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import app
+from single_flight import CoalescedTimeout, SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    print("Testing single-flight sharing...")
+    flight, runs = SingleFlight(), []
+
+    def compute():
+        runs.append(1)
+        time.sleep(0.2)
+        return "pack"
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(lambda _: flight.do("calculus|normal", compute), range(10)))
+
+    assert len(runs) == 1
+    assert all(value == "pack" for value, _ in results)
+    assert sum(shared for _, shared in results) == 9
+    assert flight.snapshot()["coalesced"] == 9
+    print("✅ Sharing test passed")
+
+
+def test_errors_propagate_to_waiters():
+    print("\nTesting error propagation...")
+    flight, started = SingleFlight(), threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("AI generation failed: boom")
+
+    def follower():
+        started.wait()
+        try:
+            flight.do("k", lambda: "unused")
+        except ValueError as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "k", fail)
+        waiter = pool.submit(follower)
+        assert waiter.result() == "AI generation failed: boom"
+        assert isinstance(leader.exception(), ValueError)
+    assert flight.snapshot()["in_flight"] == 0
+    print("✅ Error propagation test passed")
+
+
+def test_waiters_time_out():
+    print("\nTesting follower timeout...")
+    flight, started = SingleFlight(), threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.3)
+        return "late"
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(flight.do, "k", slow)
+        started.wait()
+        try:
+            flight.do("k", slow, timeout=0.05)
+            assert False, "expected CoalescedTimeout"
+        except CoalescedTimeout:
+            pass
+        # The follower that gave up no longer counts as waiting
+        assert flight.snapshot()["waiting"] == 0
+    print("✅ Timeout test passed")
+
+
+def test_leader_times_out():
+    print("\nTesting leader timeout...")
+    flight, release = SingleFlight(), threading.Event()
+
+    def hung():
+        release.wait(5)
+        return "late"
+
+    start = time.perf_counter()
+    try:
+        flight.do("k", hung, timeout=0.1)
+        assert False, "expected CoalescedTimeout"
+    except CoalescedTimeout as e:
+        assert "generating" in str(e)
+    assert time.perf_counter() - start < 1
+    # The run goes on in the background and later callers still join it
+    assert flight.snapshot()["in_flight"] == 1
+    release.set()
+    assert flight.do("k", lambda: "unused", timeout=1) in (("late", True), ("unused", False))
+    # Without a timeout the leader runs fn() itself
+    assert flight.do("inline", threading.current_thread) == (threading.current_thread(), False)
+    print("✅ Leader timeout test passed")
+
+
+def test_timed_leaders_share_a_bounded_pool():
+    print("\nTesting leader pool...")
+    flight, release, threads = SingleFlight(max_workers=1), threading.Event(), set()
+
+    def hung():
+        threads.add(threading.current_thread().name)
+        release.wait(5)
+        return "late"
+
+    for key in ("a", "b", "c"):
+        try:
+            flight.do(key, hung, timeout=0.05)
+            assert False, "expected CoalescedTimeout"
+        except CoalescedTimeout:
+            pass
+    # Later leaders queue for the one thread instead of starting their own
+    assert len(threads) == 1 and flight.snapshot()["in_flight"] == 3
+    release.set()
+    assert flight.do("c", lambda: "unused", timeout=1) in (("late", True), ("unused", False))
+    print("✅ Leader pool test passed")
+
+
+def test_followers_cache_bypassed_leader_result():
+    print("\nTesting cache policy of coalesced requests...")
+    original_fetch, started = app.fetch_wikipedia_content, threading.Event()
+
+    def slow_fetch(topic):
+        started.set()
+        time.sleep(0.2)
+        return f"Information about {topic}"
+
+    app.fetch_wikipedia_content = slow_fetch
+    app.study_cache.clear()
+    try:
+        client = app.app.test_client
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(lambda: client().get("/study?topic=Magnetism&cache=0"))
+            started.wait()
+            follower = pool.submit(lambda: client().get("/study?topic=Magnetism"))
+            assert leader.result().headers["X-Cache"] == "BYPASS"
+            assert follower.result().headers["X-Cache"] == "COALESCED"
+        assert client().get("/study?topic=Magnetism").headers["X-Cache"] == "HIT"
+    finally:
+        app.fetch_wikipedia_content = original_fetch
+    print("✅ Coalesced cache policy test passed")
+
+
+def test_study_requests_coalesced():
+    print("\nTesting /study coalescing...")
+    original_fetch, calls = app.fetch_wikipedia_content, []
+
+    def slow_fetch(topic):
+        calls.append(topic)
+        time.sleep(0.2)
+        return f"Information about {topic}"
+
+    app.fetch_wikipedia_content = slow_fetch
+    try:
+        client = app.app.test_client
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            responses = list(pool.map(lambda t: client().get(f"/study?topic={t}&cache=0"),
+                                      ["Gravity", "gravity", "GRAVITY ", "Gravity", "gravity"]))
+    finally:
+        app.fetch_wikipedia_content = original_fetch
+
+    assert len(calls) == 1
+    assert [r.status_code for r in responses] == [200] * 5
+    assert sorted(r.headers["X-Cache"] for r in responses) == ["BYPASS"] + ["COALESCED"] * 4
+    print("✅ Endpoint coalescing test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Request Coalescing Test Suite")
+    print("=" * 50)
+    test_concurrent_calls_share_one_run()
+    test_errors_propagate_to_waiters()
+    test_waiters_time_out()
+    test_leader_times_out()
+    test_timed_leaders_share_a_bounded_pool()
+    test_followers_cache_bypassed_leader_result()
+    test_study_requests_coalesced()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
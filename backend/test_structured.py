@@ -0,0 +1,126 @@
+"""
+Structured (JSON schema) output test cases
+Run with: python test_structured.py  (no server or API key needed)
+"""
+import json
+
+import app
+from utils.structured_output import compile_validator, gemini_schema
+
+QUIZ = [{"question": f"Q{i}?", "options": ["w", "x", "y", "z"], "correct": "B"} for i in range(3)]
+SUMMARY = ["one.", "two.", "three."]
+
+
+def _study(query, responses):
+    """GET /study with the model answering from `responses`; returns (json, schemas requested)."""
+    requested = []
+    original_generate, original_fetch = app.generate_structured_text, app.fetch_wikipedia_content
+
+    def generate(topic, wiki_content, schema):
+        requested.append(list(schema["properties"]))
+        response = responses[len(requested) - 1]
+        if isinstance(response, Exception):
+            raise response
+        return response if isinstance(response, str) else json.dumps(response)
+
+    app.fetch_wikipedia_content = lambda topic: f"Information about {topic}"
+    app.generate_structured_text = generate
+    try:
+        return app.app.test_client().get(f"/study?{query}&structured=1&cache=0"), requested
+    finally:
+        app.generate_structured_text, app.fetch_wikipedia_content = original_generate, original_fetch
+
+
+def test_validator():
+    validate = compile_validator(app.STUDY_SCHEMAS.schemas["quiz"])
+    assert validate(QUIZ) == []
+    assert validate(QUIZ[:2]) == ["$: 2 items"]
+    bad = [dict(QUIZ[0], correct="E"), dict(QUIZ[1], options=["a", " ", "c", "d"]), {"question": "Q?"}, "Q?"]
+    assert validate(bad) == [
+        "$[0].correct: 'E' is not one of ['A', 'B', 'C', 'D']",
+        "$[1].options[1]: empty",
+        "$[2].options: missing",
+        "$[2].correct: missing",
+        "$[3]: expected object",
+    ]
+    assert compile_validator({"type": "integer"})(True) == ["$: expected integer"]
+    print("✅ Validator test passed")
+
+
+def test_gemini_schema_keeps_supported_fields():
+    reduced = gemini_schema(app.STUDY_SCHEMAS.object_schema(["quiz"]))
+    item = reduced["properties"]["quiz"]["items"]
+    assert "minItems" not in reduced["properties"]["quiz"]
+    assert item["properties"]["correct"] == {"type": "string", "enum": ["A", "B", "C", "D"]}
+    assert item["required"] == ["question", "options", "correct"]
+    print("✅ Gemini schema test passed")
+
+
+def test_single_call():
+    response, requested = _study("topic=Calculus", [{"summary": SUMMARY, "quiz": QUIZ, "study_tip": " Draw it. "}])
+    data = response.get_json()
+    assert response.status_code == 200
+    assert requested == [["summary", "quiz", "study_tip"]]
+    assert data["quiz"] == QUIZ and data["summary"] == SUMMARY and data["study_tip"] == "Draw it."
+    assert data["generation"]["path"] == "structured" and data["generation"]["llm_calls"] == 1
+    print("✅ Structured single-call test passed")
+
+
+def test_only_failed_sections_retried():
+    first = {"summary": SUMMARY, "quiz": QUIZ[:2], "study_tip": "Draw it.", "math_question": {"question": "1+1?"}}
+    retry = {"quiz": QUIZ, "math_question": {"question": "1+1?", "answer": "2", "explanation": "Add."}}
+    response, requested = _study("topic=Calculus&mode=math", ["```json\n" + json.dumps(first) + "\n```", retry])
+    data = response.get_json()
+    assert requested == [["summary", "quiz", "study_tip", "math_question"], ["quiz", "math_question"]]
+    assert data["quiz"] == QUIZ and data["math_question"]["answer"] == "2"
+    assert data["generation"]["retried_sections"] == ["quiz", "math_question"]
+    assert data["generation"]["failed_sections"] == []
+    print("✅ Per-section retry test passed")
+
+
+def test_invalid_sections_not_invented():
+    """A quiz that never validates is left empty instead of padded with made-up options."""
+    response, requested = _study("topic=Calculus", [
+        {"summary": SUMMARY, "quiz": "Question 1: What?\nA. x", "study_tip": "Draw it."},
+        "Sorry, I can't do that.",
+    ])
+    data = response.get_json()
+    assert response.status_code == 200 and len(requested) == 2
+    assert data["quiz"] == [] and data["summary"] == SUMMARY
+    assert data["generation"]["failed_sections"] == ["quiz"]
+    print("✅ Invalid section test passed")
+
+
+def test_api_key_error_not_retried():
+    response, requested = _study("topic=Calculus", [ValueError("Invalid or missing Gemini API key.")])
+    assert response.status_code == 401 and len(requested) == 1
+    print("✅ API key error test passed")
+
+
+def test_mock_mode_schema():
+    """Without an API key the mock answers structured prompts with valid JSON."""
+    sections = app.STUDY_SCHEMAS.object_schema(["summary", "quiz", "study_tip", "math_question"])
+    original = app.USE_MOCK_MODE
+    app.USE_MOCK_MODE = True
+    try:
+        data = json.loads(app.generate_ai_response("Study pack", "Calculus", schema=sections))
+    finally:
+        app.USE_MOCK_MODE = original
+    assert compile_validator(sections)(data) == []
+    print("✅ Mock mode test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Structured Output Test Suite")
+    print("=" * 50)
+    test_validator()
+    test_gemini_schema_keeps_supported_fields()
+    test_single_call()
+    test_only_failed_sections_retried()
+    test_invalid_sections_not_invented()
+    test_api_key_error_not_retried()
+    test_mock_mode_schema()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
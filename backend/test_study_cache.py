@@ -0,0 +1,82 @@
+"""
+Study pack cache test cases
+Run with: python test_study_cache.py  (no server or API key needed)
+"""
+import os
+import tempfile
+import time
+
+import app
+from study_cache import MemoryCache, SQLiteCache, TieredCache, normalize_topic
+
+
+def test_topic_normalization():
+    print("Testing topic normalization...")
+    assert normalize_topic("  Photosynthesis ") == "photosynthesis"
+    assert normalize_topic("What is   photosynthesis?") == "photosynthesis"
+    assert normalize_topic("Explain the Pythagorean theorem") == "pythagorean theorem"
+    print("✅ Normalization test passed")
+
+
+def test_lru_and_ttl():
+    print("\nTesting LRU eviction and TTL...")
+    cache = MemoryCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")          # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+
+    cache.set("short", 4, ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+    stats = cache.stats.snapshot()
+    assert stats["evictions"] == 2 and stats["expired"] == 1
+    print("✅ LRU/TTL test passed")
+
+
+def test_disk_tier_survives_restart():
+    print("\nTesting SQLite tier persistence...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        TieredCache(MemoryCache(), SQLiteCache(path)).set("k", {"summary": ["x"]})
+
+        restarted = TieredCache(MemoryCache(), SQLiteCache(path))
+        assert restarted.get("k") == {"summary": ["x"]}
+        assert restarted.memory.get("k") == {"summary": ["x"]}  # promoted
+        assert restarted.delete_prefix("k") == 1
+        assert restarted.get("k") is None
+    print("✅ Disk tier test passed")
+
+
+def test_study_endpoint_cache():
+    print("\nTesting /study cache headers and invalidation...")
+    original_fetch = app.fetch_wikipedia_content
+    app.fetch_wikipedia_content = lambda topic: f"Information about {topic}"
+    client = app.app.test_client()
+    try:
+        client.delete("/study/cache")
+        assert client.get("/study?topic=Photosynthesis").headers["X-Cache"] == "MISS"
+        hit = client.get("/study?topic=what is photosynthesis")
+        assert hit.headers["X-Cache"] == "HIT"
+        assert hit.get_json()["topic"] == "what is photosynthesis"
+        assert client.get("/study?topic=Photosynthesis&cache=0").headers["X-Cache"] == "BYPASS"
+
+        assert client.delete("/study/cache?topic=Photosynthesis").get_json()["invalidated"] == 1
+        assert client.get("/study?topic=Photosynthesis").headers["X-Cache"] == "MISS"
+    finally:
+        app.fetch_wikipedia_content = original_fetch
+    print("✅ Endpoint cache test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Study Pack Cache Test Suite")
+    print("=" * 50)
+    test_topic_normalization()
+    test_lru_and_ttl()
+    test_disk_tier_survives_restart()
+    test_study_endpoint_cache()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
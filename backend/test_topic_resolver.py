@@ -0,0 +1,225 @@
+"""
+Topic resolver test cases
+Run with: python test_topic_resolver.py
+"""
+import json
+import os
+import tempfile
+
+from topic_resolver import TopicResolver, create_resolver, edit_distance, index_path
+from wiki_dump import WikiDumpStore, build_dump, main as wiki_dump_main
+
+TITLES = [
+    ("Photosynthesis", None),
+    ("Pythagorean theorem", None),
+    ("Pythagoras' theorem", "Pythagorean theorem"),
+    ("Newton's laws of motion", None),
+    ("Gas", None),
+    ("Gap", None),
+]
+
+
+def make_resolver(authoritative=True):
+    resolver = TopicResolver(authoritative=authoritative)
+    resolver.add_many(TITLES)
+    return resolver
+
+
+def test_edit_distance():
+    assert edit_distance("pythagorus", "pythagorean", 3) == 3
+    assert edit_distance("kitten", "sitting", 10) == 3
+    assert edit_distance("abc", "abcdefgh", 2) == 3  # over the limit
+    print("✅ Edit distance test passed")
+
+
+def test_exact_redirect_and_question_prefixes():
+    resolver = make_resolver()
+    match = resolver.resolve("What is photosynthesis?")
+    assert (match.title, match.method) == ("Photosynthesis", "exact")
+    assert resolver.resolve("  explain  the Pythagorean_theorem ").title == "Pythagorean theorem"
+    match = resolver.resolve("pythagoras' theorem")
+    assert (match.title, match.method) == ("Pythagorean theorem", "redirect")
+    print("✅ Exact/redirect test passed")
+
+
+def test_typos_corrected_within_budget():
+    resolver = make_resolver()
+    match = resolver.resolve("pythagorus theorem")
+    assert (match.title, match.method) == ("Pythagorean theorem", "fuzzy")
+    assert resolver.resolve("photosynthsis").title == "Photosynthesis"
+    assert resolver.resolve("newtons laws of motion").title == "Newton's laws of motion"
+    # Short words must match exactly, and distant topics are left alone
+    assert resolver.resolve("gat").method == "none"
+    match = resolver.resolve("What is quantum gravity?")
+    assert (match.title, match.method) == ("quantum gravity", "none")
+    print("✅ Typo test passed")
+
+
+def test_near_miss_valid_titles_left_alone():
+    # Learned from fetched pages: not every valid title is in the index
+    resolver = TopicResolver()
+    resolver.add_many([("Proton", None), ("Alkane", None), ("Inorganic chemistry", None)])
+    for topic in ("Photon", "Alkene", "Organic chemistry"):
+        match = resolver.resolve(topic)
+        assert (match.title, match.method) == (topic, "none"), topic
+    # Only once the exact title is known to be missing
+    assert resolver.resolve("Organic chemistry", fuzzy=True).title == "Inorganic chemistry"
+    resolver.add("Organic chemistry")
+    assert resolver.resolve("Organic chemistry", fuzzy=True).method == "exact"
+    # Two equally close titles: no correction
+    resolver = TopicResolver(authoritative=True)
+    resolver.add_many([("Alkane", None), ("Alkyne", None)])
+    assert resolver.resolve("Alkene").method == "none"
+    print("✅ Near-miss test passed")
+
+
+def test_fetch_corrects_only_missing_titles():
+    import app
+    from wiki_client import WikiPage
+
+    requested = []
+
+    def get_many(requests):
+        title = requests[0][1]
+        requested.append(title)
+        status = 200 if title in ("Photon", "Proton") else 404
+        data = {"extract": f"{title} text."} if status == 200 else None
+        return [WikiPage(title, status, data), WikiPage(title, 404)]
+
+    original_resolver, original_get_many = app.topic_resolver, app.wikipedia.get_many
+    app.topic_resolver, app.wikipedia.get_many = TopicResolver(), get_many
+    try:
+        app.topic_resolver.add("Proton")
+        assert app.fetch_wikipedia_content("Photon") == "Photon text."
+        assert requested == ["Photon"]
+        assert app.fetch_wikipedia_content("Protn") == "Proton text."
+        assert requested[1:] == ["Protn", "Proton"]
+    finally:
+        app.topic_resolver, app.wikipedia.get_many = original_resolver, original_get_many
+    print("✅ Fetch correction test passed")
+
+
+def test_memoized_until_new_titles_added():
+    resolver = make_resolver()
+    assert resolver.resolve("Photosynthesis").method == "exact"
+    assert resolver.resolve("photosynthesis").method == "exact"
+    assert resolver.snapshot()["memo_hits"] == 1
+    # Misses and corrections are not memoized, so they never go stale
+    assert resolver.resolve("Mitochondrion").method == "none"
+    assert resolver.resolve("photosynthsis").method == "fuzzy"
+    assert resolver.snapshot()["memoized"] == 1
+    resolver.add("Mitochondria", "Mitochondrion")
+    resolver.add("Mitochondrion")
+    assert resolver.resolve("mitochondria").title == "Mitochondrion"
+    assert resolver.resolve("Mitochondrion").method == "exact"
+    # New titles leave existing memo entries in place
+    resolver.add_many([("Chloroplast", None)])
+    assert resolver.resolve("photosynthesis").method == "exact"
+    snapshot = resolver.snapshot()
+    assert snapshot["memo_hits"] == 2 and snapshot["memoized"] == 3
+    print("✅ Memo test passed")
+
+
+def test_create_resolver_from_dump_and_title_file():
+    directory = tempfile.mkdtemp()
+    dump_path = os.path.join(directory, "wiki.dump")
+    build_dump([{"title": "Calculus", "text": "Branch of mathematics."},
+                {"title": "Infinitesimal calculus", "redirect": "Calculus"}], dump_path)
+    title_path = os.path.join(directory, "titles.jsonl")
+    with open(title_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"title": "Photosynthesis"}) + "\n")
+        f.write(json.dumps({"title": "Photosynthetic", "redirect": "Photosynthesis"}) + "\n")
+    store = WikiDumpStore(dump_path)
+    resolver = create_resolver(store, title_path)
+    assert len(resolver) == 4
+    assert resolver.resolve("infinitesimal calculas").title == "Calculus"
+    assert resolver.resolve("photosynthetic").title == "Photosynthesis"
+    store.close()
+    print("✅ Index sources test passed")
+
+
+def test_dump_index_loaded_lazily_and_saved():
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, "extracts.jsonl")
+    with open(source, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"title": "Calculus", "text": "Branch of mathematics."}) + "\n")
+        f.write(json.dumps({"title": "Infinitesimal calculus", "redirect": "Calculus"}) + "\n")
+    dump_path = os.path.join(directory, "wiki.dump")
+    # Building the store also writes the topic index next to it
+    assert wiki_dump_main(["build", source, dump_path]) == 0
+    assert os.path.exists(index_path(dump_path))
+
+    store = WikiDumpStore(dump_path)
+    store.titles = lambda: (_ for _ in ()).throw(AssertionError("dump titles re-indexed"))
+    resolver = create_resolver(store, "")
+    assert not resolver.snapshot()["loaded"]  # nothing indexed at import time
+    assert resolver.resolve("infinitesimal calculas").title == "Calculus"
+    assert resolver.snapshot()["loaded"] and len(resolver) == 2
+
+    # A rebuilt store invalidates the saved index, which is rebuilt on first use
+    build_dump([{"title": "Algebra", "text": "Symbols and rules."}], dump_path)
+    store.close()
+    store = WikiDumpStore(dump_path)
+    indexed = []
+    store.titles = lambda: indexed.append(1) or WikiDumpStore.titles(store)
+    resolver = create_resolver(store, "")
+    assert resolver.resolve("algebra").method == "exact" and resolver.resolve("calculus").method == "none"
+    assert indexed == [1]
+    store.titles = lambda: (_ for _ in ()).throw(AssertionError("dump titles re-indexed"))
+    assert create_resolver(store, "").resolve("algebra").method == "exact"
+    store.close()
+    print("✅ Saved index test passed")
+
+
+def test_learned_titles_capped_lru():
+    resolver = TopicResolver(max_titles=2)
+    resolver.add_many([("Photosynthesis", None)])  # indexed sources are never evicted
+    resolver.add("Proton")
+    resolver.add("Photon")
+    assert resolver.resolve("proton").method == "exact"  # Photon is now least recently used
+    resolver.add("Neutron")
+    assert resolver.resolve("photon").method == "none"
+    assert resolver.resolve("Photn", fuzzy=True).method == "none"  # gone from the trigram index too
+    assert resolver.resolve("proton").method == "exact" and resolver.resolve("neutron").method == "exact"
+    assert "photon" not in resolver._memo
+    assert resolver.resolve("photosynthesis").method == "exact"
+    snapshot = resolver.snapshot()
+    assert (snapshot["titles"], snapshot["learned"], snapshot["evicted"]) == (3, 2, 1)
+    # Evicted slots are reused
+    resolver.add("Electron")
+    assert len(resolver._keys) == 4 and resolver.resolve("electrn", fuzzy=True).title == "Electron"
+    print("✅ Learned title cap test passed")
+
+
+def test_cache_keys_share_canonical_title():
+    import app
+
+    original = app.topic_resolver
+    app.topic_resolver = make_resolver()
+    try:
+        key = app.study_cache_key("Pythagorean theorem", "normal")
+        assert app.study_cache_key("pythagorus theorem", "normal") == key
+        assert app.study_cache_key("What is Pythagoras' theorem?", "normal") == key
+        assert app.study_cache_key("Photosynthesis", "normal") != key
+    finally:
+        app.topic_resolver = original
+    print("✅ Cache key test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Topic Resolver Test Suite")
+    print("=" * 50)
+    test_edit_distance()
+    test_exact_redirect_and_question_prefixes()
+    test_typos_corrected_within_budget()
+    test_near_miss_valid_titles_left_alone()
+    test_fetch_corrects_only_missing_titles()
+    test_memoized_until_new_titles_added()
+    test_create_resolver_from_dump_and_title_file()
+    test_dump_index_loaded_lazily_and_saved()
+    test_learned_titles_capped_lru()
+    test_cache_keys_share_canonical_title()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
@@ -0,0 +1,166 @@
+"""
+Wikipedia content cache test cases
+Run with: python test_wiki_client.py  (uses a local stub server, no network)
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from wiki_client import WikiContentStore, WikipediaClient
+
+PAGES = {
+    "Photosynthesis": {
+        "summary": {"title": "Photosynthesis", "titles": {"canonical": "Photosynthesis"},
+                    "extract": "Photosynthesis converts light into chemical energy."},
+        "mobile-sections": {"lead": {"text": "<p>Plants use <b>chlorophyll</b>.</p>"},
+                            "remaining": [{"text": "<p>Light reactions.</p>"}]},
+    },
+}
+REDIRECTS = {"photosynthesis": "Photosynthesis"}
+
+
+class StubWikipedia(BaseHTTPRequestHandler):
+    """Serves PAGES with ETags, answers If-None-Match with 304 and unknown titles with 404."""
+
+    requests_seen = []
+
+    def do_GET(self):
+        if self.path.startswith("/w/api.php"):
+            return self.action_query()
+        endpoint, title = self.path.split("/")[-2:]
+        self.requests_seen.append((endpoint, title, self.headers.get("If-None-Match")))
+        title = REDIRECTS.get(title, title)
+        if title not in PAGES:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = f'"{title}-v1"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps(PAGES[title][endpoint]).encode()
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def action_query(self):
+        """Minimal action API: prop=extracts for several titles, with redirects."""
+        titles = parse_qs(urlparse(self.path).query)["titles"][0].split("|")
+        self.requests_seen.append(("extracts", titles, None))
+        redirects = [{"from": t, "to": REDIRECTS[t]} for t in titles if t in REDIRECTS]
+        pages = []
+        for title in dict.fromkeys(REDIRECTS.get(t, t) for t in titles):
+            if title in PAGES:
+                pages.append({"title": title, "extract": PAGES[title]["summary"]["extract"]})
+            else:
+                pages.append({"title": title, "missing": True})
+        body = json.dumps({"query": {"redirects": redirects, "pages": pages}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubWikipedia)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StubWikipedia.requests_seen.clear()
+    return server, f"http://127.0.0.1:{server.server_port}/api/rest_v1"
+
+
+def make_client(base_url, **kwargs):
+    action_api = base_url.replace("/api/rest_v1", "/w/api.php")
+    return WikipediaClient(base_url, WikiContentStore(":memory:"), action_api=action_api, **kwargs)
+
+
+def test_fresh_pages_served_from_store():
+    print("Testing fresh cache hits...")
+    server, base_url = start_stub()
+    try:
+        client = make_client(base_url)
+        first = client.get("summary", "photosynthesis")
+        second = client.get("summary", "photosynthesis")
+        assert first.title == second.title == "Photosynthesis"
+        assert len(StubWikipedia.requests_seen) == 1
+        assert client.stats["fresh_hits"] == 1
+    finally:
+        server.shutdown()
+    print("✅ Fresh hit test passed")
+
+
+def test_stale_pages_revalidated_with_etag():
+    print("\nTesting ETag revalidation...")
+    server, base_url = start_stub()
+    try:
+        client = make_client(base_url, freshness=0)
+        client.get("summary", "Photosynthesis")
+        page = client.get("summary", "Photosynthesis")
+        assert page.data["extract"].startswith("Photosynthesis")
+        assert StubWikipedia.requests_seen[-1][2] == '"Photosynthesis-v1"'
+        assert client.stats["revalidated"] == 1
+    finally:
+        server.shutdown()
+    print("✅ Revalidation test passed")
+
+
+def test_missing_pages_negatively_cached():
+    print("\nTesting negative caching...")
+    server, base_url = start_stub()
+    try:
+        client = make_client(base_url)
+        assert not client.get("summary", "Photosynthsis").found
+        assert not client.get("summary", "Photosynthsis").found
+        assert len(StubWikipedia.requests_seen) == 1
+        assert client.stats["negative_hits"] == 1
+    finally:
+        server.shutdown()
+    print("✅ Negative cache test passed")
+
+
+def test_stale_copy_served_when_offline():
+    print("\nTesting stale fallback...")
+    server, base_url = start_stub()
+    client = make_client(base_url, freshness=0, timeout=1)
+    client.get("summary", "Photosynthesis")
+    server.shutdown()
+    server.server_close()
+    assert client.get("summary", "Photosynthesis").found
+    assert client.stats["stale_served"] == 1
+    print("✅ Stale fallback test passed")
+
+
+def test_bulk_extracts():
+    print("\nTesting bulk extracts...")
+    server, base_url = start_stub()
+    try:
+        client = make_client(base_url)
+        extracts = client.get_extracts(["photosynthesis", "Photosynthsis"])
+        assert extracts["photosynthesis"].startswith("Photosynthesis converts")
+        assert extracts["Photosynthsis"] is None
+        assert client.get_extracts(["Photosynthesis", "Photosynthsis"]) == {
+            "Photosynthesis": extracts["photosynthesis"], "Photosynthsis": None}
+        assert [seen[0] for seen in StubWikipedia.requests_seen] == ["extracts"]
+    finally:
+        server.shutdown()
+    print("✅ Bulk extracts test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Wikipedia Client Test Suite")
+    print("=" * 50)
+    test_fresh_pages_served_from_store()
+    test_stale_pages_revalidated_with_etag()
+    test_missing_pages_negatively_cached()
+    test_stale_copy_served_when_offline()
+    test_bulk_extracts()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
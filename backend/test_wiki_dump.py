@@ -0,0 +1,109 @@
+"""
+Offline Wikipedia store test cases
+Run with: python test_wiki_dump.py  (builds small stores in a temp directory)
+"""
+import gzip
+import json
+import os
+import tempfile
+
+import wiki_dump
+from wiki_dump import WikiDumpStore, build_dump, read_entries
+
+ENTRIES = [
+    {"title": "Photosynthesis", "text": "Photosynthesis converts  light\ninto chemical energy."},
+    {"title": "Pythagorean theorem", "extract": "a² + b² = c² for right triangles."},
+    {"title": "Photosynthetic", "redirect": "Photosynthesis"},
+    {"title": "Pythagoras theorem", "redirect": "Pythagoras' theorem"},
+    {"title": "Pythagoras' theorem", "redirect": "Pythagorean_theorem"},
+    {"title": "Broken redirect", "redirect": "No such page"},
+    {"title": "Empty page", "text": "   "},
+]
+
+
+def make_store(entries=ENTRIES, **kwargs):
+    path = os.path.join(tempfile.mkdtemp(), "wiki.dump")
+    counts = build_dump(entries, path, **kwargs)
+    return WikiDumpStore(path), counts
+
+
+def test_lookup_and_normalisation():
+    store, counts = make_store()
+    assert counts == {"articles": 2, "redirects": 3}
+    assert len(store) == 2
+    assert store.get("Photosynthesis") == "Photosynthesis converts light into chemical energy."
+    assert store.get("  photosynthesis ") == store.get("PHOTOSYNTHESIS") == store.get("Photosynthesis")
+    assert store.get("pythagorean_theorem") == "a² + b² = c² for right triangles."
+    assert store.get("Empty page") is None
+    assert store.get("Quantum gravity") is None
+    store.close()
+    print("✅ Lookup test passed")
+
+
+def test_redirects_resolved_to_canonical_title():
+    store, _ = make_store()
+    assert store.lookup("photosynthetic") == ("Photosynthesis", store.get("Photosynthesis"))
+    # Chains are flattened when the store is built
+    assert store.lookup("Pythagoras theorem")[0] == "Pythagorean theorem"
+    assert store.get("Broken redirect") is None
+    assert store.stats["redirects"] == 2
+    store.close()
+    print("✅ Redirect test passed")
+
+
+def test_hash_collisions_resolved_by_title():
+    original = wiki_dump._hash
+    wiki_dump._hash = lambda key: 42  # every title in the same bucket
+    try:
+        store, _ = make_store()
+        assert store.get("Photosynthesis").startswith("Photosynthesis")
+        assert store.get("Pythagorean theorem").startswith("a²")
+        assert store.lookup("Photosynthetic")[0] == "Photosynthesis"
+        assert store.get("Mitochondria") is None
+        store.close()
+    finally:
+        wiki_dump._hash = original
+    print("✅ Collision test passed")
+
+
+def test_text_clipped_at_build_and_compressed_input():
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, "extracts.jsonl.gz")
+    with gzip.open(source, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({"title": "Long", "text": "x" * 5000}) + "\n\n")
+    store, _ = make_store(list(read_entries(source)))
+    assert len(store.get("Long")) == wiki_dump.DUMP_MAX_CHARS
+    store.close()
+    print("✅ Build options test passed")
+
+
+def test_fetch_wikipedia_content_uses_dump():
+    import app
+
+    store, _ = make_store(ENTRIES + [{"title": "Long", "text": "y" * 5000}])
+    original = app.wiki_dump
+    app.wiki_dump = store
+    try:
+        assert app.fetch_wikipedia_content("photosynthetic") == store.get("Photosynthesis")
+        assert app.fetch_wikipedia_content("Long") == "y" * 2000 + "..."
+        assert app.fetch_wikipedia_content("Unknown topic") == "Information about Unknown topic"
+        assert app.fetch_wikipedia_contents(["Photosynthesis", "Unknown"]) == {
+            "Photosynthesis": store.get("Photosynthesis"), "Unknown": "Information about Unknown"}
+    finally:
+        app.wiki_dump = original
+        store.close()
+    print("✅ App integration test passed")
+
+
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Offline Wikipedia Store Test Suite")
+    print("=" * 50)
+    test_lookup_and_normalisation()
+    test_redirects_resolved_to_canonical_title()
+    test_hash_collisions_resolved_by_title()
+    test_text_clipped_at_build_and_compressed_input()
+    test_fetch_wikipedia_content_uses_dump()
+    print("\n" + "=" * 50)
+    print("✅ All tests passed!")
+    print("=" * 50)
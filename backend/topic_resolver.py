@@ -0,0 +1,329 @@
+"""
+Smart Study Assistant - Topic resolver
+Maps what the user typed ("what is photosynthesis?", "pythagorus theorem")
+to a canonical Wikipedia title before content is fetched or cache keys are
+built. Titles and redirects are indexed locally by character trigrams;
+candidates are confirmed by edit distance, and exact resolutions are
+memoized. The index of an offline dump is saved next to it (wiki.dump.topics)
+and loaded on first use. Typos are only corrected against an authoritative index (the
+offline dump); an index learned from fetched pages is only consulted for
+fuzzy matches once the exact title is known to be missing, since "Photon"
+is a valid title even when only "Proton" has been seen.
+"""
+import argparse
+import os
+import pickle
+import sys
+import threading
+from collections import Counter, OrderedDict
+
+from dotenv import load_dotenv
+
+from study_cache import strip_question
+from wiki_dump import WikiDumpStore, read_entries, title_key
+
+load_dotenv()
+
+# Optional JSON-lines file of {"title"} / {"title", "redirect"} entries to index
+TOPIC_INDEX_PATH = os.getenv("TOPIC_INDEX_PATH", "")
+TOPIC_MEMO_SIZE = int(os.getenv("TOPIC_MEMO_SIZE", 4096))
+# Titles learned from fetched pages (API mode) kept in the index, least recently used dropped first
+TOPIC_INDEX_MAX_TITLES = int(os.getenv("TOPIC_INDEX_MAX_TITLES", 100000))
+
+# Saved index of a dump store: <dump path> + INDEX_SUFFIX
+INDEX_SUFFIX = ".topics"
+INDEX_VERSION = 1
+
+# Candidates checked with edit distance, and the trigram overlap they need
+MAX_CANDIDATES = 10
+MIN_SIMILARITY = 0.3
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 once it is known to exceed `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def max_typos(key: str) -> int:
+    # About one typo per five characters; words under five are matched exactly
+    return len(key) // 5
+
+
+class TopicMatch:
+    """A resolution: `method` is "exact", "redirect", "fuzzy" or "none"."""
+
+    __slots__ = ("query", "title", "method", "distance")
+
+    def __init__(self, query, title, method, distance=0):
+        self.query = query
+        self.title = title
+        self.method = method
+        self.distance = distance
+
+    @property
+    def found(self) -> bool:
+        return self.method != "none"
+
+
+class TopicResolver:
+    """
+    resolve(topic) returns a TopicMatch whose `title` is the canonical title
+    (or the cleaned topic when nothing in the index is close enough).
+    Typos are corrected when `fuzzy` is set, which defaults to whether the
+    index is `authoritative` (holds every valid title); a correction needs
+    one closest title, ties are left alone. Titles can be added at any
+    time; the memo holds exact and redirect matches only, which an added
+    title never changes (existing keys keep their target), so adding leaves
+    it intact and evicting a title drops just its own entry.
+
+    Titles from add_many() (dump, title file) stay indexed; titles learned
+    with add() are capped at `max_titles`, least recently used dropped
+    first. `loader(resolver)`, if given, fills the index on first use.
+    """
+
+    def __init__(self, memo_size: int = TOPIC_MEMO_SIZE, authoritative: bool = False,
+                 max_titles: int = TOPIC_INDEX_MAX_TITLES, loader=None):
+        self.memo_size = memo_size
+        self.authoritative = authoritative
+        self.max_titles = max_titles
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loader = loader
+        self._keys = []          # key id -> title key (None once evicted)
+        self._targets = []       # key id -> canonical title
+        self._ids = {}           # title key -> key id
+        self._postings = {}      # trigram -> [key id, ...]
+        self._free = []          # ids of evicted keys, reused first
+        self._learned = OrderedDict()  # keys added with add(), in LRU order
+        self._memo = OrderedDict()
+        self.stats = {"memo_hits": 0, "exact": 0, "redirect": 0, "fuzzy": 0, "none": 0, "evicted": 0}
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._ids)
+
+    def _ensure_loaded(self):
+        if self._loader is None:
+            return
+        with self._load_lock:
+            if self._loader is not None:
+                self._loader(self)
+                self._loader = None
+
+    def _add(self, title: str, canonical: str) -> bool:
+        key = title_key(title)
+        if not key or key in self._ids:
+            return False
+        canonical = " ".join(canonical.replace("_", " ").split())
+        if self._free:
+            key_id = self._free.pop()
+            self._keys[key_id], self._targets[key_id] = key, canonical
+        else:
+            key_id = len(self._keys)
+            self._keys.append(key)
+            self._targets.append(canonical)
+        self._ids[key] = key_id
+        for gram in trigrams(key):
+            self._postings.setdefault(gram, []).append(key_id)
+        return True
+
+    def _remove(self, key: str):
+        key_id = self._ids.pop(key)
+        for gram in trigrams(key):
+            ids = self._postings[gram]
+            ids.remove(key_id)
+            if not ids:
+                del self._postings[gram]
+        self._keys[key_id] = self._targets[key_id] = None
+        self._free.append(key_id)
+        self._memo.pop(key, None)
+        self.stats["evicted"] += 1
+
+    def _index(self, pairs) -> int:
+        with self._lock:
+            return sum(self._add(title, canonical or title) for title, canonical in pairs)
+
+    def add(self, title: str, canonical: str = None):
+        """Index `title` as a name for `canonical` (itself by default), as a learned title."""
+        self._ensure_loaded()
+        key = title_key(title)
+        with self._lock:
+            if self._add(title, canonical or title):
+                self._learned[key] = None
+                while len(self._learned) > self.max_titles:
+                    self._remove(self._learned.popitem(last=False)[0])
+            elif key in self._learned:
+                self._learned.move_to_end(key)
+
+    def add_many(self, pairs):
+        """Index (title, canonical) pairs, e.g. from WikiDumpStore.titles()."""
+        self._ensure_loaded()
+        self._index(pairs)
+
+    def save(self, path: str, stamp=None):
+        """Write the index to `path` (replaced atomically); `stamp` identifies its source."""
+        with self._lock:
+            state = {"version": INDEX_VERSION, "stamp": stamp, "keys": self._keys, "targets": self._targets,
+                     "ids": self._ids, "postings": self._postings}
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def _restore(self, path: str, stamp=None) -> bool:
+        """Load an index written by save(); False if missing, unreadable or not from `stamp`."""
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False
+        if not isinstance(state, dict) or state.get("version") != INDEX_VERSION or state.get("stamp") != stamp:
+            return False
+        with self._lock:
+            self._keys, self._targets, self._postings = state["keys"], state["targets"], state["postings"]
+            self._ids = state["ids"]
+            self._free = [key_id for key_id, key in enumerate(self._keys) if key is None]
+            self._learned.clear()
+            self._memo.clear()
+        return True
+
+    def _search(self, key: str):
+        """
+        (key id, distance) of the closest indexed title within max_typos, or
+        None when there is none or several titles (not redirects to one
+        title) are equally close.
+        """
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        limit = max_typos(key)
+        best, targets = None, set()
+        for key_id, count in shared.most_common(MAX_CANDIDATES * 4):
+            candidate = self._keys[key_id]
+            similarity = 2 * count / (len(grams) + len(trigrams(candidate)))
+            if similarity < MIN_SIMILARITY:
+                continue
+            distance = edit_distance(key, candidate, limit)
+            if distance > limit or (best is not None and distance > best[1]):
+                continue
+            if best is None or distance < best[1]:
+                best, targets = (key_id, distance), set()
+            targets.add(self._targets[key_id])
+        return best if len(targets) == 1 else None
+
+    def resolve(self, topic: str, fuzzy: bool = None) -> TopicMatch:
+        fuzzy = self.authoritative if fuzzy is None else fuzzy
+        query = strip_question(topic)
+        key = title_key(query)
+        self._ensure_loaded()
+        with self._lock:
+            if key in self._learned:
+                self._learned.move_to_end(key)
+            match = self._memo.get(key)
+            if match is not None:
+                self._memo.move_to_end(key)
+                self.stats["memo_hits"] += 1
+                return match
+            key_id = self._ids.get(key)
+            if key_id is not None:
+                title = self._targets[key_id]
+                match = TopicMatch(query, title, "exact" if title_key(title) == key else "redirect")
+                self._memo[key] = match
+                while len(self._memo) > self.memo_size:
+                    self._memo.popitem(last=False)
+            else:
+                # Not memoized: a miss or a correction goes stale once the real title is learned
+                found = self._search(key) if fuzzy and max_typos(key) else None
+                if found is None:
+                    match = TopicMatch(query, query, "none")
+                else:
+                    match = TopicMatch(query, self._targets[found[0]], "fuzzy", found[1])
+            self.stats[match.method] += 1
+        return match
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"titles": len(self._ids), "learned": len(self._learned), "loaded": self._loader is None,
+                    "memoized": len(self._memo), **self.stats}
+
+
+def index_path(dump_path: str) -> str:
+    return dump_path + INDEX_SUFFIX
+
+
+def dump_stamp(dump_path: str) -> list:
+    """Identifies one build of a dump store, so a stale saved index is rebuilt."""
+    stat = os.stat(dump_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def load_dump_index(resolver: TopicResolver, dump) -> bool:
+    """
+    Fill `resolver` from the index saved next to `dump`, or index the dump's
+    titles and save them there. Returns True if the saved index was used.
+    """
+    path, stamp = index_path(dump.path), dump_stamp(dump.path)
+    if resolver._restore(path, stamp):
+        return True
+    resolver._index(dump.titles())
+    try:
+        resolver.save(path, stamp)
+    except OSError:
+        pass  # read-only dump directory: rebuilt on the next start
+    return False
+
+
+def create_resolver(dump=None, path: str = TOPIC_INDEX_PATH) -> TopicResolver:
+    """
+    Resolver indexed from an offline dump store and/or a JSON-lines title
+    file; authoritative (typos corrected up front) when built from a dump.
+    Both are indexed on first use, so creating the resolver is cheap.
+    """
+    def load(resolver):
+        if dump is not None:
+            load_dump_index(resolver, dump)
+        if path:
+            resolver._index((entry["title"], entry.get("redirect")) for entry in read_entries(path)
+                            if entry.get("title"))
+
+    return TopicResolver(authoritative=dump is not None, loader=load if dump is not None or path else None)
+
+
+def build_topic_index(store_path: str) -> int:
+    """Save the index of a dump store next to it (unless already current); returns its title count."""
+    store = WikiDumpStore(store_path)
+    try:
+        resolver = TopicResolver(authoritative=True)
+        load_dump_index(resolver, store)
+        return len(resolver)
+    finally:
+        store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the topic index saved next to a dump store")
+    parser.add_argument("store", help="store written by: python wiki_dump.py build")
+    args = parser.parse_args(argv)
+    count = build_topic_index(args.store)
+    print(f"Indexed {count} titles in {index_path(args.store)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
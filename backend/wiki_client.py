@@ -0,0 +1,282 @@
+"""
+Smart Study Assistant - Wikipedia client
+Fetches Wikipedia REST API pages through a persistent content store keyed by
+canonical page title. Stored pages are served while fresh, revalidated with
+ETag / Last-Modified once stale, and 404s are negatively cached so misspelled
+topics do not hit the API on every request.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+load_dotenv()
+
+WIKIPEDIA_API_BASE = os.getenv("WIKIPEDIA_API_BASE", "https://en.wikipedia.org/api/rest_v1")
+WIKIPEDIA_ACTION_API = os.getenv("WIKIPEDIA_ACTION_API", "https://en.wikipedia.org/w/api.php")
+WIKI_CACHE_DB = os.getenv("WIKI_CACHE_DB", ":memory:")
+WIKI_FRESHNESS = float(os.getenv("WIKI_FRESHNESS", 24 * 3600))
+WIKI_NEGATIVE_TTL = float(os.getenv("WIKI_NEGATIVE_TTL", 15 * 60))
+WIKI_TIMEOUT = float(os.getenv("WIKI_TIMEOUT", 10))
+WIKI_POOL_SIZE = int(os.getenv("WIKI_POOL_SIZE", 16))
+WIKI_RETRIES = int(os.getenv("WIKI_RETRIES", 2))
+WIKI_BACKOFF = float(os.getenv("WIKI_BACKOFF", 0.3))
+
+USER_AGENT = 'SmartStudyAssistant/1.0'
+
+# The action API returns intro extracts for at most 20 titles per request
+EXTRACTS_PER_REQUEST = 20
+
+
+def create_session(pool_size: int = WIKI_POOL_SIZE, retries: int = WIKI_RETRIES,
+                   backoff: float = WIKI_BACKOFF) -> requests.Session:
+    """
+    Keep-alive session with a bounded connection pool. GETs are retried with
+    exponential backoff on 429/5xx, honouring Retry-After.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+class WikiPage:
+    """A stored REST response: `data` is None for a cached 404."""
+
+    __slots__ = ("title", "status", "data", "etag", "last_modified", "fetched_at")
+
+    def __init__(self, title, status, data=None, etag=None, last_modified=None, fetched_at=None):
+        self.title = title
+        self.status = status
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.time() if fetched_at is None else fetched_at
+
+    @property
+    def found(self) -> bool:
+        return self.status == 200
+
+
+class WikiContentStore:
+    """
+    SQLite store of REST responses per (endpoint, canonical title), plus an
+    alias table mapping requested titles to their canonical title.
+    """
+
+    def __init__(self, path: str = WIKI_CACHE_DB):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " endpoint TEXT NOT NULL, title TEXT NOT NULL, status INTEGER NOT NULL, data TEXT,"
+            " etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL,"
+            " PRIMARY KEY (endpoint, title));"
+            "CREATE TABLE IF NOT EXISTS aliases (alias TEXT PRIMARY KEY, title TEXT NOT NULL);"
+        )
+        self._conn.commit()
+
+    def canonical(self, alias: str) -> str:
+        with self._lock:
+            row = self._conn.execute("SELECT title FROM aliases WHERE alias = ?", (alias,)).fetchone()
+        return row[0] if row else None
+
+    def add_alias(self, alias: str, title: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO aliases (alias, title) VALUES (?, ?)", (alias, title))
+            self._conn.commit()
+
+    def get(self, endpoint: str, title: str) -> WikiPage:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, data, etag, last_modified, fetched_at FROM pages WHERE endpoint = ? AND title = ?",
+                (endpoint, title),
+            ).fetchone()
+        if row is None:
+            return None
+        status, data, etag, last_modified, fetched_at = row
+        return WikiPage(title, status, json.loads(data) if data else None, etag, last_modified, fetched_at)
+
+    def put(self, endpoint: str, page: WikiPage):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (endpoint, title, status, data, etag, last_modified, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (endpoint, page.title, page.status, json.dumps(page.data) if page.data is not None else None,
+                 page.etag, page.last_modified, page.fetched_at),
+            )
+            self._conn.commit()
+
+    def touch(self, endpoint: str, title: str, fetched_at: float):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET fetched_at = ? WHERE endpoint = ? AND title = ?", (fetched_at, endpoint, title)
+            )
+            self._conn.commit()
+
+
+class WikipediaClient:
+    """
+    REST client backed by a WikiContentStore.
+
+    get(endpoint, title) returns a WikiPage (found or cached 404), serving
+    fresh pages from the store, revalidating stale ones with conditional
+    requests, and falling back to a stale copy if the network fails.
+    Raises requests.RequestException only when nothing usable is stored.
+    """
+
+    def __init__(self, base_url: str = WIKIPEDIA_API_BASE, store: WikiContentStore = None,
+                 freshness: float = WIKI_FRESHNESS, negative_ttl: float = WIKI_NEGATIVE_TTL,
+                 timeout: float = WIKI_TIMEOUT, session: requests.Session = None,
+                 action_api: str = WIKIPEDIA_ACTION_API):
+        self.base_url = base_url.rstrip('/')
+        self.action_api = action_api
+        self.store = store or WikiContentStore()
+        self.freshness = freshness
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self.session = session or create_session()
+        self._executor = ThreadPoolExecutor(max_workers=WIKI_POOL_SIZE, thread_name_prefix="wiki-fetch")
+        self._stats_lock = threading.Lock()
+        self.stats = {"fresh_hits": 0, "negative_hits": 0, "revalidated": 0, "fetched": 0, "stale_served": 0}
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _is_fresh(self, page: WikiPage, now: float) -> bool:
+        ttl = self.freshness if page.found else self.negative_ttl
+        return now - page.fetched_at < ttl
+
+    def get_many(self, fetches: list) -> list:
+        """
+        Fetch [(endpoint, title), ...] concurrently over the shared pool.
+        Returns one WikiPage or exception per fetch, in order.
+        """
+        futures = [self._executor.submit(self.get, endpoint, title) for endpoint, title in fetches]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def get(self, endpoint: str, title: str) -> WikiPage:
+        alias = title.lower()
+        key = self.store.canonical(alias) or title
+        page = self.store.get(endpoint, key)
+        now = time.time()
+
+        if page is not None and self._is_fresh(page, now):
+            self._count("fresh_hits" if page.found else "negative_hits")
+            return page
+
+        headers = {}
+        if page is not None and page.found:
+            if page.etag:
+                headers['If-None-Match'] = page.etag
+            if page.last_modified:
+                headers['If-Modified-Since'] = page.last_modified
+
+        try:
+            response = self.session.get(f"{self.base_url}/page/{endpoint}/{key}",
+                                        headers=headers, timeout=self.timeout)
+            if response.status_code >= 500 or response.status_code == 429:
+                response.raise_for_status()
+        except requests.RequestException:
+            if page is not None and page.found:
+                self._count("stale_served")
+                return page
+            raise
+
+        if response.status_code == 304 and page is not None:
+            self.store.touch(endpoint, key, now)
+            page.fetched_at = now
+            self._count("revalidated")
+            return page
+
+        self._count("fetched")
+        if response.status_code != 200:
+            page = WikiPage(key, response.status_code, fetched_at=now)
+            self.store.put(endpoint, page)
+            return page
+
+        data = response.json()
+        canonical = (data.get("titles") or {}).get("canonical") or key
+        page = WikiPage(canonical, 200, data, response.headers.get('ETag'),
+                        response.headers.get('Last-Modified'), now)
+        self.store.put(endpoint, page)
+        if canonical != key:
+            self.store.add_alias(alias, canonical)
+            self.store.add_alias(key.lower(), canonical)
+        return page
+
+    def get_extracts(self, titles: list) -> dict:
+        """
+        Plain-text intro extracts for many titles: {title: text or None}.
+
+        Fresh extracts come from the store; the rest are fetched through the
+        action API, EXTRACTS_PER_REQUEST titles per request, following
+        redirects. Missing pages are negatively cached. A failed request
+        leaves its titles as None without caching them.
+        """
+        results, missing = {}, []
+        now = time.time()
+        for title in dict.fromkeys(titles):
+            page = self.store.get("extract", self.store.canonical(title.lower()) or title)
+            if page is not None and self._is_fresh(page, now):
+                self._count("fresh_hits" if page.found else "negative_hits")
+                results[title] = page.data if page.found else None
+            else:
+                missing.append(title)
+
+        for i in range(0, len(missing), EXTRACTS_PER_REQUEST):
+            chunk = missing[i:i + EXTRACTS_PER_REQUEST]
+            try:
+                response = self.session.get(self.action_api, timeout=self.timeout, params={
+                    "action": "query", "prop": "extracts", "exintro": 1, "explaintext": 1,
+                    "exlimit": "max", "redirects": 1, "format": "json", "formatversion": 2,
+                    "titles": "|".join(chunk),
+                })
+                response.raise_for_status()
+                query = response.json().get("query", {})
+            except (requests.RequestException, ValueError) as e:
+                print(f"Error fetching Wikipedia extracts: {e}")
+                results.update(dict.fromkeys(chunk))
+                continue
+
+            self._count("fetched")
+            normalized = {item["from"]: item["to"] for item in query.get("normalized", [])}
+            redirects = {item["from"]: item["to"] for item in query.get("redirects", [])}
+            pages = {page["title"]: page for page in query.get("pages", [])}
+            for title in chunk:
+                canonical = normalized.get(title, title)
+                canonical = redirects.get(canonical, canonical)
+                page = pages.get(canonical)
+                if page is None or page.get("missing") or not page.get("extract"):
+                    self.store.put("extract", WikiPage(title, 404, fetched_at=now))
+                    results[title] = None
+                    continue
+                self.store.put("extract", WikiPage(canonical, 200, page["extract"], fetched_at=now))
+                if canonical != title:
+                    self.store.add_alias(title.lower(), canonical)
+                results[title] = page["extract"]
+        return results
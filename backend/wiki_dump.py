@@ -0,0 +1,229 @@
+"""
+Smart Study Assistant - Offline Wikipedia store
+Compact, read-only article store built from a Wikipedia extract dump and
+read through mmap, so topic lookups need no network and take microseconds.
+
+File layout (little-endian):
+    header   magic, article count, redirect count, index offset, index entries
+    records  article: kind=0, title, text      redirect: kind=1, title, target record offset
+    index    (64-bit title hash, record offset) pairs sorted by hash
+
+Build a store from JSON lines ({"title", "text"} or {"title", "redirect"};
+.gz/.bz2 accepted), along with the topic index saved next to it:
+    python wiki_dump.py build extracts.jsonl.gz wiki.dump
+"""
+import argparse
+import bz2
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+
+MAGIC = b"SSWDUMP1"
+HEADER = struct.Struct("<8sIIQQ")
+INDEX_ENTRY = struct.Struct("<QQ")
+KIND_ARTICLE = 0
+KIND_REDIRECT = 1
+
+# Text kept per article: one character past the 2000-character clip applied
+# by fetch_wikipedia_content, so callers can still tell the text was cut
+DUMP_MAX_CHARS = 2001
+MAX_REDIRECT_HOPS = 5
+
+
+def title_key(title: str) -> str:
+    """Lookup key: underscores as spaces, collapsed whitespace, case-folded."""
+    return " ".join(title.replace("_", " ").split()).casefold()
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def read_entries(path: str):
+    """Yield dicts from a JSON-lines dump, optionally gzip/bz2 compressed."""
+    opener = gzip.open if path.endswith(".gz") else bz2.open if path.endswith(".bz2") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def build_dump(entries, path: str, max_chars: int = DUMP_MAX_CHARS) -> dict:
+    """
+    Write a store from entries with "title" and either "text" (or "extract")
+    or "redirect". Redirect chains are resolved at build time; redirects to
+    missing pages are dropped. Returns counts of what was written.
+    """
+    articles, redirects = {}, {}
+    for entry in entries:
+        title = (entry.get("title") or "").strip()
+        if not title:
+            continue
+        key = title_key(title)
+        if entry.get("redirect"):
+            redirects[key] = (title, title_key(entry["redirect"]))
+            continue
+        text = " ".join((entry.get("text") or entry.get("extract") or "").split())
+        if text:
+            articles[key] = (title, text[:max_chars])
+
+    index = []
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"\0" * HEADER.size)
+        offsets = {}
+        for key, (title, text) in articles.items():
+            offsets[key] = f.tell()
+            index.append((_hash(key), f.tell()))
+            title_bytes, text_bytes = title.encode("utf-8"), text.encode("utf-8")
+            f.write(struct.pack("<BH", KIND_ARTICLE, len(title_bytes)) + title_bytes)
+            f.write(struct.pack("<I", len(text_bytes)) + text_bytes)
+
+        redirect_count = 0
+        for key, (title, target) in redirects.items():
+            if key in articles:
+                continue
+            for _ in range(MAX_REDIRECT_HOPS):
+                if target in articles or target not in redirects:
+                    break
+                target = redirects[target][1]
+            if target not in offsets:
+                continue
+            index.append((_hash(key), f.tell()))
+            title_bytes = title.encode("utf-8")
+            f.write(struct.pack("<BH", KIND_REDIRECT, len(title_bytes)) + title_bytes)
+            f.write(struct.pack("<Q", offsets[target]))
+            redirect_count += 1
+
+        index.sort()
+        index_offset = f.tell()
+        for entry in index:
+            f.write(INDEX_ENTRY.pack(*entry))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, len(articles), redirect_count, index_offset, len(index)))
+    os.replace(tmp, path)
+    return {"articles": len(articles), "redirects": redirect_count}
+
+
+class WikiDumpStore:
+    """
+    Read-only view of a store written by build_dump.
+
+    get(title) returns the article text (following redirects) or None.
+    The file is memory-mapped; a lookup is a binary search over the index.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.article_count, self.redirect_count, self._index_offset, self._index_size = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a Wikipedia dump store")
+        self._stats_lock = threading.Lock()
+        self.stats = {"hits": 0, "redirects": 0, "misses": 0}
+
+    def __len__(self) -> int:
+        return self.article_count
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _record(self, offset: int):
+        """(kind, title, payload) where payload is text or a target record offset."""
+        kind, title_len = struct.unpack_from("<BH", self._map, offset)
+        offset += 3
+        title = self._map[offset:offset + title_len].decode("utf-8")
+        offset += title_len
+        if kind == KIND_REDIRECT:
+            return kind, title, struct.unpack_from("<Q", self._map, offset)[0]
+        (text_len,) = struct.unpack_from("<I", self._map, offset)
+        offset += 4
+        return kind, title, self._map[offset:offset + text_len].decode("utf-8")
+
+    def _find(self, key: str):
+        target = _hash(key)
+        lo, hi = 0, self._index_size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if INDEX_ENTRY.unpack_from(self._map, self._index_offset + mid * INDEX_ENTRY.size)[0] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        # Equal hashes are adjacent; the stored title settles collisions
+        while lo < self._index_size:
+            entry_hash, offset = INDEX_ENTRY.unpack_from(self._map, self._index_offset + lo * INDEX_ENTRY.size)
+            if entry_hash != target:
+                break
+            record = self._record(offset)
+            if title_key(record[1]) == key:
+                return record
+            lo += 1
+        return None
+
+    def lookup(self, title: str):
+        """(canonical title, text) for `title`, or None if it is not in the store."""
+        record = self._find(title_key(title))
+        if record is None:
+            self._count("misses")
+            return None
+        if record[0] == KIND_REDIRECT:
+            self._count("redirects")
+            record = self._record(record[2])
+        self._count("hits")
+        return record[1], record[2]
+
+    def get(self, title: str) -> str:
+        found = self.lookup(title)
+        return found[1] if found else None
+
+    def titles(self):
+        """Yield (title, canonical title) for every article and redirect in the store."""
+        for i in range(self._index_size):
+            _, offset = INDEX_ENTRY.unpack_from(self._map, self._index_offset + i * INDEX_ENTRY.size)
+            kind, title, payload = self._record(offset)
+            yield title, self._record(payload)[1] if kind == KIND_REDIRECT else title
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query an offline Wikipedia store")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="ingest a JSON-lines extract dump")
+    build.add_argument("source")
+    build.add_argument("output")
+    build.add_argument("--max-chars", type=int, default=DUMP_MAX_CHARS)
+    query = commands.add_parser("get", help="look up titles in a store")
+    query.add_argument("store")
+    query.add_argument("titles", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        counts = build_dump(read_entries(args.source), args.output, args.max_chars)
+        print(f"Wrote {counts['articles']} articles and {counts['redirects']} redirects to {args.output}")
+        # Index titles for topic resolution now rather than on the server's first request
+        from topic_resolver import build_topic_index, index_path
+        print(f"Indexed {build_topic_index(args.output)} titles in {index_path(args.output)}")
+        return 0
+    store = WikiDumpStore(args.store)
+    for title in args.titles:
+        found = store.lookup(title)
+        print(f"{title}: {found[0] + ' - ' + found[1][:200] if found else 'not found'}")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())